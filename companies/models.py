@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import connection, models
 from django_tenants.models import TenantMixin, DomainMixin
+from django_tenants.utils import get_public_schema_name
 from django.utils.translation import gettext_lazy as _
 import pytz
 from django.contrib.auth.models import User
@@ -40,13 +41,15 @@ class UserProfile(models.Model):
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
-    if created:
+    # Platform staff live in the public schema, which has no profiles
+    if created and connection.schema_name != get_public_schema_name():
         UserProfile.objects.create(user=instance)
 
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+    if connection.schema_name != get_public_schema_name():
+        instance.profile.save()
 
 
 class CompanyProfile(models.Model):
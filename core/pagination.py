@@ -0,0 +1,178 @@
+import datetime
+import decimal
+import json
+import uuid
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with an opt-in keyset (cursor) mode.
+
+    Clients keep getting offset pages unless they ask for `?pagination=cursor` or send a `cursor`. In
+    cursor mode the page is selected with a `WHERE (ordering columns) > (last row)` condition on the
+    queryset's ordering plus the primary key as a tiebreaker, so deep pages cost the same as the first
+    one when an index covers the ordering, e.g. `(is_hidden, -date_updated, -id)`. No count is returned
+    in this mode.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (request.query_params.get(self.mode_query_param) == self.cursor_mode or
+                           self.cursor_query_param in request.query_params)
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(queryset)
+        reverse, position = self.decode_cursor(request)
+
+        ordering = [(field, not descending if reverse else descending) for field, descending in self.ordering]
+        queryset = queryset.order_by(*[f"-{field.attname}" if descending else field.attname
+                                       for field, descending in ordering])
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, position))
+
+        results = list(queryset[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if reverse:
+            results.reverse()
+
+        # Walking backwards, the rows past the page are the ones before it; either way there is a
+        # page on the side we came from whenever a cursor was given.
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.first_position = self.get_position(results[0]) if results else position
+        self.last_position = self.get_position(results[-1]) if results else position
+        return results
+
+    def get_ordering(self, queryset):
+        """
+        Returns the queryset's ordering as `(field, descending)` pairs ending with the primary key.
+        """
+        query = queryset.query
+        ordering = query.order_by or (queryset.model._meta.ordering if query.default_ordering else [])
+        opts = queryset.model._meta
+        fields = []
+        for item in ordering:
+            if not isinstance(item, str):
+                raise ValidationError(f'Cursor pagination does not support ordering by {item}.')
+            name = item.lstrip('-')
+            try:
+                field = opts.pk if name == 'pk' else opts.get_field(name)
+            except FieldDoesNotExist:
+                raise ValidationError(f'Cursor pagination does not support ordering by {name}.')
+            if not field.concrete or field.null or field.is_relation and not field.many_to_one:
+                raise ValidationError(f'Cursor pagination does not support ordering by {name}.')
+            fields.append((field, item.startswith('-')))
+
+        if not any(field.primary_key for field, descending in fields):
+            fields.append((opts.pk, fields[-1][1] if fields else False))
+        return fields
+
+    def keyset_filter(self, ordering, position):
+        """
+        Builds `(a > x) OR (a = x AND b > y) OR ...` for the ordering, with `<` for descending columns.
+        """
+        conditions = []
+        for index, (field, descending) in enumerate(ordering):
+            condition = Q(**{f"{field.attname}__{'lt' if descending else 'gt'}": position[index]})
+            for previous_index, (previous_field, previous_descending) in enumerate(ordering[:index]):
+                condition &= Q(**{previous_field.attname: position[previous_index]})
+            conditions.append(condition)
+        # The redundant bound on the leading column lets Postgres start an index range scan
+        field, descending = ordering[0]
+        return Q(**{f"{field.attname}__{'lte' if descending else 'gte'}": position[0]}) & reduce(or_, conditions)
+
+    def get_position(self, instance):
+        return [getattr(instance, field.attname) for field, descending in self.ordering]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            payload = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = payload['p']
+            if len(position) != len(self.ordering):
+                raise ValueError
+            position = [field.to_python(value) for (field, descending), value in zip(self.ordering, position)]
+            return bool(payload.get('r')), position
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        payload = {'p': [self.encode_value(value) for value in position]}
+        if reverse:
+            payload['r'] = 1
+        encoded = b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        url = remove_query_param(self.base_url, self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def encode_value(value):
+        # isoformat() keeps microseconds, which DjangoJSONEncoder would truncate
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return str(value)
+        return value
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous or self.first_position is None:
+            return None
+        return self.encode_cursor(self.first_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters += [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to "cursor" to page with cursors instead of offsets.',
+                'schema': {'type': 'string', 'enum': [self.cursor_mode]},
+            },
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+        ]
+        return parameters
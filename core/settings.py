@@ -42,6 +42,7 @@ ALLOWED_HOSTS = [
 SHARED_APPS = [
     'django_tenants',
     'registration',
+    'notifications',
 
     # 'tenant_users.permissions',
     # 'tenant_users.tenants',
@@ -51,6 +52,7 @@ SHARED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'django_ckeditor_5',
     'rest_framework',
@@ -87,8 +89,8 @@ TENANT_APPS = [
 INSTALLED_APPS = list(SHARED_APPS) + [app for app in TENANT_APPS if app not in SHARED_APPS]
 
 MIDDLEWARE = [
-    # Middleware for accessing schemas and permissions
-    'django_tenants.middleware.main.TenantMainMiddleware',
+    # Middleware for accessing schemas and permissions, resolving hostnames through a per-process cache
+    'registration.middleware.CachedTenantMainMiddleware',
     
 
     'django.middleware.security.SecurityMiddleware',
@@ -335,6 +337,49 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Outbound emails are queued in the public schema and delivered by `manage.py process_email_outbox`
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))
+EMAIL_OUTBOX_WORKERS = int(os.getenv('EMAIL_OUTBOX_WORKERS', 4))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+
+# Local memory by default, which is per process; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) when running several workers
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+# Per-process hostname -> tenant cache of the tenant middleware: entries, seconds tenants and unknown
+# hostnames are cached, and lookups between hit rate log lines (0 to never log)
+TENANT_RESOLUTION_CACHE_SIZE = int(os.getenv('TENANT_RESOLUTION_CACHE_SIZE', 1024))
+TENANT_RESOLUTION_CACHE_TTL = int(os.getenv('TENANT_RESOLUTION_CACHE_TTL', 60))
+TENANT_RESOLUTION_CACHE_NEGATIVE_TTL = int(os.getenv('TENANT_RESOLUTION_CACHE_NEGATIVE_TTL', 10))
+TENANT_RESOLUTION_CACHE_LOG_INTERVAL = int(os.getenv('TENANT_RESOLUTION_CACHE_LOG_INTERVAL', 0))
+# Registered tenants are set up by `manage.py process_tenant_provisioning`, which clones this migrated
+# schema (an empty name migrates each tenant instead) and retries failed tenants up to MAX_ATTEMPTS times
+TENANT_PROVISIONING_TEMPLATE_SCHEMA = os.getenv('TENANT_PROVISIONING_TEMPLATE_SCHEMA', 'tenant_template')
+TENANT_PROVISIONING_MAX_ATTEMPTS = int(os.getenv('TENANT_PROVISIONING_MAX_ATTEMPTS', 3))
+# Migrated schemas `manage.py fill_schema_pool` keeps ready, so registrations only rename one (0 to disable)
+TENANT_PROVISIONING_POOL_SIZE = int(os.getenv('TENANT_PROVISIONING_POOL_SIZE', 5))
+# Cross-tenant reports (registration.fanout): worker threads, seconds before partial results are
+# returned, per-schema statement timeout (ms) and seconds complete results are cached
+TENANT_FANOUT_WORKERS = int(os.getenv('TENANT_FANOUT_WORKERS', 8))
+TENANT_FANOUT_TIMEOUT = int(os.getenv('TENANT_FANOUT_TIMEOUT', 30))
+TENANT_FANOUT_STATEMENT_TIMEOUT = int(os.getenv('TENANT_FANOUT_STATEMENT_TIMEOUT', 10000))
+TENANT_FANOUT_CACHE_TIMEOUT = int(os.getenv('TENANT_FANOUT_CACHE_TIMEOUT', 300))
+PURCHASE_REFERENCE_CACHE_TIMEOUT = int(os.getenv('PURCHASE_REFERENCE_CACHE_TIMEOUT', 600))
+PURCHASE_SEARCH_RELATED_LIMIT = int(os.getenv('PURCHASE_SEARCH_RELATED_LIMIT', 1000))
+# Statement timeout (ms) and result sizes of the product and vendor autocomplete endpoints
+PURCHASE_AUTOCOMPLETE_TIMEOUT = int(os.getenv('PURCHASE_AUTOCOMPLETE_TIMEOUT', 50))
+PURCHASE_AUTOCOMPLETE_LIMIT = 10
+PURCHASE_AUTOCOMPLETE_MAX_LIMIT = 20
+# Rows fetched per round trip by the streaming CSV/XLSX downloads
+PURCHASE_EXPORT_CHUNK_SIZE = int(os.getenv('PURCHASE_EXPORT_CHUNK_SIZE', 2000))
+# Rows validated and written per transaction by bulk imports, and per-row errors kept on a job
+PURCHASE_IMPORT_CHUNK_SIZE = int(os.getenv('PURCHASE_IMPORT_CHUNK_SIZE', 1000))
+PURCHASE_IMPORT_MAX_ERRORS = int(os.getenv('PURCHASE_IMPORT_MAX_ERRORS', 1000))
+
 AUTH_USER_MODEL = 'auth.User'
 
 # JWT settings
@@ -13,6 +13,7 @@ urlpatterns = [
     path('purchase/', include('purchase.urls')),
     path('sales/', include('sales.urls')),
     path('users/', include('users.urls')),
+    path('notifications/', include('notifications.urls')),
 
     
 ]
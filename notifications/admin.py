@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from .models import EmailJob, OutboundEmail
+
+
+@admin.register(EmailJob)
+class EmailJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'schema_name', 'description', 'created_on')
+    search_fields = ('id', 'schema_name', 'description')
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'job', 'subject', 'status', 'attempts', 'next_attempt_on', 'sent_on')
+    list_filter = ('status',)
+    search_fields = ('subject', 'job__id')
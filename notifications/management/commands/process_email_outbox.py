@@ -0,0 +1,42 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import claim_due_messages, deliver_batch, get_outbox_setting, record_results
+
+
+class Command(BaseCommand):
+    help = "Delivers queued emails from the outbox. Each worker thread sends a batch over one email " \
+           "backend connection; failed messages are retried with an exponential backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the due messages once and exit.")
+        parser.add_argument('--batch-size', type=int, default=get_outbox_setting('BATCH_SIZE'),
+                            help="Messages sent per email backend connection.")
+        parser.add_argument('--workers', type=int, default=get_outbox_setting('WORKERS'),
+                            help="Number of batches sent concurrently.")
+        parser.add_argument('--poll-interval', type=float, default=5,
+                            help="Seconds to wait when the outbox is empty.")
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        workers = max(options['workers'], 1)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    messages = claim_due_messages(batch_size * workers)
+                    if not messages:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    batches = [messages[index:index + batch_size] for index in range(0, len(messages), batch_size)]
+                    # Threads only talk to the email backend, results are written from this thread
+                    for batch, results in zip(batches, pool.map(deliver_batch, batches)):
+                        sent, failed = record_results(batch, results)
+                        self.stdout.write(f"Sent {sent} emails, {failed} failed")
+            except KeyboardInterrupt:
+                self.stdout.write("Stopping email outbox worker")
@@ -0,0 +1,83 @@
+import uuid
+
+from django.db import models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+EMAIL_STATUS = (
+    ('queued', 'Queued'),
+    ('sending', 'Sending'),
+    ('sent', 'Sent'),
+    ('failed', 'Failed'),
+)
+
+
+class EmailJob(models.Model):
+    """
+    A group of outbound emails queued by one request, e.g. an RFQ sent to its vendors.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    schema_name = models.CharField(max_length=63, db_index=True)
+    description = models.CharField(max_length=255, blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ['-created_on']
+
+    def __str__(self):
+        return f"{self.description or 'Email job'} ({self.id})"
+
+    def get_status_counts(self):
+        """
+        Counts the messages per status, from the prefetched messages when the job list loaded them.
+        """
+        if 'messages' in getattr(self, '_prefetched_objects_cache', {}):
+            counts = dict.fromkeys((value for value, label in EMAIL_STATUS), 0)
+            for message in self.messages.all():
+                counts[message.status] += 1
+            return counts
+        return self.messages.aggregate(**{
+            value: Count('id', filter=Q(status=value)) for value, label in EMAIL_STATUS
+        })
+
+    def get_status(self, counts=None):
+        counts = counts or self.get_status_counts()
+        if counts['sending']:
+            return 'sending'
+        if counts['queued']:
+            return 'queued'
+        if counts['failed']:
+            return 'failed'
+        return 'sent'
+
+
+class OutboundEmail(models.Model):
+    """
+    A single email waiting in, or delivered from, the outbox. The `process_email_outbox` command
+    delivers due messages and reschedules failed ones with an exponential backoff.
+    """
+    job = models.ForeignKey(EmailJob, on_delete=models.CASCADE, related_name='messages')
+    subject = models.TextField()
+    body = models.TextField()
+    content_subtype = models.CharField(max_length=20, default='plain')
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=EMAIL_STATUS, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_on = models.DateTimeField(default=timezone.now)
+    claimed_on = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    sent_on = models.DateTimeField(null=True, blank=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ['created_on']
+        indexes = [models.Index(fields=['status', 'next_attempt_on'], name='outbox_due_idx')]
+
+    def __str__(self):
+        return f"{self.subject} ({self.status})"
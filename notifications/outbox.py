@@ -0,0 +1,177 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import EmailJob, OutboundEmail
+
+# Worker defaults, each can be overridden with an EMAIL_OUTBOX_<NAME> setting
+OUTBOX_DEFAULTS = {
+    'BATCH_SIZE': 50,
+    'WORKERS': 4,
+    'MAX_ATTEMPTS': 5,
+    # Seconds before the first retry, doubled on every further attempt up to MAX_RETRY_DELAY
+    'RETRY_DELAY': 60,
+    'MAX_RETRY_DELAY': 60 * 60,
+    # Seconds after which a message claimed by a worker that died is handed out again
+    'CLAIM_TIMEOUT': 10 * 60,
+    # Recipients per message when one body goes to many addresses
+    'MAX_RECIPIENTS': 50,
+    # Rows written per insert while queueing
+    'INSERT_BATCH_SIZE': 500,
+}
+
+
+def get_outbox_setting(name):
+    return getattr(settings, f'EMAIL_OUTBOX_{name}', OUTBOX_DEFAULTS[name])
+
+
+def enqueue(messages, description=''):
+    """
+    Stores `EmailMessage` instances in the outbox as one job and returns the job. Nothing is sent
+    here; the `process_email_outbox` worker delivers the messages once the transaction commits.
+
+    `messages` may be a generator, it is consumed and written in bounded batches.
+    """
+    batch_size = get_outbox_setting('INSERT_BATCH_SIZE')
+    with transaction.atomic():
+        job = EmailJob.objects.create(schema_name=connection.schema_name, description=description[:255])
+        rows = (to_outbound_email(job, message) for message in messages)
+        while batch := list(islice(rows, batch_size)):
+            OutboundEmail.objects.bulk_create(batch)
+    return job
+
+
+def to_outbound_email(job, message):
+    if message.attachments or message.cc or message.reply_to or message.extra_headers:
+        raise ValueError('Queued emails only support a subject, body, sender and to/bcc recipients.')
+    return OutboundEmail(
+        job=job,
+        subject=message.subject,
+        body=message.body,
+        content_subtype=message.content_subtype,
+        from_email=message.from_email or '',
+        to=list(message.to),
+        bcc=list(message.bcc),
+    )
+
+
+def enqueue_email(subject, body, to=None, bcc=None, from_email=None, content_subtype='plain', description=''):
+    """
+    Queues a single email and returns its job.
+    """
+    message = EmailMessage(subject, body, from_email, to=to, bcc=bcc)
+    message.content_subtype = content_subtype
+    return enqueue([message], description=description or subject)
+
+
+def enqueue_mass_email(subject, body, recipients, render=None, content_subtype='plain', description='',
+                       batch_size=None):
+    """
+    Queues one email to many recipients and returns the job.
+
+    `recipients` is an iterable of dicts with at least an `'email'` key and is consumed lazily. Without
+    `render` the addresses are split into BCC batches of at most `batch_size` (EMAIL_OUTBOX_MAX_RECIPIENTS
+    by default). With `render`, each recipient gets their own message from `render(recipient)`, which
+    returns a `(subject, body)` pair.
+    """
+    def build(subject, body, **addressees):
+        message = EmailMessage(subject, body, **addressees)
+        message.content_subtype = content_subtype
+        return message
+
+    def messages():
+        if render is not None:
+            for recipient in recipients:
+                yield build(*render(recipient), to=[recipient['email']])
+            return
+        addresses = (recipient['email'] for recipient in recipients)
+        while batch := list(islice(addresses, batch_size or get_outbox_setting('MAX_RECIPIENTS'))):
+            yield build(subject, body, bcc=batch)
+
+    return enqueue(messages(), description=description or subject)
+
+
+def claim_due_messages(limit):
+    """
+    Marks up to `limit` due messages as sending and returns them. Rows locked by another worker are
+    skipped, so several workers can drain the same outbox.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=get_outbox_setting('CLAIM_TIMEOUT'))
+    with transaction.atomic():
+        ids = list(OutboundEmail.objects.select_for_update(skip_locked=True)
+                   .filter(Q(status='queued', next_attempt_on__lte=now) | Q(status='sending', claimed_on__lt=stale))
+                   .order_by('next_attempt_on').values_list('id', flat=True)[:limit])
+        OutboundEmail.objects.filter(id__in=ids).update(status='sending', claimed_on=now, attempts=F('attempts') + 1)
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('next_attempt_on'))
+
+
+def build_message(outbound, email_connection=None):
+    message = EmailMessage(outbound.subject, outbound.body, outbound.from_email or settings.DEFAULT_FROM_EMAIL,
+                           to=outbound.to, bcc=outbound.bcc, connection=email_connection)
+    message.content_subtype = outbound.content_subtype
+    return message
+
+
+def deliver_batch(messages):
+    """
+    Sends a batch of claimed messages over a single email backend connection and returns a
+    `{message id: error or None}` mapping. Makes no database queries, so it is safe to run in a
+    worker thread.
+    """
+    results = {}
+    email_connection = get_connection(fail_silently=False)
+    try:
+        email_connection.open()
+    except Exception as e:
+        return {message.id: f'Could not connect: {e}' for message in messages}
+    try:
+        for message in messages:
+            try:
+                build_message(message, email_connection).send(fail_silently=False)
+                results[message.id] = None
+            except Exception as e:
+                results[message.id] = str(e) or e.__class__.__name__
+    finally:
+        try:
+            email_connection.close()
+        except Exception:
+            pass
+    return results
+
+
+def get_retry_delay(attempts):
+    delay = get_outbox_setting('RETRY_DELAY') * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, get_outbox_setting('MAX_RETRY_DELAY')))
+
+
+def record_results(messages, results):
+    """
+    Stores the outcome of `deliver_batch`; failed messages are retried later until they run out of
+    attempts.
+    """
+    now = timezone.now()
+    sent = [message.id for message in messages if results.get(message.id) is None]
+    if sent:
+        OutboundEmail.objects.filter(id__in=sent).update(status='sent', sent_on=now, last_error='')
+
+    max_attempts = get_outbox_setting('MAX_ATTEMPTS')
+    failed = []
+    for message in messages:
+        error = results.get(message.id)
+        if error is None:
+            continue
+        message.last_error = error
+        if message.attempts >= max_attempts:
+            message.status = 'failed'
+        else:
+            message.status = 'queued'
+            message.next_attempt_on = now + get_retry_delay(message.attempts)
+        failed.append(message)
+    OutboundEmail.objects.bulk_update(failed, ['status', 'next_attempt_on', 'last_error'])
+    return len(sent), len(failed)
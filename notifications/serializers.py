@@ -0,0 +1,22 @@
+from rest_framework import serializers
+
+from .models import EmailJob, OutboundEmail
+
+
+class OutboundEmailSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OutboundEmail
+        fields = ['id', 'subject', 'status', 'attempts', 'next_attempt_on', 'last_error', 'sent_on']
+
+
+class EmailJobSerializer(serializers.HyperlinkedModelSerializer):
+    url = serializers.HyperlinkedIdentityField(view_name='email-job-detail')
+    status = serializers.SerializerMethodField()
+    messages = OutboundEmailSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = EmailJob
+        fields = ['id', 'url', 'description', 'created_on', 'status', 'messages']
+
+    def get_status(self, obj):
+        return obj.get_status()
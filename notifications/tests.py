@@ -0,0 +1,95 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from companies.utils import Util
+from .models import EmailJob, OutboundEmail
+from .outbox import enqueue_email, enqueue_mass_email
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP server unavailable')
+
+
+class CountingEmailBackend(LocmemEmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+
+
+class EmailOutboxTestCase(TestCase):
+    def process_outbox(self):
+        call_command('process_email_outbox', once=True, stdout=StringIO())
+
+    def test_util_queues_instead_of_sending(self):
+        job = Util.send_email({'email_subject': 'Verify Your Email', 'email_body': 'Hi', 'to_email': 'a@example.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(job.get_status(), 'queued')
+        self.assertEqual(list(job.messages.values_list('to', flat=True)), [['a@example.com']])
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.CountingEmailBackend')
+    def test_worker_delivers_queued_messages(self):
+        CountingEmailBackend.opened = 0
+        jobs = [enqueue_email(f'Subject {index}', 'Body', to=[f'{index}@example.com']) for index in range(5)]
+        call_command('process_email_outbox', once=True, batch_size=2, workers=2, stdout=StringIO())
+        # One connection per batch of two
+        self.assertEqual(CountingEmailBackend.opened, 3)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         [f'{index}@example.com' for index in range(5)])
+        self.assertTrue(all(job.get_status() == 'sent' for job in jobs))
+        self.assertEqual(OutboundEmail.objects.filter(sent_on__isnull=False).count(), 5)
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.FailingEmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+                       EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_failed_messages_are_retried_with_backoff(self):
+        job = enqueue_email('Subject', 'Body', to=['a@example.com'])
+        self.process_outbox()
+        message = job.messages.get()
+        self.assertEqual((message.status, message.attempts), ('queued', 1))
+        self.assertIn('SMTP server unavailable', message.last_error)
+        self.assertGreater(message.next_attempt_on, timezone.now() + timedelta(seconds=50))
+
+        # Not due yet
+        self.process_outbox()
+        self.assertEqual(job.messages.get().attempts, 1)
+
+        job.messages.update(next_attempt_on=timezone.now())
+        self.process_outbox()
+        message = job.messages.get()
+        self.assertEqual((message.status, message.attempts), ('failed', 2))
+        self.assertEqual(job.get_status(), 'failed')
+
+    def test_stale_claims_are_handed_out_again(self):
+        job = enqueue_email('Subject', 'Body', to=['a@example.com'])
+        job.messages.update(status='sending', claimed_on=timezone.now() - timedelta(hours=1))
+        self.process_outbox()
+        self.assertEqual(job.messages.get().status, 'sent')
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_prefetched_jobs_count_statuses_without_queries(self):
+        for index in range(3):
+            enqueue_email('Hi', 'Body', to=[f'{index}@example.com'])
+        jobs = list(EmailJob.objects.prefetch_related('messages'))
+        with self.assertNumQueries(0):
+            self.assertEqual([job.get_status() for job in jobs], ['queued'] * 3)
+
+    def test_mass_email_is_split_into_bcc_batches(self):
+        recipients = ({'email': f'{index}@example.com'} for index in range(5))
+        job = enqueue_mass_email('Subject', 'Body', recipients, batch_size=2)
+        self.assertEqual(list(job.messages.order_by('id').values_list('bcc', flat=True)),
+                         [['0@example.com', '1@example.com'], ['2@example.com', '3@example.com'], ['4@example.com']])
+
+    def test_mass_email_renders_per_recipient(self):
+        recipients = [{'email': 'a@example.com', 'name': 'A'}, {'email': 'b@example.com', 'name': 'B'}]
+        job = enqueue_mass_email('Subject', 'Body', recipients,
+                                 render=lambda recipient: (f"Hi {recipient['name']}", 'Body'))
+        self.assertEqual(list(job.messages.order_by('id').values_list('subject', 'to')),
+                         [('Hi A', ['a@example.com']), ('Hi B', ['b@example.com'])])
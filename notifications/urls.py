@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+
+from .views import EmailJobViewSet
+
+router = DefaultRouter()
+router.register(r'email-jobs', EmailJobViewSet, basename='email-job')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -0,0 +1,16 @@
+from django.db import connection
+from rest_framework import viewsets, permissions
+
+from .models import EmailJob
+from .serializers import EmailJobSerializer
+
+
+class EmailJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Delivery status of the emails queued by the current tenant.
+    """
+    serializer_class = EmailJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return EmailJob.objects.filter(schema_name=connection.schema_name).prefetch_related('messages')
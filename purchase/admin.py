@@ -2,7 +2,7 @@ from django.contrib import admin
 
 from .models import Department, Product, Vendor, ProductCategory,\
                     VendorCategory, PurchaseRequest, PurchaseRequestItem, RequestForQuotation,\
-                    RequestForQuotationItem
+                    RequestForQuotationItem, DocumentSequence
 
 # Register your models here.
 
@@ -33,3 +33,8 @@ admin.site.register(ProductCategory)
 admin.site.register(Product)
 admin.site.register(Department)
 
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_value', 'date_updated')
+
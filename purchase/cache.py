@@ -0,0 +1,80 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+# Small, frequently read tables whose rows are cached for hyperlinked field lookups and whose list
+# responses are cached. Product is only versioned, product category lists embed their products.
+REFERENCE_MODELS = (
+    'purchase.UnitOfMeasure',
+    'purchase.ProductCategory',
+    'purchase.VendorCategory',
+    'purchase.Department',
+    'purchase.Vendor',
+)
+# Documents whose status summary is cached. Line writes move a document's total with an `update()`,
+# which sends no signals, so `DocumentLineMixin` invalidates them itself.
+SUMMARY_MODELS = (
+    'purchase.PurchaseRequest',
+    'purchase.RequestForQuotation',
+    'purchase.PurchaseOrder',
+)
+VERSIONED_MODELS = REFERENCE_MODELS + ('purchase.Product',) + SUMMARY_MODELS
+
+
+def get_cache_timeout():
+    return getattr(settings, 'PURCHASE_REFERENCE_CACHE_TIMEOUT', 10 * 60)
+
+
+def get_version_key(model):
+    return f"purchase:reference:{connection.schema_name}:{model._meta.label_lower}:version"
+
+
+def get_model_version(model):
+    """
+    Returns the current cache version of a model in the current tenant. Every cached row or response
+    derived from the model embeds it, so bumping the version invalidates them all at once.
+    """
+    key = get_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_model_version(model):
+    cache.set(get_version_key(model), uuid.uuid4().hex, None)
+
+
+def invalidate_model(model):
+    # Bumped again on commit so a concurrent request cannot cache the pre-commit rows under the new version
+    bump_model_version(model)
+    transaction.on_commit(lambda: bump_model_version(model))
+
+
+def is_reference_model(model):
+    return model._meta.label in REFERENCE_MODELS
+
+
+def get_active_object(model, pk):
+    """
+    Returns the active (not hidden) instance with the given primary key, from the cache when possible.
+    Raises `model.DoesNotExist` like `get()`.
+    """
+    key = f"purchase:reference:{connection.schema_name}:{model._meta.label_lower}:{get_model_version(model)}:{pk}"
+    instance = cache.get(key)
+    if instance is None:
+        instance = model.objects.filter(is_hidden=False).get(pk=pk)
+        cache.set(key, instance, get_cache_timeout())
+    return instance
+
+
+def get_response_cache_key(request, basename, action, models):
+    versions = ':'.join(get_model_version(model) for model in models)
+    # The representation can be negotiated with the Accept header as well as the URL
+    renderer = getattr(getattr(request, 'accepted_renderer', None), 'format', '')
+    url = hashlib.md5(f'{request.build_absolute_uri()}:{renderer}'.encode('utf-8')).hexdigest()
+    return f"purchase:response:{connection.schema_name}:{basename}:{action}:{versions}:{url}"
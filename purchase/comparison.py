@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max, Min, Sum
+
+from .cache import get_model_version
+from .models import RequestForQuotationItem, RFQVendorQuoteItem, Vendor
+
+CENTS = Decimal('0.01')
+
+
+def get_comparison_cache_key(rfq):
+    """
+    Comparisons are cached per version of the RFQ and its active quotes: line writes move their
+    document's `date_updated`, and hiding, adding or deleting a quote changes the latest
+    `date_updated` or the count. Vendor names are versioned with the reference cache.
+    """
+    quotes = rfq.quotes.filter(is_hidden=False).order_by() \
+        .aggregate(last_updated=Max('date_updated'), count=Count('pk'))
+    last_updated = quotes['last_updated'].timestamp() if quotes['last_updated'] else ''
+    return f"purchase:rfq-comparison:{connection.schema_name}:{rfq.pk}:{rfq.date_updated.timestamp()}:" \
+           f"{last_updated}:{quotes['count']}:{get_model_version(Vendor)}"
+
+
+def compare_quotes(rfq):
+    """
+    Returns the comparison of the active vendor quotes of a RFQ, reusing the cached comparison of the
+    same version.
+    """
+    key = get_comparison_cache_key(rfq)
+    comparison = cache.get(key)
+    if comparison is None:
+        comparison = build_comparison(rfq)
+        cache.set(key, comparison, getattr(settings, 'PURCHASE_DOCUMENT_CACHE_TIMEOUT', 60 * 60 * 24))
+    return comparison
+
+
+def build_comparison(rfq):
+    """
+    Pivots the quoted unit prices into a product x vendor matrix and compares them line by line and for
+    the whole basket. When a vendor quotes a product more than once its lowest unit price counts.
+
+    Lines are the requested products followed by products only found in quotes, which are priced at
+    the highest quoted quantity and have no estimate. A vendor's basket total is only given when it
+    quoted every line.
+    """
+    requested = {row['product_id']: row for row in rfq.items.order_by().values('product_id', 'product__name')
+                 .annotate(total_qty=Sum('qty'), estimated_total=Sum(RequestForQuotationItem.line_total_expression()))}
+    quoted = RFQVendorQuoteItem.objects.filter(rfq_vendor_quote__rfq=rfq, rfq_vendor_quote__is_hidden=False) \
+        .order_by().values('product_id', 'product__name', 'rfq_vendor_quote__vendor_id',
+                           'rfq_vendor_quote__vendor__company_name') \
+        .annotate(unit_price=Min('estimated_unit_price'), max_qty=Max('qty'))
+
+    vendors, products, prices = {}, {}, {}
+    for row in quoted:
+        vendor_id = row['rfq_vendor_quote__vendor_id']
+        vendors[vendor_id] = row['rfq_vendor_quote__vendor__company_name']
+        products.setdefault(row['product_id'], {'name': row['product__name'], 'qty': 0})
+        products[row['product_id']]['qty'] = max(products[row['product_id']]['qty'], row['max_qty'])
+        prices[row['product_id'], vendor_id] = row['unit_price']
+    vendor_ids = sorted(vendors, key=lambda vendor_id: (vendors[vendor_id], vendor_id))
+    product_ids = sorted(requested, key=lambda product_id: requested[product_id]['product__name']) + \
+        sorted(set(products) - set(requested), key=lambda product_id: products[product_id]['name'])
+
+    lines = []
+    vendor_totals = {vendor_id: Decimal('0.00') for vendor_id in vendor_ids}
+    split_total, estimated_total = Decimal('0.00'), Decimal('0.00')
+    for product_id in product_ids:
+        request = requested.get(product_id)
+        qty = request['total_qty'] if request else products[product_id]['qty']
+        row = [prices.get((product_id, vendor_id)) for vendor_id in vendor_ids]
+        offers = [(price, vendor_id) for price, vendor_id in zip(row, vendor_ids) if price is not None]
+        best_price, best_vendor = min(offers) if offers else (None, None)
+        line = {
+            'product': product_id,
+            'product_name': request['product__name'] if request else products[product_id]['name'],
+            'qty': qty,
+            'estimated_unit_price': (request['estimated_total'] / qty).quantize(CENTS) if request and qty else None,
+            'unit_prices': row,
+            'best_vendor': best_vendor,
+            'best_unit_price': best_price,
+            'spread': max(offers)[0] - best_price if offers else None,
+            'savings': request['estimated_total'] - best_price * qty if request and offers else None,
+        }
+        lines.append(line)
+
+        for price, vendor_id in zip(row, vendor_ids):
+            if vendor_totals[vendor_id] is not None:
+                vendor_totals[vendor_id] = None if price is None else vendor_totals[vendor_id] + price * qty
+        if split_total is not None:
+            split_total = None if best_price is None else split_total + best_price * qty
+        if request:
+            estimated_total += request['estimated_total']
+
+    complete = [(total, vendor_id) for vendor_id, total in vendor_totals.items() if total is not None]
+    best_total, best_vendor = min(complete) if complete else (None, None)
+    return {
+        'rfq': rfq.pk,
+        'vendors': [{'id': vendor_id, 'company_name': vendors[vendor_id]} for vendor_id in vendor_ids],
+        'lines': lines,
+        'basket': {
+            'estimated_total': estimated_total,
+            'vendor_totals': [vendor_totals[vendor_id] for vendor_id in vendor_ids],
+            'best_vendor': best_vendor,
+            'best_total': best_total,
+            'savings': estimated_total - best_total if best_total is not None else None,
+            # Buying every line from its cheapest vendor
+            'split_total': split_total if lines else None,
+            'split_savings': estimated_total - split_total if lines and split_total is not None else None,
+        },
+    }
@@ -0,0 +1,99 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Min, Sum
+from django.utils import timezone
+
+from .cache import invalidate_model
+from .models import PurchaseRequest, PurchaseRequestItem, RequestForQuotation, RequestForQuotationItem, \
+    RFQVendorQuote, PurchaseOrder, PurchaseOrderItem
+
+# Statuses a document must have to be converted
+CONVERTIBLE_REQUEST_STATUSES = ('approved',)
+CONVERTIBLE_RFQ_STATUSES = ('awaiting', 'selected')
+
+
+def convert_requests(purchase_request_ids, expiry_date=None):
+    """
+    Converts approved purchase requests into RFQs, merging the requests suggesting the same vendor
+    into one RFQ whose lines sum the quantities of the lines with the same product and unit price.
+    The requests are locked and linked to their RFQ, so each is converted once. Returns the RFQs in
+    vendor order, raising `ValidationError` with the reasons by request id when any request cannot
+    be converted.
+    """
+    purchase_request_ids = sorted(set(purchase_request_ids))
+    with transaction.atomic():
+        purchase_requests = {purchase_request.pk: purchase_request for purchase_request in PurchaseRequest.objects
+                             .select_for_update().filter(pk__in=purchase_request_ids, is_hidden=False).order_by('pk')}
+        errors = {}
+        for pk in purchase_request_ids:
+            purchase_request = purchase_requests.get(pk)
+            if purchase_request is None:
+                errors[pk] = 'Purchase request does not exist.'
+            elif purchase_request.status not in CONVERTIBLE_REQUEST_STATUSES:
+                errors[pk] = f'Purchase request is {purchase_request.status}, only approved requests can be converted.'
+            elif purchase_request.request_for_quotation_id is not None:
+                errors[pk] = f'Purchase request was already converted into {purchase_request.request_for_quotation_id}.'
+        if errors:
+            raise ValidationError(errors)
+
+        vendor_ids = sorted({purchase_request.suggested_vendor_id for purchase_request in purchase_requests.values()})
+        rfqs = RequestForQuotation.objects.bulk_create(
+            [RequestForQuotation(vendor_id=vendor_id, expiry_date=expiry_date) for vendor_id in vendor_ids])
+        rfq_by_vendor = dict(zip(vendor_ids, rfqs))
+
+        lines = PurchaseRequestItem.objects.filter(purchase_request__in=purchase_request_ids).order_by() \
+            .values('purchase_request__suggested_vendor_id', 'product_id', 'estimated_unit_price') \
+            .annotate(total_qty=Sum('qty'), first_description=Min('description'))
+        RequestForQuotationItem.bulk_create_lines([
+            RequestForQuotationItem(request_for_quotation=rfq_by_vendor[line['purchase_request__suggested_vendor_id']],
+                                    product_id=line['product_id'], qty=line['total_qty'],
+                                    estimated_unit_price=line['estimated_unit_price'],
+                                    description=line['first_description'])
+            for line in sorted(lines, key=lambda line: (line['purchase_request__suggested_vendor_id'],
+                                                        line['product_id'], line['estimated_unit_price']))])
+
+        now = timezone.now()
+        for vendor_id, rfq in rfq_by_vendor.items():
+            PurchaseRequest.objects.filter(pk__in=[pk for pk, purchase_request in purchase_requests.items()
+                                                   if purchase_request.suggested_vendor_id == vendor_id]) \
+                .update(request_for_quotation=rfq, date_updated=now)
+        # Bulk writes do not send the signals that version the caches
+        invalidate_model(RequestForQuotation)
+        invalidate_model(PurchaseRequest)
+    return rfqs
+
+
+def convert_rfq(rfq_id, quote_id=None):
+    """
+    Converts a RFQ into a draft purchase order for its vendor and lines or, given one of its active
+    vendor quotes, for the quote's vendor and quoted lines. The RFQ is marked as having its vendor
+    selected and can only be converted into one active order. Raises `ValidationError`.
+    """
+    with transaction.atomic():
+        rfq = RequestForQuotation.objects.select_for_update().filter(pk=rfq_id, is_hidden=False).first()
+        if rfq is None:
+            raise ValidationError('Request for quotation does not exist.')
+        if rfq.status not in CONVERTIBLE_RFQ_STATUSES:
+            raise ValidationError(f'Request for quotation is {rfq.status} and cannot be converted.')
+        order = rfq.purchase_orders.filter(is_hidden=False).values_list('pk', flat=True).first()
+        if order is not None:
+            raise ValidationError(f'Request for quotation was already converted into {order}.')
+        quote = None
+        if quote_id is not None:
+            quote = RFQVendorQuote.objects.filter(pk=quote_id, rfq=rfq, is_hidden=False).first()
+            if quote is None:
+                raise ValidationError('The quote is not an active quote of this request for quotation.')
+        source = quote or rfq
+
+        purchase_order = PurchaseOrder.objects.create(vendor_id=source.vendor_id, request_for_quotation=rfq,
+                                                      rfq_vendor_quote=quote)
+        PurchaseOrderItem.bulk_create_lines([
+            PurchaseOrderItem(purchase_order=purchase_order, product_id=product_id, qty=qty,
+                              estimated_unit_price=estimated_unit_price, description=description)
+            for product_id, qty, estimated_unit_price, description in source.items.order_by('pk')
+            .values_list('product_id', 'qty', 'estimated_unit_price', 'description')])
+
+        rfq.status = 'selected'
+        rfq.vendor_id = source.vendor_id
+        rfq.save(update_fields=['status', 'vendor', 'date_updated'])
+    return purchase_order
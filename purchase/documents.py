@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.template.loader import render_to_string
+
+# Template and title per document model, keyed by model name
+DOCUMENT_TEMPLATES = {
+    'requestforquotation': ('purchase/documents/request_for_quotation.html', 'Request for Quotation',
+                            'rfq_total_price'),
+    'purchaseorder': ('purchase/documents/purchase_order.html', 'Purchase Order', 'po_total_price'),
+}
+
+
+def get_document_cache_key(document):
+    """
+    Documents are cached per version: any change to a document or its lines moves `date_updated`,
+    so stale renders are never served and simply expire.
+    """
+    return f"purchase:document:{connection.schema_name}:{document._meta.model_name}:{document.pk}:" \
+           f"{document.date_updated.timestamp()}"
+
+
+def render_document(document, greeting=None):
+    """
+    Renders a RFQ or PO as HTML, reusing the cached render of the same document version. An HTML
+    `greeting` is placed at the top of the body without re-rendering the document.
+    """
+    key = get_document_cache_key(document)
+    html = cache.get(key)
+    if html is None:
+        template_name, title, total_field = DOCUMENT_TEMPLATES[document._meta.model_name]
+        # One query for the lines and their products, whatever was prefetched on the document
+        lines = document.items.model.objects.filter(**{document.items.field.name: document}) \
+            .select_related('product').order_by('date_created', 'pk')
+        html = render_to_string(template_name, {
+            'document': document,
+            'lines': lines,
+            'title': title,
+            'total': getattr(document, total_field),
+        })
+        cache.set(key, html, getattr(settings, 'PURCHASE_DOCUMENT_CACHE_TIMEOUT', 60 * 60 * 24))
+    if greeting:
+        html = html.replace('<body>', f'<body>\n  {greeting}', 1)
+    return html
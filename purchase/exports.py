@@ -0,0 +1,167 @@
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.utils import timezone
+
+# Columns of the flattened exports per document model: the document's own columns, repeated on each
+# of its line rows, then the line columns. A document without lines is exported as one row.
+EXPORT_COLUMNS = {
+    'purchase.PurchaseRequest': {
+        'document': (('id', 'ID'), ('status', 'Status'), ('date_created', 'Created'), ('date_updated', 'Updated'),
+                     ('requester__username', 'Requester'), ('department__name', 'Department'),
+                     ('suggested_vendor__company_name', 'Suggested vendor'), ('total_price', 'Total'),
+                     ('is_hidden', 'Hidden')),
+    },
+    'purchase.RequestForQuotation': {
+        'document': (('id', 'ID'), ('status', 'Status'), ('date_created', 'Created'), ('date_updated', 'Updated'),
+                     ('expiry_date', 'Expires'), ('vendor__company_name', 'Vendor'), ('rfq_total_price', 'Total'),
+                     ('is_hidden', 'Hidden')),
+    },
+    'purchase.PurchaseOrder': {
+        'document': (('id', 'ID'), ('status', 'Status'), ('date_created', 'Created'), ('date_updated', 'Updated'),
+                     ('vendor__company_name', 'Vendor'), ('po_total_price', 'Total'), ('is_hidden', 'Hidden')),
+    },
+}
+LINE_COLUMNS = (('items__id', 'Line ID'), ('items__product__name', 'Product'), ('items__qty', 'Qty'),
+                ('items__estimated_unit_price', 'Unit price'), ('line_total', 'Line total'))
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def get_export_chunk_size():
+    return getattr(settings, 'PURCHASE_EXPORT_CHUNK_SIZE', 2000)
+
+
+def export_rows(queryset):
+    """
+    Yields the header and then one row per document line of a filtered document queryset, joining the
+    lines in the same query and reading it through a server-side cursor.
+    """
+    columns = EXPORT_COLUMNS[queryset.model._meta.label]['document'] + LINE_COLUMNS
+    yield [label for path, label in columns]
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    line_total = ExpressionWrapper(F('items__qty') * F('items__estimated_unit_price'),
+                                   output_field=DecimalField(max_digits=14, decimal_places=2))
+    rows = queryset.annotate(line_total=line_total).order_by(*ordering, 'pk', 'items__id') \
+        .values_list(*[path for path, label in columns])
+    yield from rows.iterator(chunk_size=get_export_chunk_size())
+
+
+def format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class Echo:
+    """
+    A file-like object that returns what is written to it instead of buffering it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow([format_value(value) for value in row])
+
+
+class ChunkBuffer:
+    """
+    A non-seekable file that collects what `zipfile` writes until it is drained.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_NAMESPACE = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+XLSX_RELATIONSHIPS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+XLSX_DOCUMENT_RELATIONSHIPS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+XLSX_PARTS = {
+    '[Content_Types].xml':
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>',
+    '_rels/.rels':
+        f'<Relationships xmlns="{XLSX_RELATIONSHIPS}">'
+        f'<Relationship Id="rId1" Type="{XLSX_DOCUMENT_RELATIONSHIPS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>',
+    'xl/workbook.xml':
+        f'<workbook xmlns="{XLSX_NAMESPACE}" xmlns:r="{XLSX_DOCUMENT_RELATIONSHIPS}">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets></workbook>',
+    'xl/_rels/workbook.xml.rels':
+        f'<Relationships xmlns="{XLSX_RELATIONSHIPS}">'
+        f'<Relationship Id="rId1" Type="{XLSX_DOCUMENT_RELATIONSHIPS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>',
+}
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+# Characters XML 1.0 does not allow
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def xlsx_cell(value):
+    value = format_value(value)
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = escape(INVALID_XML_CHARS.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def stream_xlsx(rows):
+    """
+    Writes the rows as a single sheet workbook with inline strings, yielding the compressed zip as it
+    is produced so the workbook is never held in memory.
+    """
+    buffer = ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        for name, xml in XLSX_PARTS.items():
+            workbook.writestr(name, XML_DECLARATION + xml)
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(f'{XML_DECLARATION}<worksheet xmlns="{XLSX_NAMESPACE}"><sheetData>'.encode('utf-8'))
+            for row in rows:
+                sheet.write(f"<row>{''.join(xlsx_cell(value) for value in row)}</row>".encode('utf-8'))
+                if len(buffer.chunks) > 64:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+        yield buffer.drain()
+    yield buffer.drain()
+
+
+def stream_export(queryset, export_format):
+    rows = export_rows(queryset)
+    return stream_xlsx(rows) if export_format == 'xlsx' else stream_csv(rows)
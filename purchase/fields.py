@@ -0,0 +1,112 @@
+from urllib import parse
+
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.urls import NoReverseMatch, Resolver404, get_script_prefix, resolve
+from rest_framework import serializers
+
+from .cache import get_active_object
+
+# Renderer format of the compact representation, in which related objects are given by primary key
+COMPACT_FORMAT = 'compact'
+
+
+def is_compact(context):
+    """
+    Whether the request of a serializer context asked for the compact representation, with
+    `?format=compact` or `Accept: application/json; representation=compact`.
+    """
+    renderer = getattr(context.get('request'), 'accepted_renderer', None)
+    return getattr(renderer, 'format', None) == COMPACT_FORMAT
+
+
+class PreloadedHyperlinkedRelatedField(serializers.HyperlinkedRelatedField):
+    """
+    A `HyperlinkedRelatedField` that resolves hyperlinks from `context['related_objects']` when the
+    serializer has preloaded them, e.g. with one `in_bulk` for all the rows of a bulk request, and from
+    the database otherwise. Preloaded objects are keyed by field name, then by the string lookup value.
+
+    In the compact representation the field reads and writes primary keys instead of hyperlinks,
+    going through the same lookups and queryset.
+    """
+    default_error_messages = {
+        'pk_does_not_exist': 'Invalid pk "{pk_value}" - object does not exist.',
+        'pk_incorrect_type': 'Incorrect type. Expected pk value, received {data_type}.',
+    }
+
+    def to_representation(self, value):
+        if is_compact(self.context):
+            return value.pk
+        return super().to_representation(value)
+
+    def to_internal_value(self, data):
+        if not is_compact(self.context):
+            return super().to_internal_value(data)
+        if isinstance(data, bool) or not isinstance(data, (str, int)):
+            self.fail('pk_incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.get_object(self.view_name, [], {self.lookup_url_kwarg: data})
+        except (ObjectDoesNotExist, DjangoValidationError, TypeError, ValueError):
+            self.fail('pk_does_not_exist', pk_value=data)
+
+    def get_lookup_value(self, data):
+        """
+        Returns the primary key a hyperlink points at, or None when it is not a link to this field's view.
+        """
+        if is_compact(self.context) and isinstance(data, (str, int)) and not isinstance(data, bool):
+            try:
+                return self.get_queryset().model._meta.pk.to_python(data)
+            except DjangoValidationError:
+                return None
+        if not isinstance(data, str):
+            return None
+        if data.startswith(('http:', 'https:')):
+            data = parse.urlparse(data).path
+            prefix = get_script_prefix()
+            if data.startswith(prefix):
+                data = '/' + data[len(prefix):]
+        try:
+            match = resolve(parse.unquote(data))
+        except (Resolver404, NoReverseMatch):
+            return None
+        if match.view_name != self.view_name or self.lookup_url_kwarg not in match.kwargs:
+            return None
+        try:
+            return self.get_queryset().model._meta.pk.to_python(match.kwargs[self.lookup_url_kwarg])
+        except DjangoValidationError:
+            return None
+
+    def preload(self, values):
+        """
+        Loads the objects for the given hyperlinks with a single query.
+        """
+        lookup_values = {self.get_lookup_value(value) for value in values}
+        lookup_values.discard(None)
+        return {str(pk): obj for pk, obj in self.get_queryset().in_bulk(list(lookup_values)).items()}
+
+    def get_object(self, view_name, view_args, view_kwargs):
+        preloaded = self.context.get('related_objects', {}).get(self.field_name)
+        if preloaded is None:
+            return super().get_object(view_name, view_args, view_kwargs)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(view_kwargs[self.lookup_url_kwarg])
+            return preloaded[str(pk)]
+        except (KeyError, DjangoValidationError):
+            raise ObjectDoesNotExist
+
+
+class CachedHyperlinkedRelatedField(PreloadedHyperlinkedRelatedField):
+    """
+    A hyperlinked field for the reference tables in `purchase.cache.REFERENCE_MODELS` that resolves
+    single lookups from the per-tenant reference cache. Its queryset must be the model's active
+    (`is_hidden=False`) rows, which is what the cache holds.
+    """
+
+    def get_object(self, view_name, view_args, view_kwargs):
+        if self.context.get('related_objects', {}).get(self.field_name) is not None:
+            return super().get_object(view_name, view_args, view_kwargs)
+        model = self.get_queryset().model
+        try:
+            pk = model._meta.pk.to_python(view_kwargs[self.lookup_url_kwarg])
+        except DjangoValidationError:
+            raise ObjectDoesNotExist
+        return get_active_object(model, pk)
@@ -0,0 +1,288 @@
+import codecs
+import csv
+import json
+import logging
+from datetime import timedelta
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidate_model
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# What each import kind writes. Rows are matched to existing rows on `key`, the columns in `fields`
+# are validated with the model fields, and each column in `lookups` holds the name of a related row,
+# given as `(model, name field)`, which is resolved to its id. A key may include lookup columns.
+IMPORT_KINDS = {
+    'unit_of_measure': {
+        'model': 'purchase.UnitOfMeasure',
+        'key': ('name',),
+        'fields': ('name', 'description', 'is_hidden'),
+        'lookups': {},
+    },
+    'product_category': {
+        'model': 'purchase.ProductCategory',
+        'key': ('name',),
+        'fields': ('name', 'description', 'is_hidden'),
+        'lookups': {},
+    },
+    'vendor_category': {
+        'model': 'purchase.VendorCategory',
+        'key': ('name',),
+        'fields': ('name', 'description', 'is_hidden'),
+        'lookups': {},
+    },
+    'vendor': {
+        'model': 'purchase.Vendor',
+        'key': ('company_name',),
+        'fields': ('company_name', 'email', 'address', 'phone_number', 'is_hidden'),
+        'lookups': {'category': ('purchase.VendorCategory', 'name')},
+    },
+    'product': {
+        'model': 'purchase.Product',
+        'key': ('name', 'company'),
+        'fields': ('name', 'type', 'cost_price', 'selling_price', 'is_hidden'),
+        'lookups': {'unit_of_measure': ('purchase.UnitOfMeasure', 'name'),
+                    'category': ('purchase.ProductCategory', 'name'),
+                    'company': ('purchase.Vendor', 'company_name')},
+    },
+}
+
+
+def get_import_setting(name, default):
+    return getattr(settings, f'PURCHASE_IMPORT_{name}', default)
+
+
+def read_rows(file, file_format):
+    """
+    Yields `(row number, row, error)` for each data row of an uploaded CSV (with a header row) or
+    JSON Lines file, numbering rows from 1 after the header. Undecodable JSON lines are yielded with
+    an error instead of a row.
+    """
+    lines = codecs.iterdecode(file, 'utf-8-sig')
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(lines), 1):
+            yield number, {column.strip(): value for column, value in row.items() if column}, None
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, None, {'non_field_errors': [f'Invalid JSON: {e}']}
+            continue
+        if not isinstance(row, dict):
+            yield number, None, {'non_field_errors': ['Expected a JSON object.']}
+            continue
+        yield number, row, None
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def clean_values(model, config, row):
+    """
+    Validates the non-blank columns of a row, returning the values keyed by field and the errors.
+    Blank columns are left out, so they keep their current value or get the field's default.
+    """
+    values, errors = {}, {}
+    for name in config['fields']:
+        if is_blank(row.get(name)):
+            continue
+        value = row[name].strip() if isinstance(row[name], str) else row[name]
+        try:
+            values[name] = model._meta.get_field(name).clean(value, None)
+        except DjangoValidationError as e:
+            errors[name] = e.messages
+    return values, errors
+
+
+def clean_missing(model, config, values):
+    """
+    Reports the required columns a new row leaves out: fields without a default that may not be
+    blank, and lookups that may not be null. Left out fields with a default get the model default.
+    """
+    errors = {}
+    for name in config['fields']:
+        field = model._meta.get_field(name)
+        if name not in values and not field.has_default() and not field.blank:
+            errors[name] = ['This field is required.']
+    for name in config['lookups']:
+        if f'{name}_id' not in values and not model._meta.get_field(name).null:
+            errors[name] = ['This field is required.']
+    return errors
+
+
+def resolve_lookups(config, rows):
+    """
+    Maps the names used by a chunk's rows to ids with one query per related model. When several rows
+    share a name the visible one with the lowest id wins.
+    """
+    maps = {}
+    for column, (label, field) in config['lookups'].items():
+        names = {str(row[column]).strip() for row in rows if not is_blank(row.get(column))}
+        related = apps.get_model(label)
+        maps[column] = {}
+        for name, pk in related.objects.filter(**{f'{field}__in': names}).order_by('is_hidden', 'pk') \
+                .values_list(field, 'pk'):
+            maps[column].setdefault(name, pk)
+    return maps
+
+
+def get_key(config, values):
+    """
+    Returns the key of cleaned row values, in which lookup columns are stored as `<column>_id`.
+    """
+    return tuple(values.get(f'{name}_id' if name in config['lookups'] else name) for name in config['key'])
+
+
+def get_instance_key(config, instance):
+    return tuple(getattr(instance, f'{name}_id' if name in config['lookups'] else name) for name in config['key'])
+
+
+def match_existing(model, config, keys):
+    """
+    Loads the rows already matching the given keys with one query, preferring visible rows and then
+    the lowest id when a key matches several.
+    """
+    filters = {f"{f'{name}_id' if name in config['lookups'] else name}__in": {key[index] for key in keys}
+               for index, name in enumerate(config['key'])}
+    existing = {}
+    for instance in model.objects.filter(**filters).order_by('is_hidden', 'pk'):
+        existing.setdefault(get_instance_key(config, instance), instance)
+    return {key: existing[key] for key in keys if key in existing}
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def import_chunk(model, config, rows):
+    """
+    Validates and upserts one chunk of `(row number, row, error)`. Returns the created and updated
+    counts and a list of `{'row', 'errors'}` for the rows that were skipped.
+    """
+    report = []
+    maps = resolve_lookups(config, [row for number, row, error in rows if row is not None])
+    cleaned = []
+    for number, row, error in rows:
+        if error:
+            report.append({'row': number, 'errors': error})
+            continue
+        values, errors = clean_values(model, config, row)
+        for column, (label, field) in config['lookups'].items():
+            if is_blank(row.get(column)):
+                continue
+            name = str(row[column]).strip()
+            if name in maps[column]:
+                values[f'{column}_id'] = maps[column][name]
+            else:
+                verbose_name = apps.get_model(label)._meta.verbose_name
+                errors[column] = [f'No {verbose_name} named "{name}".']
+        for name, value in zip(config['key'], get_key(config, values)):
+            if value is None and name not in errors:
+                errors[name] = ['This field is required.']
+        if errors:
+            report.append({'row': number, 'errors': errors})
+        else:
+            cleaned.append((number, values))
+
+    existing = match_existing(model, config, {get_key(config, values) for number, values in cleaned})
+    created, updated, update_fields = {}, {}, set()
+    for number, values in cleaned:
+        key = get_key(config, values)
+        # A key repeated within the chunk updates the instance of its first row
+        instance = existing.get(key) or created.get(key)
+        if instance is None:
+            errors = clean_missing(model, config, values)
+            if errors:
+                report.append({'row': number, 'errors': errors})
+                continue
+            created[key] = model(**values)
+            continue
+        for name, value in values.items():
+            setattr(instance, name, value)
+        if key in existing:
+            updated[key] = instance
+            update_fields.update(values)
+
+    if created:
+        model.objects.bulk_create(created.values())
+    if updated:
+        # bulk_update() does not apply auto_now
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                update_fields.add(field.name)
+                for instance in updated.values():
+                    setattr(instance, field.attname, now)
+        model.objects.bulk_update(updated.values(), sorted(update_fields))
+    if created or updated:
+        # Bulk writes do not send the signals that version the reference cache
+        invalidate_model(model)
+    return len(created), len(updated), sorted(report, key=lambda entry: entry['row'])
+
+
+def claim_import_jobs(limit=1):
+    """
+    Marks up to `limit` pending import jobs of the current tenant as running and returns them. Jobs
+    locked by another worker are skipped, and a running job that committed no chunk for
+    PURCHASE_IMPORT_CLAIM_TIMEOUT seconds, its worker having died, is handed out again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=get_import_setting('CLAIM_TIMEOUT', 30 * 60))
+    with transaction.atomic():
+        ids = list(ImportJob.objects.select_for_update(skip_locked=True)
+                   .filter(Q(status='pending') | Q(status='running', date_updated__lt=stale))
+                   .order_by('date_created').values_list('id', flat=True)[:limit])
+        ImportJob.objects.filter(id__in=ids).update(status='running', date_updated=now)
+    return list(ImportJob.objects.filter(id__in=ids).order_by('date_created'))
+
+
+def run_import(job):
+    """
+    Imports a job's file a chunk at a time, committing each chunk together with the job's progress.
+    Rows up to `rows_processed` are skipped, so running a failed or interrupted job again resumes it.
+    """
+    config = IMPORT_KINDS[job.kind]
+    model = apps.get_model(config['model'])
+    chunk_size = get_import_setting('CHUNK_SIZE', 1000)
+    max_errors = get_import_setting('MAX_ERRORS', 1000)
+
+    job.status = 'running'
+    job.last_error = ''
+    job.save(update_fields=['status', 'last_error', 'date_updated'])
+    try:
+        with job.file.open('rb') as file:
+            rows = (row for row in read_rows(file, job.file_format) if row[0] > job.rows_processed)
+            for chunk in chunked(rows, chunk_size):
+                with transaction.atomic():
+                    created, updated, report = import_chunk(model, config, chunk)
+                    job.rows_processed = chunk[-1][0]
+                    job.rows_created += created
+                    job.rows_updated += updated
+                    job.rows_failed += len(report)
+                    job.errors = job.errors + report[:max(max_errors - len(job.errors), 0)]
+                    job.save(update_fields=['rows_processed', 'rows_created', 'rows_updated', 'rows_failed',
+                                            'errors', 'date_updated'])
+    except Exception as e:
+        logger.exception("Import job %s failed", job.pk)
+        job.status = 'failed'
+        job.last_error = str(e)
+        job.save(update_fields=['status', 'last_error', 'date_updated'])
+        return job
+
+    job.status = 'completed'
+    job.save(update_fields=['status', 'date_updated'])
+    return job
@@ -0,0 +1,83 @@
+import time
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from purchase import views
+from purchase.cache import REFERENCE_MODELS, bump_model_version
+
+# (name, viewset) of the list endpoints benchmarked by default
+BENCHMARK_ENDPOINTS = (
+    ('purchase-request', views.PurchaseRequestViewSet),
+    ('request-for-quotation', views.RequestForQuotationViewSet),
+    ('purchase-order', views.PurchaseOrderViewSet),
+    ('rfq-vendor-quote', views.RFQVendorQuoteViewSet),
+    ('po-vendor-quote', views.POVendorQuoteViewSet),
+    ('product', views.ProductViewSet),
+    ('vendor', views.VendorViewSet),
+    ('purchase-order-item', views.PurchaseOrderItemViewSet),
+)
+
+
+class Command(BaseCommand):
+    help = "Compares the serialization time and payload size of list endpoints in the hyperlinked and " \
+           "compact (`?format=compact`) representations. " \
+           "Runs against the current schema, use `tenant_command` or `all_tenants_command` to target tenants."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="User the requests are made as, the first superuser by default.")
+        parser.add_argument('--limit', type=int, default=100, help="Rows per page.")
+        parser.add_argument('--repeat', type=int, default=5, help="Requests per endpoint and representation.")
+        parser.add_argument('--endpoint', action='append', choices=[name for name, viewset in BENCHMARK_ENDPOINTS],
+                            help="Only benchmark these endpoints.")
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        user = users.filter(username=options['username']).first() if options['username'] else \
+            users.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError("No user to make the requests as, pass --username.")
+
+        self.stdout.write(f"[{connection.schema_name}] {'endpoint':<24}{'rows':>6}{'hyperlinked':>23}"
+                          f"{'compact':>23}{'time':>8}{'size':>8}")
+        for name, viewset in BENCHMARK_ENDPOINTS:
+            if options['endpoint'] and name not in options['endpoint']:
+                continue
+            view = viewset.as_view({'get': 'list'})
+            results = [self.measure(view, user, {'limit': options['limit'], **params}, max(options['repeat'], 1))
+                       for params in ({}, {'format': 'compact'})]
+            (full_time, full_size, rows), (compact_time, compact_size, _) = results
+            self.stdout.write(
+                f"[{connection.schema_name}] {name:<24}{rows:>6}{full_time * 1000:>11.1f} ms{full_size:>7} B"
+                f"{compact_time * 1000:>11.1f} ms{compact_size:>7} B"
+                f"{self.reduction(full_time, compact_time):>8}{self.reduction(full_size, compact_size):>8}")
+
+    @staticmethod
+    def measure(view, user, params, repeat):
+        """
+        Returns the best time to get and render a page, its size in bytes and its number of rows.
+        """
+        factory = APIRequestFactory()
+        best = None
+        for _ in range(repeat):
+            # Reference data lists are otherwise served from the response cache. Bumping this tenant's
+            # versions misses it without clearing a cache shared with other tenants.
+            for label in REFERENCE_MODELS + ('purchase.Product',):
+                bump_model_version(apps.get_model(label))
+            request = factory.get('/', params)
+            force_authenticate(request, user=user)
+            start = time.perf_counter()
+            response = view(request)
+            response.render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        data = response.data
+        rows = len(data.get('results', [])) if isinstance(data, dict) else len(data)
+        return best, len(response.content), rows
+
+    @staticmethod
+    def reduction(before, after):
+        return f"{(1 - after / before) * 100:.0f}%" if before else '-'
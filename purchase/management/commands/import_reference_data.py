@@ -0,0 +1,49 @@
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from purchase.imports import IMPORT_KINDS, run_import
+from purchase.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = "Imports units of measure, categories, vendors or products from a CSV or JSON Lines file, " \
+           "or resumes a failed import with `--resume`. " \
+           "Runs against the current schema, use `tenant_command` or `all_tenants_command` to target tenants."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', nargs='?', choices=list(IMPORT_KINDS))
+        parser.add_argument('path', nargs='?', help="CSV file with a header row, or JSON Lines file.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help="File format, guessed from the file extension by default.")
+        parser.add_argument('--resume', type=int, metavar='JOB_ID',
+                            help="Resume an import job from its last committed chunk.")
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            job = ImportJob.objects.filter(pk=options['resume']).first()
+            if job is None:
+                raise CommandError(f"Import job {options['resume']} does not exist.")
+            if job.status == 'completed':
+                raise CommandError(f"Import job {job.pk} has already completed.")
+        else:
+            if not options['kind'] or not options['path']:
+                raise CommandError("A kind and a path are required unless resuming a job.")
+            path = options['path']
+            file_format = options['format'] or ('jsonl' if path.lower().endswith(('.jsonl', '.ndjson')) else 'csv')
+            try:
+                with open(path, 'rb') as file:
+                    job = ImportJob(kind=options['kind'], file_format=file_format)
+                    job.file.save(os.path.basename(path), File(file), save=True)
+            except OSError as e:
+                raise CommandError(f"Cannot read {path}: {e}")
+
+        job = run_import(job)
+        self.stdout.write(f"[{connection.schema_name}] import {job.pk} {job.status}: {job.rows_processed} rows, "
+                          f"{job.rows_created} created, {job.rows_updated} updated, {job.rows_failed} failed")
+        for entry in job.errors:
+            self.stdout.write(f"  row {entry['row']}: {entry['errors']}")
+        if job.status == 'failed':
+            raise CommandError(f"Import job {job.pk} failed: {job.last_error}")
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from purchase.imports import claim_import_jobs, run_import
+from registration.tenant_migrations import get_tenant_schemas
+
+
+class Command(BaseCommand):
+    help = "Runs the import jobs uploaded to every tenant, a chunk at a time. Jobs are claimed with " \
+           "skipped locks, so several workers can run imports concurrently."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the pending jobs once and exit.")
+        parser.add_argument('--batch-size', type=int, default=1,
+                            help="Jobs claimed at a time in each tenant before moving on to the next.")
+        parser.add_argument('--poll-interval', type=float, default=5,
+                            help="Seconds to wait when no job is pending.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                ran = 0
+                for schema_name in get_tenant_schemas(include_template=False):
+                    with schema_context(schema_name):
+                        for job in claim_import_jobs(max(options['batch_size'], 1)):
+                            job = run_import(job)
+                            ran += 1
+                            self.stdout.write(f"[{schema_name}] Import {job.pk} {job.status}: {job.rows_created} "
+                                              f"created, {job.rows_updated} updated, {job.rows_failed} failed")
+                if not ran:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping import worker")
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+
+from purchase.models import DOCUMENT_LINE_MODELS
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the persisted PR, RFQ, PO and vendor quote totals from their lines. " \
+           "Runs against the current schema, use `tenant_command` or `all_tenants_command` to target tenants."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help="Only report documents whose persisted total is out of date.")
+
+    def handle(self, *args, **options):
+        verify = options['verify']
+        stale_documents = 0
+
+        for line_model in DOCUMENT_LINE_MODELS:
+            document_model = line_model.document_model()
+            total_field = line_model.document_total_field
+            stale = document_model.objects.annotate(computed_total=line_model.document_total_subquery()) \
+                .exclude(**{total_field: F('computed_total')}).values_list('pk', flat=True)
+            stale_ids = list(stale)
+            stale_documents += len(stale_ids)
+
+            if stale_ids and not verify:
+                with transaction.atomic():
+                    document_model.objects.filter(pk__in=stale_ids) \
+                        .update(**{total_field: line_model.document_total_subquery()})
+
+            self.stdout.write(f"[{connection.schema_name}] {document_model._meta.verbose_name_plural}: "
+                              f"{len(stale_ids)} {'stale' if verify else 'rebuilt'}")
+
+        if verify and stale_documents:
+            raise CommandError(f"{stale_documents} document totals are out of date.")
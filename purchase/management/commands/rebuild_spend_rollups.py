@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from purchase.spend import SPEND_SOURCES, rebuild_spend
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the spend rollups from the purchase order and purchase request lines. " \
+           "Runs against the current schema, use `tenant_command` or `all_tenants_command` to target tenants."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', choices=list(SPEND_SOURCES),
+                            help="Only rebuild the rollups of this source.")
+
+    def handle(self, *args, **options):
+        sources = [options['source']] if options['source'] else list(SPEND_SOURCES)
+        for source in sources:
+            rows = rebuild_spend(source)
+            self.stdout.write(f"[{connection.schema_name}] {source}: {rows} rollup rows")
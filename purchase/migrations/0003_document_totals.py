@@ -0,0 +1,63 @@
+# Generated by Django 5.0.6 on 2026-10-17 16:07
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# (document model, total field, line model, line foreign key)
+DOCUMENT_TOTALS = (
+    ('PurchaseRequest', 'total_price', 'PurchaseRequestItem', 'purchase_request'),
+    ('RequestForQuotation', 'rfq_total_price', 'RequestForQuotationItem', 'request_for_quotation'),
+    ('RFQVendorQuote', 'quote_total_price', 'RFQVendorQuoteItem', 'rfq_vendor_quote'),
+    ('PurchaseOrder', 'po_total_price', 'PurchaseOrderItem', 'purchase_order'),
+    ('POVendorQuote', 'quote_total_price', 'POVendorQuoteItem', 'po_vendor_quote'),
+)
+
+
+def populate_document_totals(apps, schema_editor):
+    for document_name, total_field, line_name, line_field in DOCUMENT_TOTALS:
+        document_model = apps.get_model('purchase', document_name)
+        line_model = apps.get_model('purchase', line_name)
+        line_total = ExpressionWrapper(F('qty') * F('estimated_unit_price'),
+                                       output_field=DecimalField(max_digits=14, decimal_places=2))
+        line_totals = line_model.objects.filter(**{line_field: OuterRef('pk')}).order_by() \
+            .values(line_field).annotate(total=Sum(line_total)).values('total')
+        document_model.objects.update(**{total_field: Coalesce(
+            Subquery(line_totals), Value(Decimal('0.00')), output_field=DecimalField(max_digits=14, decimal_places=2))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchase', '0002_documentsequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='povendorquote',
+            name='quote_total_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='po_total_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='requestforquotation',
+            name='rfq_total_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='rfqvendorquote',
+            name='quote_total_price',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14),
+        ),
+        migrations.RunPython(populate_document_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-17 16:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchase', '0003_document_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='povendorquote',
+            index=models.Index(fields=['is_hidden', '-date_updated', '-id'], name='po_quote_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_hidden', '-created_on', '-id'], name='product_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['is_hidden', '-date_updated', '-id'], name='po_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['is_hidden', '-date_updated', '-id'], name='pr_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestforquotation',
+            index=models.Index(fields=['is_hidden', '-date_updated', '-id'], name='rfq_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rfqvendorquote',
+            index=models.Index(fields=['is_hidden', '-date_updated', '-id'], name='rfq_quote_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(fields=['is_hidden', '-updated_on', '-id'], name='vendor_keyset_idx'),
+        ),
+    ]
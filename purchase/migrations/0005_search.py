@@ -0,0 +1,129 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.db import migrations
+
+# Must match purchase.search.SEARCH_CONFIG
+SEARCH_CONFIG = 'simple'
+
+# (table, weighted columns) of the search vectors maintained by triggers
+SEARCH_VECTORS = (
+    ('purchase_product', (('name', 'A'), ('type', 'C'))),
+    ('purchase_vendor', (('company_name', 'A'), ('email', 'B'), ('address', 'C'), ('phone_number', 'C'))),
+    ('purchase_purchaserequest', (('id', 'A'), ('purpose', 'B'), ('status', 'C'))),
+    ('purchase_requestforquotation', (('id', 'A'), ('status', 'C'))),
+    ('purchase_purchaseorder', (('id', 'A'), ('status', 'C'))),
+)
+
+
+def create_search_trigger(table, columns):
+    vector = ' ||\n        '.join(f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.{column}::text, '')), '{weight}')"
+                                   for column, weight in columns)
+    column_names = ', '.join(column for column, weight in columns)
+    # Updating the indexed columns to themselves fires the trigger for the existing rows
+    return f"""
+    CREATE FUNCTION {table}_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {vector};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    CREATE TRIGGER {table}_search_vector BEFORE INSERT OR UPDATE OF {column_names} ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {table}_search_vector();
+    UPDATE {table} SET {columns[0][0]} = {columns[0][0]};
+    """
+
+
+def drop_search_trigger(table):
+    return f"""
+    DROP TRIGGER IF EXISTS {table}_search_vector ON {table};
+    DROP FUNCTION IF EXISTS {table}_search_vector();
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchase', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        # In the public schema, which is on every tenant's search path
+        migrations.RunSQL('CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public', migrations.RunSQL.noop),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='requestforquotation',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(
+                django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='product_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='po_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(
+                django.db.models.functions.text.Upper('id'), name='gin_trgm_ops'), name='po_id_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='pr_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(
+                django.db.models.functions.text.Upper('id'), name='gin_trgm_ops'), name='pr_id_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestforquotation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='rfq_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestforquotation',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(
+                django.db.models.functions.text.Upper('id'), name='gin_trgm_ops'), name='rfq_id_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='vendor_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(
+                django.db.models.functions.text.Upper('company_name'), name='gin_trgm_ops'),
+                name='vendor_name_trgm_idx'),
+        ),
+    ] + [
+        migrations.RunSQL(create_search_trigger(table, columns), drop_search_trigger(table))
+        for table, columns in SEARCH_VECTORS
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:31
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchase', '0005_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.comparison.Collate(
+                django.db.models.functions.text.Upper('name'), 'C'), models.F('id'),
+                condition=models.Q(('is_hidden', False)), name='product_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(django.db.models.functions.comparison.Collate(
+                django.db.models.functions.text.Upper('company_name'), 'C'), models.F('id'),
+                condition=models.Q(('is_hidden', False)), name='vendor_name_prefix_idx'),
+        ),
+    ]
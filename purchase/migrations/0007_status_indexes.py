@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchase', '0006_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['status', 'is_hidden', '-date_updated', '-id'], include=('po_total_price',),
+                               name='po_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['status', 'is_hidden', '-date_updated', '-id'], include=('total_price',),
+                               name='pr_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestforquotation',
+            index=models.Index(fields=['status', 'is_hidden', '-date_updated', '-id'], include=('rfq_total_price',),
+                               name='rfq_status_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:44
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchase', '0007_status_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('purchase_order', 'Purchase Orders'),
+                                                     ('purchase_request', 'Purchase Requests')], max_length=20)),
+                ('month', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('qty', models.PositiveBigIntegerField(default=0)),
+                ('lines', models.PositiveIntegerField(default=0)),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                               related_name='+', to='purchase.productcategory')),
+                ('department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                                 related_name='+', to='purchase.department')),
+                ('vendor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE,
+                                             related_name='+', to='purchase.vendor')),
+            ],
+            options={
+                'ordering': ['source', 'month'],
+                'indexes': [models.Index(fields=['source', 'month', 'vendor'], name='spend_vendor_idx'),
+                            models.Index(fields=['source', 'month', 'category'], name='spend_category_idx'),
+                            models.Index(fields=['source', 'month', 'department'], name='spend_department_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:31
+
+import django.db.models.deletion
+import purchase.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('purchase', '0008_spendrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('unit_of_measure', 'Units of Measure'),
+                                                   ('product_category', 'Product Categories'),
+                                                   ('vendor_category', 'Vendor Categories'), ('vendor', 'Vendors'),
+                                                   ('product', 'Products')], max_length=20)),
+                ('file', models.FileField(upload_to=purchase.models.import_file_path)),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], default='csv',
+                                                 max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'),
+                                                     ('completed', 'Completed'), ('failed', 'Failed')],
+                                            default='pending', max_length=20)),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('rows_created', models.PositiveIntegerField(default=0)),
+                ('rows_updated', models.PositiveIntegerField(default=0)),
+                ('rows_failed', models.PositiveIntegerField(default=0)),
+                ('errors', models.JSONField(blank=True, default=list)),
+                ('last_error', models.TextField(blank=True)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('requester', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL,
+                                                related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date_created'],
+            },
+        ),
+    ]
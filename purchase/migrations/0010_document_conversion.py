@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-17 20:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchase', '0009_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='request_for_quotation',
+            field=models.ForeignKey(blank=True, editable=False, null=True,
+                                    on_delete=django.db.models.deletion.SET_NULL, related_name='purchase_requests',
+                                    to='purchase.requestforquotation'),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='request_for_quotation',
+            field=models.ForeignKey(blank=True, editable=False, null=True,
+                                    on_delete=django.db.models.deletion.SET_NULL, related_name='purchase_orders',
+                                    to='purchase.requestforquotation'),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='rfq_vendor_quote',
+            field=models.ForeignKey(blank=True, editable=False, null=True,
+                                    on_delete=django.db.models.deletion.SET_NULL, related_name='purchase_orders',
+                                    to='purchase.rfqvendorquote'),
+        ),
+    ]
@@ -1,16 +1,30 @@
 from django.core.mail import send_mail, EmailMultiAlternatives, send_mass_mail, EmailMessage
-from django.db import models
+from decimal import Decimal
+
+from django.db import connection, models, transaction
 from django.contrib.auth.models import User, AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
 
 from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.html import format_html
 
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Collate, Upper
 from django.db.models.signals import pre_save
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 from django_ckeditor_5.fields import CKEditor5Field
 from datetime import datetime, timedelta
 import json
+import uuid
+
+from notifications.outbox import enqueue_email, enqueue_mass_email, get_outbox_setting
+from .cache import SUMMARY_MODELS, invalidate_model
+from .documents import render_document
+from .sequences import document_sequences
+
 PURCHASE_REQUEST_STATUS = (
     ('draft', 'Draft'),
     ('approved', 'Approved'),
@@ -108,35 +122,231 @@ class HiddenManager(models.Manager):
 
 # To generate unique id for purchase requests
 def generate_unique_pr_id():
-    last_request = PurchaseRequest.objects.order_by('id').last()
-    if last_request:
-        last_id = int(last_request.id[2:])
-        new_id = f"PR{last_id + 1:06d}"
-    else:
-        new_id = "PR000001"
-    return new_id
+    return document_sequences.next_id('purchase_request')
 
 
 # To generate unique id for request for quotations
 def generate_unique_rfq_id():
-    last_request = RequestForQuotation.objects.order_by('id').last()
-    if last_request:
-        last_id = int(last_request.id[2:])
-        new_id = f"RFQ{last_id + 1:06d}"
-    else:
-        new_id = "RFQ000001"
-    return new_id
+    return document_sequences.next_id('request_for_quotation')
 
 
 # To generate unique id for purchase orders
 def generate_unique_po_id():
-    last_request = PurchaseOrder.objects.order_by('id').last()
-    if last_request:
-        last_id = int(last_request.id[2:])
-        new_id = f"PO{last_id + 1:06d}"
-    else:
-        new_id = "PO000001"
-    return new_id
+    return document_sequences.next_id('purchase_order')
+
+
+class DocumentSequence(models.Model):
+    """
+    Per-tenant counter behind the PR, RFQ and PO numbers, see `purchase.sequences`.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+    date_updated = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f"{self.name} ({self.last_value})"
+
+
+# Sent by `DocumentLineMixin` with the `document_ids` of the documents whose lines were written
+document_lines_changed = Signal()
+
+
+class DocumentTotalMixin:
+    """
+    For documents whose `total_field` is maintained by their lines, see `DocumentLineMixin`. Saving
+    a document leaves its persisted total alone unless the total is named in `update_fields`, so an
+    instance loaded before its lines changed never writes a stale total back. The total is deferred
+    afterwards and only read again if it is accessed.
+    """
+    total_field = None
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or kwargs.get('force_insert') or \
+                (update_fields is not None and self.total_field in update_fields):
+            return super().save(*args, **kwargs)
+        if update_fields is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name != self.total_field]
+        super().save(*args, **kwargs)
+        self.__dict__.pop(self.total_field, None)
+
+
+class DocumentLineQuerySet(models.QuerySet):
+    """
+    Applies the change in line totals made by `update()` to the documents, with one query for the
+    totals before and one after. Deleted lines are taken off their documents by `purchase.signals`.
+    """
+
+    def update(self, **kwargs):
+        model = self.model
+        tracked = {model.document_field, model.document_attname(), 'qty', 'estimated_unit_price'}
+        if not tracked.intersection(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic():
+            lines = models.QuerySet(model).filter(pk__in=list(self.values_list('pk', flat=True)))
+            before = model.document_totals(lines)
+            count = super().update(**kwargs)
+            if model.line_total_field:
+                lines.update(**{model.line_total_field: model.line_total_expression()})
+            after = model.document_totals(lines)
+            deltas = {document: after.get(document, Decimal('0.00')) - before.get(document, Decimal('0.00'))
+                      for document in before.keys() | after.keys()}
+            deltas = {document: delta for document, delta in deltas.items() if delta}
+            if deltas:
+                model.apply_document_deltas(deltas)
+        return count
+
+
+class DocumentLineMixin:
+    """
+    Keeps the persisted total of a line's parent document in step with the line.
+
+    Saving or deleting a line applies the difference to the parent with a single `F()` update inside
+    the same transaction, so totals never need to be recomputed from all the lines. The same update
+    moves the parent's `date_updated`, which versions its cached renders. Subclasses name
+    the foreign key to the parent in `document_field` and the parent's total column in
+    `document_total_field`, and `line_total_field` when the line stores its own total.
+
+    Queryset `update()` goes through `DocumentLineQuerySet`, which subclasses use as their manager,
+    and deletes, including cascades, through the delete signals connected in `purchase.signals`.
+    Raw SQL skips both and leaves totals to `rebuild_document_totals`.
+    """
+    document_field = None
+    document_total_field = None
+    line_total_field = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if {cls.document_attname(), 'qty', 'estimated_unit_price'}.issubset(field_names):
+            instance._saved_line = instance.current_line()
+        return instance
+
+    @classmethod
+    def document_attname(cls):
+        return cls._meta.get_field(cls.document_field).attname
+
+    @classmethod
+    def document_model(cls):
+        return cls._meta.get_field(cls.document_field).related_model
+
+    @classmethod
+    def line_total_expression(cls):
+        return ExpressionWrapper(F('qty') * F('estimated_unit_price'),
+                                 output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    @classmethod
+    def document_total_subquery(cls):
+        """
+        The total of a document computed from its lines, for use against the document model.
+        """
+        line_totals = cls.objects.filter(**{cls.document_field: OuterRef('pk')}).order_by() \
+            .values(cls.document_attname()).annotate(total=Sum(cls.line_total_expression())).values('total')
+        return Coalesce(Subquery(line_totals), Value(Decimal('0.00')),
+                        output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    @classmethod
+    def document_totals(cls, lines):
+        """
+        Returns `{document_id: total}` of the given lines.
+        """
+        return {row[cls.document_attname()]: row['total'] or Decimal('0.00') for row in lines.order_by()
+                .values(cls.document_attname()).annotate(total=Sum(cls.line_total_expression()))}
+
+    @classmethod
+    def apply_document_deltas(cls, deltas):
+        """
+        Adds each `{document_id: amount}` delta to the document's persisted total and marks the
+        document as updated.
+        """
+        document_model = cls.document_model()
+        for document_id, delta in deltas.items():
+            if document_id is None:
+                continue
+            document_model.objects.filter(pk=document_id).update(
+                date_updated=timezone.now(), **{cls.document_total_field: F(cls.document_total_field) + delta})
+        if document_model._meta.label in SUMMARY_MODELS:
+            invalidate_model(document_model)
+        document_lines_changed.send(sender=document_model,
+                                    document_ids=[document_id for document_id in deltas if document_id is not None])
+
+    @classmethod
+    def bulk_create_lines(cls, lines):
+        """
+        Inserts new lines with one `bulk_create` and applies their totals with one update per document.
+        """
+        deltas = {}
+        for line in lines:
+            if cls.line_total_field:
+                setattr(line, cls.line_total_field, line.get_line_total())
+            document, total = line.current_line()
+            deltas[document] = deltas.get(document, Decimal('0.00')) + total
+        with transaction.atomic():
+            cls.objects.bulk_create(lines)
+            cls.apply_document_deltas(deltas)
+        for line in lines:
+            line._saved_line = line.current_line()
+        return lines
+
+    @classmethod
+    def bulk_update_lines(cls, lines, fields):
+        """
+        Writes `fields` of existing lines with one `bulk_update` and applies the change in their totals
+        with one update per document.
+        """
+        fields = list(fields)
+        if cls.line_total_field and cls.line_total_field not in fields:
+            fields.append(cls.line_total_field)
+        deltas = {}
+        for line in lines:
+            if cls.line_total_field:
+                setattr(line, cls.line_total_field, line.get_line_total())
+            previous_document, previous_total = line.saved_line()
+            document, total = line.current_line()
+            deltas[document] = deltas.get(document, Decimal('0.00')) + total
+            deltas[previous_document] = deltas.get(previous_document, Decimal('0.00')) - previous_total
+        with transaction.atomic():
+            # A plain queryset, the deltas are applied here
+            models.QuerySet(cls).bulk_update(lines, fields)
+            cls.apply_document_deltas(deltas)
+        for line in lines:
+            line._saved_line = line.current_line()
+        return lines
+
+    def get_line_total(self):
+        if self.qty is None or self.estimated_unit_price is None:
+            return Decimal('0.00')
+        return Decimal(str(self.estimated_unit_price)) * self.qty
+
+    def current_line(self):
+        return getattr(self, self.document_attname()), self.get_line_total()
+
+    def saved_line(self):
+        """
+        The document and line total as last stored in the database.
+        """
+        if self._state.adding:
+            return None, Decimal('0.00')
+        if getattr(self, '_saved_line', None) is not None:
+            return self._saved_line
+        row = type(self).objects.filter(pk=self.pk) \
+            .values_list(self.document_attname(), 'qty', 'estimated_unit_price').first()
+        if row is None:
+            return None, Decimal('0.00')
+        return row[0], Decimal(str(row[2])) * row[1]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous_document, previous_total = self.saved_line()
+            super().save(*args, **kwargs)
+            document, total = self.current_line()
+            deltas = {document: total}
+            deltas[previous_document] = deltas.get(previous_document, Decimal('0.00')) - previous_total
+            self.apply_document_deltas(deltas)
+        self._saved_line = (document, total)
 
 
 class UnitOfMeasure(models.Model):
@@ -183,11 +393,18 @@ class Product(models.Model):
     cost_price = models.DecimalField(max_digits=10, decimal_places=2)
     selling_price = models.DecimalField(max_digits=10, decimal_places=2)
     is_hidden = models.BooleanField(default=False)
+    # Maintained by a database trigger, see purchase.search
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = models.Manager()
 
     class Meta:
         ordering = ['is_hidden', '-created_on']
+        indexes = [models.Index(fields=['is_hidden', '-created_on', '-id'], name='product_keyset_idx'),
+                   GinIndex(fields=['search_vector'], name='product_search_idx'),
+                   GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='product_name_trgm_idx'),
+                   models.Index(Collate(Upper('name'), 'C'), 'id', name='product_name_prefix_idx',
+                                condition=models.Q(is_hidden=False))]
 
     def __str__(self):
         return self.name
@@ -232,11 +449,18 @@ class Vendor(models.Model):
     address = models.CharField(max_length=300, blank=True, null=True)
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     is_hidden = models.BooleanField(default=False)
+    # Maintained by a database trigger, see purchase.search
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = models.Manager()
 
     class Meta:
         ordering = ['is_hidden', '-updated_on']
+        indexes = [models.Index(fields=['is_hidden', '-updated_on', '-id'], name='vendor_keyset_idx'),
+                   GinIndex(fields=['search_vector'], name='vendor_search_idx'),
+                   GinIndex(OpClass(Upper('company_name'), name='gin_trgm_ops'), name='vendor_name_trgm_idx'),
+                   models.Index(Collate(Upper('company_name'), 'C'), 'id', name='vendor_name_prefix_idx',
+                                condition=models.Q(is_hidden=False))]
 
     def __str__(self):
         return self.company_name
@@ -244,35 +468,31 @@ class Vendor(models.Model):
     # Email functionality:
     def send_email(self, subject, message, **kwargs):
         """
-        Sends an email to a vendor.
+        Queues an email to a vendor and returns the outbox job.
         """
-        email = EmailMessage(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            to=[self.email]
-        )
-        email.content_subtype = "html"  # This is necessary to ensure the email is sent as HTML
-        email.send()
+        # content_subtype "html" is necessary to ensure the email is sent as HTML
+        return enqueue_email(subject, message, to=[self.email], content_subtype="html")
 
     @classmethod
-    def send_mass_email(cls, subject, message, **kwargs):
+    def send_mass_email(cls, subject, message, recipients, render=None, batch_size=None, **kwargs):
         """
-        Sends an email to multiple Vendors.
+        Queues an email to multiple Vendors and returns the outbox job.
+
+        `recipients` is a Vendor queryset, whose active vendors' addresses are streamed from the
+        database, or an iterable of email addresses. Addresses are sent in bounded BCC batches unless
+        `render(recipient)` is given, in which case every recipient gets the `(subject, message)` it
+        returns; vendor recipients are dicts with `id`, `company_name` and `email`.
         """
-        vendors = cls.objects.all()
-        vendor_emails = [vendor.email for vendor in vendors]
-        email = EmailMessage(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            bcc=vendor_emails,
-        )
-        email.content_subtype = "html"  # This is necessary to ensure the email is sent as HTML
-        email.send()
-
-
-class PurchaseRequest(models.Model):
+        if isinstance(recipients, models.QuerySet):
+            recipients = recipients.filter(is_hidden=False).exclude(email='').order_by().distinct() \
+                .values('id', 'company_name', 'email').iterator(chunk_size=get_outbox_setting('INSERT_BATCH_SIZE'))
+        else:
+            recipients = ({'email': email} for email in recipients)
+        return enqueue_mass_email(subject, message, recipients, render=render, content_subtype="html",
+                                  batch_size=batch_size)
+
+
+class PurchaseRequest(DocumentTotalMixin, models.Model):
     id = models.CharField(max_length=10, primary_key=True, unique=True, default=generate_unique_pr_id, editable=False)
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
@@ -282,7 +502,14 @@ class PurchaseRequest(models.Model):
     status = models.CharField(max_length=20, choices=PURCHASE_REQUEST_STATUS, default='draft')
     purpose = CKEditor5Field(blank=True, null=True)
     suggested_vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE)
+    total_price = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), editable=False)
+    total_field = 'total_price'
+    # The RFQ the request was converted into, see purchase.conversions
+    request_for_quotation = models.ForeignKey('RequestForQuotation', on_delete=models.SET_NULL, null=True,
+                                              blank=True, editable=False, related_name='purchase_requests')
     is_hidden = models.BooleanField(default=False)
+    # Maintained by a database trigger, see purchase.search
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = models.Manager()
     pr_draft = DraftPRManager()
@@ -290,19 +517,20 @@ class PurchaseRequest(models.Model):
     pr_submitted = SubmittedPRManager()
     pr_rejected = RejectedPRManager()
 
-    @property
-    def total_price(self):
-        total_price = sum(item.total_price for item in self.items.all())
-        return total_price
-
     class Meta:
         ordering = ['is_hidden', '-date_updated']
+        indexes = [models.Index(fields=['is_hidden', '-date_updated', '-id'], name='pr_keyset_idx'),
+                   # Serves the status managers and, covering the total, the status summary
+                   models.Index(fields=['status', 'is_hidden', '-date_updated', '-id'], include=['total_price'],
+                                name='pr_status_idx'),
+                   GinIndex(fields=['search_vector'], name='pr_search_idx'),
+                   GinIndex(OpClass(Upper('id'), name='gin_trgm_ops'), name='pr_id_trgm_idx')]
 
     def __str__(self):
         return self.id
 
 
-class PurchaseRequestItem(models.Model):
+class PurchaseRequestItem(DocumentLineMixin, models.Model):
     purchase_request = models.ForeignKey(PurchaseRequest, on_delete=models.CASCADE, related_name='items')
     date_created = models.DateTimeField(auto_now_add=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -311,7 +539,11 @@ class PurchaseRequestItem(models.Model):
     estimated_unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
-    objects = models.Manager()
+    objects = DocumentLineQuerySet.as_manager()
+
+    document_field = 'purchase_request'
+    document_total_field = 'total_price'
+    line_total_field = 'total_price'
 
     class Meta:
         ordering = ['-date_created']
@@ -326,7 +558,7 @@ def update_total_price(sender, instance, **kwargs):
     instance.total_price = instance.qty * instance.estimated_unit_price
 
 
-class RequestForQuotation(models.Model):
+class RequestForQuotation(DocumentTotalMixin, models.Model):
     id = models.CharField(max_length=10, primary_key=True, unique=True, default=generate_unique_rfq_id, editable=False)
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
@@ -334,7 +566,11 @@ class RequestForQuotation(models.Model):
                                        help_text="Leave blank for no expiry")
     vendor = models.ForeignKey('Vendor', on_delete=models.CASCADE)
     status = models.CharField(max_length=100, choices=RFQ_STATUS, default='awaiting')
+    rfq_total_price = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), editable=False)
+    total_field = 'rfq_total_price'
     is_hidden = models.BooleanField(default=False)
+    # Maintained by a database trigger, see purchase.search
+    search_vector = SearchVectorField(null=True, editable=False)
 
     # def __init__(self, *args, **kwargs):
     #     self._formatted_id = None
@@ -357,15 +593,15 @@ class RequestForQuotation(models.Model):
 
     class Meta:
         ordering = ['is_hidden', '-date_updated']
+        indexes = [models.Index(fields=['is_hidden', '-date_updated', '-id'], name='rfq_keyset_idx'),
+                   models.Index(fields=['status', 'is_hidden', '-date_updated', '-id'], include=['rfq_total_price'],
+                                name='rfq_status_idx'),
+                   GinIndex(fields=['search_vector'], name='rfq_search_idx'),
+                   GinIndex(OpClass(Upper('id'), name='gin_trgm_ops'), name='rfq_id_trgm_idx')]
 
     def __str__(self):
         return self.id
 
-    @property
-    def rfq_total_price(self):
-        rfq_total_price = sum(item.total_price for item in self.items.all())
-        return rfq_total_price
-
     # @property
     # def duration_till_expiration(self):
     #     if self.expiry_date:
@@ -388,33 +624,18 @@ class RequestForQuotation(models.Model):
 
     def send_email(self):
         """
-        A function to send an email containing the RFQ to the vendor when a RFQ is created.
+        A function to queue an email containing the RFQ to its vendor, and to the vendors that have quoted
+        on it, when a RFQ is created. Returns the outbox job.
         """
         subject = f"Request for Quotation: {self.id}"
-        rfq_data = {
-            'id': self.id,
-            'date_created': self.date_created.strftime('%Y-%m-%d'),
-            'date_updated': self.date_updated.strftime('%Y-%m-%d'),
-            'expiry_date': self.expiry_date.strftime('%Y-%m-%d') if self.expiry_date else None,
-            'vendor': self.vendor.company_name,
-            'status': self.status,
-            'items': [
-                {
-                    'product': item.product.name,
-                    'description': item.description,
-                    'qty': item.qty,
-                    'estimated_unit_price': str(item.estimated_unit_price),
-                    'total_price': str(item.total_price)
-                }
-                for item in self.items.all()
-            ],
-            'rfq_total_price': str(self.rfq_total_price)
-        }
-        message = json.dumps(rfq_data)
-        self.vendor.send_mass_email(subject, message)
-
-
-class RequestForQuotationItem(models.Model):
+        message = render_document(self)
+        # The RFQ's vendor and every vendor that has quoted on it, each addressed by name
+        vendors = Vendor.objects.filter(models.Q(pk=self.vendor_id) | models.Q(rfq_quotes__rfq=self))
+        return Vendor.send_mass_email(subject, message, vendors, render=lambda recipient: (
+            subject, render_document(self, greeting=format_html('<p>Dear {},</p>', recipient['company_name']))))
+
+
+class RequestForQuotationItem(DocumentLineMixin, models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     request_for_quotation = models.ForeignKey(RequestForQuotation, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -422,7 +643,10 @@ class RequestForQuotationItem(models.Model):
     qty = models.PositiveIntegerField(default=1, verbose_name="QTY")
     estimated_unit_price = models.DecimalField(max_digits=10, decimal_places=2)
 
-    objects = models.Manager()
+    objects = DocumentLineQuerySet.as_manager()
+
+    document_field = 'request_for_quotation'
+    document_total_field = 'rfq_total_price'
 
     def __init__(self, *args, **kwargs):
         self._total_price = None
@@ -434,7 +658,10 @@ class RequestForQuotationItem(models.Model):
         return self._total_price
 
     def set_total_price(self, *args, **kwargs):
-        self._total_price = self.estimated_unit_price * self.qty
+        # Prefer the line total annotated by the viewsets' items prefetch
+        self._total_price = getattr(self, 'line_total', None)
+        if self._total_price is None:
+            self._total_price = self.estimated_unit_price * self.qty
 
     total_price = property(get_total_price, set_total_price, doc="total price property")
 
@@ -445,35 +672,36 @@ class RequestForQuotationItem(models.Model):
         ordering = ['-date_created']
 
 
-class RFQVendorQuote(models.Model):
+class RFQVendorQuote(DocumentTotalMixin, models.Model):
     date_opened = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
     rfq = models.ForeignKey("RequestForQuotation", on_delete=models.CASCADE, related_name='quotes')
     vendor = models.ForeignKey("Vendor", on_delete=models.CASCADE, related_name='rfq_quotes')
+    quote_total_price = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), editable=False)
+    total_field = 'quote_total_price'
     is_hidden = models.BooleanField(default=False)
 
     objects = models.Manager()
 
-    @property
-    def quote_total_price(self):
-        quote_total_price = sum(item.total_price for item in self.items.all())
-        return quote_total_price
-
     class Meta:
         ordering = ['is_hidden', '-date_updated']
+        indexes = [models.Index(fields=['is_hidden', '-date_updated', '-id'], name='rfq_quote_keyset_idx')]
 
     def __str__(self):
         return f"{self.vendor} - {self.rfq}"
 
 
-class RFQVendorQuoteItem(models.Model):
+class RFQVendorQuoteItem(DocumentLineMixin, models.Model):
     rfq_vendor_quote = models.ForeignKey("RFQVendorQuote", on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     description = CKEditor5Field(null=True, blank=True)
     qty = models.PositiveIntegerField(default=1, verbose_name="QTY")
     estimated_unit_price = models.DecimalField(max_digits=10, decimal_places=2)
 
-    objects = models.Manager()
+    objects = DocumentLineQuerySet.as_manager()
+
+    document_field = 'rfq_vendor_quote'
+    document_total_field = 'quote_total_price'
 
     def __init__(self, *args, **kwargs):
         self._total_price = None
@@ -485,7 +713,10 @@ class RFQVendorQuoteItem(models.Model):
         return self._total_price
 
     def set_total_price(self, *args, **kwargs):
-        self._total_price = self.estimated_unit_price * self.qty
+        # Prefer the line total annotated by the viewsets' items prefetch
+        self._total_price = getattr(self, 'line_total', None)
+        if self._total_price is None:
+            self._total_price = self.estimated_unit_price * self.qty
 
     total_price = property(get_total_price, set_total_price, doc="total price property")
 
@@ -493,13 +724,22 @@ class RFQVendorQuoteItem(models.Model):
         return self.product.name
 
 
-class PurchaseOrder(models.Model):
+class PurchaseOrder(DocumentTotalMixin, models.Model):
     id = models.CharField(max_length=10, primary_key=True, unique=True, default=generate_unique_po_id, editable=False)
     status = models.CharField(max_length=200, choices=PURCHASE_ORDER_STATUS, default="draft")
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
     vendor = models.ForeignKey("Vendor", on_delete=models.CASCADE, related_name="orders")
+    po_total_price = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), editable=False)
+    total_field = 'po_total_price'
+    # The RFQ, and the vendor quote when one was chosen, the order was converted from
+    request_for_quotation = models.ForeignKey('RequestForQuotation', on_delete=models.SET_NULL, null=True,
+                                              blank=True, editable=False, related_name='purchase_orders')
+    rfq_vendor_quote = models.ForeignKey('RFQVendorQuote', on_delete=models.SET_NULL, null=True, blank=True,
+                                         editable=False, related_name='purchase_orders')
     is_hidden = models.BooleanField(default=False)
+    # Maintained by a database trigger, see purchase.search
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = models.Manager()
     po_draft = DraftPOManager()
@@ -509,43 +749,26 @@ class PurchaseOrder(models.Model):
 
     class Meta:
         ordering = ['is_hidden', '-date_updated']
+        indexes = [models.Index(fields=['is_hidden', '-date_updated', '-id'], name='po_keyset_idx'),
+                   models.Index(fields=['status', 'is_hidden', '-date_updated', '-id'], include=['po_total_price'],
+                                name='po_status_idx'),
+                   GinIndex(fields=['search_vector'], name='po_search_idx'),
+                   GinIndex(OpClass(Upper('id'), name='gin_trgm_ops'), name='po_id_trgm_idx')]
 
     def __str__(self):
         return self.id
 
-    @property
-    def po_total_price(self):
-        po_total_price = sum(item.total_price for item in self.items.all())
-        return po_total_price
-
     def send_email(self):
         """
-        A function to send an email containing the Purchase Order to the vendor when a Purchase Order is created.
+        A function to queue an email containing the Purchase Order to the vendor when a Purchase Order is
+        created. Returns the outbox job.
         """
         subject = f"Purchase Order: {self.id}"
-        po_data = {
-            'id': self.id,
-            'date_created': self.date_created.strftime('%Y-%m-%d'),
-            'date_updated': self.date_updated.strftime('%Y-%m-%d'),
-            'status': self.status,
-            'vendor': self.vendor.company_name,
-            'items': [
-                {
-                    'product': item.product.name,
-                    'description': item.description,
-                    'qty': item.qty,
-                    'estimated_unit_price': str(item.estimated_unit_price),
-                    'total_price': str(item.total_price)
-                }
-                for item in self.items.all()
-            ],
-            'po_total_price': str(self.po_total_price)
-        }
-        message = json.dumps(po_data)
-        self.vendor.send_mass_email(subject, message)
-
-
-class PurchaseOrderItem(models.Model):
+        message = render_document(self)
+        return Vendor.send_mass_email(subject, message, Vendor.objects.filter(pk=self.vendor_id))
+
+
+class PurchaseOrderItem(DocumentLineMixin, models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     purchase_order = models.ForeignKey("PurchaseOrder", on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -553,7 +776,10 @@ class PurchaseOrderItem(models.Model):
     qty = models.PositiveIntegerField(default=1, verbose_name="QTY")
     estimated_unit_price = models.DecimalField(max_digits=10, decimal_places=2)
 
-    objects = models.Manager()
+    objects = DocumentLineQuerySet.as_manager()
+
+    document_field = 'purchase_order'
+    document_total_field = 'po_total_price'
 
     class Meta:
         ordering = ['-date_created']
@@ -568,7 +794,10 @@ class PurchaseOrderItem(models.Model):
         return self._total_price
 
     def set_total_price(self, *args, **kwargs):
-        self._total_price = self.estimated_unit_price * self.qty
+        # Prefer the line total annotated by the viewsets' items prefetch
+        self._total_price = getattr(self, 'line_total', None)
+        if self._total_price is None:
+            self._total_price = self.estimated_unit_price * self.qty
 
     total_price = property(get_total_price, set_total_price, doc="total price property")
 
@@ -576,35 +805,36 @@ class PurchaseOrderItem(models.Model):
         return self.product.name
 
 
-class POVendorQuote(models.Model):
+class POVendorQuote(DocumentTotalMixin, models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
     purchase_order = models.ForeignKey("PurchaseOrder", on_delete=models.CASCADE, related_name='quotes')
     vendor = models.ForeignKey("Vendor", on_delete=models.CASCADE, related_name='po_quotes')
+    quote_total_price = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), editable=False)
+    total_field = 'quote_total_price'
     is_hidden = models.BooleanField(default=False)
 
     objects = models.Manager()
 
     class Meta:
         ordering = ['is_hidden', '-date_updated']
+        indexes = [models.Index(fields=['is_hidden', '-date_updated', '-id'], name='po_quote_keyset_idx')]
 
     def __str__(self):
         return f"{self.vendor} - {self.purchase_order}"
 
-    @property
-    def quote_total_price(self):
-        quote_total_price = sum(item.total_price for item in self.items.all())
-        return quote_total_price
-
 
-class POVendorQuoteItem(models.Model):
+class POVendorQuoteItem(DocumentLineMixin, models.Model):
     po_vendor_quote = models.ForeignKey("POVendorQuote", on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     description = CKEditor5Field(null=True, blank=True)
     qty = models.PositiveIntegerField(default=1, verbose_name="QTY")
     estimated_unit_price = models.DecimalField(max_digits=10, decimal_places=2)
 
-    objects = models.Manager()
+    objects = DocumentLineQuerySet.as_manager()
+
+    document_field = 'po_vendor_quote'
+    document_total_field = 'quote_total_price'
 
     def __init__(self, *args, **kwargs):
         self._total_price = None
@@ -616,9 +846,114 @@ class POVendorQuoteItem(models.Model):
         return self._total_price
 
     def set_total_price(self, *args, **kwargs):
-        self._total_price = self.estimated_unit_price * self.qty
+        # Prefer the line total annotated by the viewsets' items prefetch
+        self._total_price = getattr(self, 'line_total', None)
+        if self._total_price is None:
+            self._total_price = self.estimated_unit_price * self.qty
 
     total_price = property(get_total_price, set_total_price, doc="total price property")
 
     def __str__(self):
         return self.product.name
+
+
+# Line models whose parent documents carry a persisted total, see `DocumentLineMixin`
+DOCUMENT_LINE_MODELS = (
+    PurchaseRequestItem,
+    RequestForQuotationItem,
+    RFQVendorQuoteItem,
+    PurchaseOrderItem,
+    POVendorQuoteItem,
+)
+
+
+SPEND_SOURCE = (
+    ('purchase_order', 'Purchase Orders'),
+    ('purchase_request', 'Purchase Requests'),
+)
+
+
+class SpendRollup(models.Model):
+    """
+    Spend of the tenant's documents per month, status, vendor, product category and department,
+    maintained by `purchase.spend`. Department is only known for purchase requests.
+    """
+    source = models.CharField(max_length=20, choices=SPEND_SOURCE)
+    month = models.DateField()
+    status = models.CharField(max_length=20)
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, null=True, related_name='+')
+    category = models.ForeignKey(ProductCategory, on_delete=models.SET_NULL, null=True, related_name='+')
+    department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, related_name='+')
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    qty = models.PositiveBigIntegerField(default=0)
+    lines = models.PositiveIntegerField(default=0)
+    # Documents with lines in this row, a document whose lines span several categories counts in each
+    documents = models.PositiveIntegerField(default=0)
+    date_updated = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ['source', 'month']
+        indexes = [models.Index(fields=['source', 'month', 'vendor'], name='spend_vendor_idx'),
+                   models.Index(fields=['source', 'month', 'category'], name='spend_category_idx'),
+                   models.Index(fields=['source', 'month', 'department'], name='spend_department_idx')]
+
+    def __str__(self):
+        return f"{self.source} {self.month:%Y-%m}: {self.amount}"
+
+
+IMPORT_KIND = (
+    ('unit_of_measure', 'Units of Measure'),
+    ('product_category', 'Product Categories'),
+    ('vendor_category', 'Vendor Categories'),
+    ('vendor', 'Vendors'),
+    ('product', 'Products'),
+)
+
+IMPORT_FORMAT = (
+    ('csv', 'CSV'),
+    ('jsonl', 'JSON Lines'),
+)
+
+IMPORT_STATUS = (
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('completed', 'Completed'),
+    ('failed', 'Failed'),
+)
+
+
+def import_file_path(instance, filename):
+    return f"imports/{connection.schema_name}/{uuid.uuid4().hex}/{filename}"
+
+
+class ImportJob(models.Model):
+    """
+    A bulk import of reference data from an uploaded file, run by `purchase.imports`. Rows are
+    committed a chunk at a time together with `rows_processed`, so an interrupted job resumes after
+    its last committed chunk.
+    """
+    kind = models.CharField(max_length=20, choices=IMPORT_KIND)
+    file = models.FileField(upload_to=import_file_path)
+    file_format = models.CharField(max_length=10, choices=IMPORT_FORMAT, default='csv')
+    status = models.CharField(max_length=20, choices=IMPORT_STATUS, default='pending')
+    requester = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='+')
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_created = models.PositiveIntegerField(default=0)
+    rows_updated = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    # `{"row": <1-based data row>, "errors": {field: [messages]}}`, up to PURCHASE_IMPORT_MAX_ERRORS
+    errors = models.JSONField(default=list, blank=True)
+    last_error = models.TextField(blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_updated = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ['-date_created']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} import {self.pk} ({self.status})"
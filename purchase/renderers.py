@@ -0,0 +1,60 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+
+from .fields import COMPACT_FORMAT
+from .serializers import DynamicFieldsMixin
+
+
+class CompactJSONRenderer(JSONRenderer):
+    """
+    Renders the compact representation, selected with `?format=compact` or
+    `Accept: application/json; representation=compact`. Rows carry primary keys instead of
+    hyperlinks, and responses of serialized rows get a `links` object with the URL templates of the
+    rows and their related fields: added next to `results` on pages, and wrapping other rows as
+    `{"links": ..., "data": ...}`. Plain `application/json` never selects this renderer.
+    """
+    media_type = 'application/json; representation=compact'
+    format = COMPACT_FORMAT
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        links = self.get_links(data, renderer_context)
+        if links:
+            if isinstance(data, dict) and 'results' in data:
+                data = {**data, 'links': links}
+            else:
+                data = {'links': links, 'data': data}
+        return super().render(data, accepted_media_type, renderer_context)
+
+    @staticmethod
+    def get_links(data, renderer_context):
+        view, response = renderer_context.get('view'), renderer_context.get('response')
+        if response is None or response.exception or not hasattr(view, 'get_serializer_class'):
+            return None
+        rows = data.get('results') if isinstance(data, dict) and 'results' in data else data
+        # Only rows of the view's serializer, which always have an `id` in this representation
+        if isinstance(rows, dict):
+            rows = [rows]
+        if not isinstance(rows, list) or not all(isinstance(row, dict) and 'id' in row for row in rows):
+            return None
+        serializer = view.get_serializer_class()(context=view.get_serializer_context())
+        if not isinstance(serializer, DynamicFieldsMixin):
+            return None
+        return serializer.get_url_templates(renderer_context.get('request'))
+
+
+class CompactContentNegotiation(DefaultContentNegotiation):
+    """
+    Selects the renderer named by `?format=` (or a format suffix) whatever the Accept header. The
+    default negotiation also matches media type parameters, so the usual `*/*` never selects
+    `application/json; representation=compact`. Selection by Accept header is unchanged.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format = format_suffix or request.query_params.get(self.settings.URL_FORMAT_OVERRIDE)
+        if format:
+            for renderer in renderers:
+                if renderer.format == format:
+                    return renderer, renderer.media_type
+        return super().select_renderer(request, renderers, format_suffix)
+
@@ -0,0 +1,166 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core import checks
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from rest_framework import filters
+
+# Text search configuration of the search vectors, which the triggers of migration 0005_search
+# are built with
+SEARCH_CONFIG = 'simple'
+
+# Models with a trigger-maintained `search_vector` column. `vector` lists the columns the trigger
+# indexes, `trigram` the columns with a `gin_trgm_ops` index on `UPPER(column)` that are also matched as
+# substrings, and `related` the text fields of related rows, which are matched on the related table
+# and then looked up by foreign key.
+SEARCH_DOCUMENTS = {
+    'purchase.Product': {
+        'vector': ('name', 'type'),
+        'trigram': ('name',),
+        'related': ('category__name', 'unit_of_measure__name', 'company__company_name'),
+    },
+    'purchase.Vendor': {
+        'vector': ('company_name', 'email', 'address', 'phone_number'),
+        'trigram': ('company_name',),
+        'related': ('category__name',),
+    },
+    'purchase.PurchaseRequest': {
+        'vector': ('id', 'purpose', 'status'),
+        'trigram': ('id',),
+        'related': ('requester__username', 'suggested_vendor__company_name', 'department__name'),
+    },
+    'purchase.RequestForQuotation': {
+        'vector': ('id', 'status'),
+        'trigram': ('id',),
+        'related': ('vendor__company_name',),
+    },
+    'purchase.PurchaseOrder': {
+        'vector': ('id', 'status'),
+        'trigram': ('id',),
+        'related': ('vendor__company_name',),
+    },
+}
+
+# Shorter terms cannot use a trigram index
+TRIGRAM_MIN_LENGTH = 3
+
+
+def get_search_document(model):
+    return SEARCH_DOCUMENTS.get(model._meta.label)
+
+
+def get_related_limit():
+    return getattr(settings, 'PURCHASE_SEARCH_RELATED_LIMIT', 1000)
+
+
+def prefix_query(words):
+    return SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config=SEARCH_CONFIG)
+
+
+def related_condition(model, path, term):
+    """
+    Matches `path` (`<foreign key>__<field>`) against the related table first. Up to
+    `PURCHASE_SEARCH_RELATED_LIMIT` matching keys are inlined so the database can combine the foreign
+    key index with the search index; past that the match stays a subquery.
+    """
+    relation, field = path.split('__', 1)
+    related_field = model._meta.get_field(relation)
+    matches = related_field.related_model._default_manager.filter(**{f'{field}__icontains': term}) \
+        .order_by().values_list('pk', flat=True)
+    limit = get_related_limit()
+    pks = list(matches[:limit + 1])
+    if len(pks) > limit:
+        pks = matches
+    return Q(**{f'{related_field.attname}__in': pks})
+
+
+def search_queryset(queryset, terms):
+    """
+    Filters a queryset of a model in `SEARCH_DOCUMENTS` to the rows matching every term, ranked by
+    their search vector. A term matches a row when its words prefix words of the row's search vector,
+    it is a substring of one of the trigram indexed columns, or it matches one of the related fields.
+    """
+    document = get_search_document(queryset.model)
+    conditions, words = [], []
+    for term in terms:
+        term_words = re.findall(r'[^\W_]+', term)
+        if not term_words:
+            continue
+        words += term_words
+        condition = Q(search_vector=prefix_query(term_words))
+        if len(term) >= TRIGRAM_MIN_LENGTH:
+            condition |= reduce(or_, (Q(**{f'{field}__icontains': term}) for field in document['trigram']), Q())
+        for path in document['related']:
+            condition |= related_condition(queryset.model, path, term)
+        conditions.append(condition)
+    if not conditions:
+        return queryset
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    return queryset.filter(reduce(and_, conditions)) \
+        .annotate(search_rank=SearchRank(F('search_vector'), prefix_query(words))) \
+        .order_by('-search_rank', *ordering)
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    A `SearchFilter` that searches the models in `SEARCH_DOCUMENTS` with their indexed search vectors
+    and ranks the results. Other models are searched over the view's `search_fields` as usual.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or get_search_document(queryset.model) is None:
+            return super().filter_queryset(request, queryset, view)
+        return search_queryset(queryset, terms)
+
+
+def resolve_field_path(model, path):
+    """
+    Returns the field `path` (e.g. `vendor__company_name`) refers to, raising `FieldDoesNotExist`.
+    """
+    *relations, name = path.split('__')
+    for relation in relations:
+        field = model._meta.get_field(relation)
+        if not field.is_relation:
+            raise FieldDoesNotExist(f"{model.__name__}.{relation} is not a relation")
+        model = field.related_model
+    return model._meta.get_field(name)
+
+
+@checks.register()
+def check_search_fields(app_configs, **kwargs):
+    """
+    Checks that the search fields of the purchase viewsets and `SEARCH_DOCUMENTS` exist.
+    """
+    from .views import SearchDeleteViewSet
+
+    errors = []
+    paths = []
+    for label, document in SEARCH_DOCUMENTS.items():
+        model = apps.get_model(label)
+        for key in ('vector', 'trigram', 'related'):
+            paths += [(label, model, path) for path in document[key]]
+        for path in document['related']:
+            if len(path.split('__')) != 2:
+                errors.append(checks.Error(f"Related search field '{path}' of {label} must be "
+                                           f"'<foreign key>__<field>'.", id='purchase.E002'))
+
+    viewsets = list(SearchDeleteViewSet.__subclasses__())
+    for viewset in viewsets:
+        viewsets += viewset.__subclasses__()
+        model = viewset.queryset.model if viewset.queryset is not None else None
+        if model is not None:
+            paths += [(viewset.__name__, model, path.lstrip('^=@$')) for path in viewset.search_fields]
+
+    for owner, model, path in paths:
+        try:
+            resolve_field_path(model, path)
+        except FieldDoesNotExist:
+            errors.append(checks.Error(f"Search field '{path}' of {owner} does not exist on {model.__name__}.",
+                                       id='purchase.E001'))
+    return errors
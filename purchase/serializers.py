@@ -1,15 +1,147 @@
+import sys
+
 from django.contrib.auth.models import User
+from django.urls import NoReverseMatch
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.reverse import reverse
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param
+from .fields import CachedHyperlinkedRelatedField, PreloadedHyperlinkedRelatedField, is_compact
 from .models import PurchaseRequest, PurchaseRequestItem, Department, Vendor, \
     Product, RequestForQuotation, RequestForQuotationItem, ProductCategory, \
     VendorCategory, UnitOfMeasure, RFQVendorQuote, RFQVendorQuoteItem, \
-    PurchaseOrder, PurchaseOrderItem, POVendorQuote, POVendorQuoteItem
+    PurchaseOrder, PurchaseOrderItem, POVendorQuote, POVendorQuoteItem, ImportJob
 
 
 # Switched to HyperlinkedIdentityField, HyperlinkedRelatedField for hyperlink support
 # Switched to HyperlinkedModelSerializer for dynamic field selection
 # The url field is used to link to the detail view of the model in the API response
 
+def parse_field_selection(value):
+    """
+    Parses a comma separated list of field names, with dots for the fields of nested serializers,
+    into a tree: `'url,items.qty'` gives `{'url': {}, 'items': {'qty': {}}}`.
+    """
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (name.strip() for name in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+class DynamicFieldsMixin:
+    """
+    Lets clients shape the output of a read with query parameters: `?fields=` keeps only the listed
+    fields, `?omit=` drops fields and `?expand=` replaces the hyperlinks listed in
+    `Meta.expandable_fields` (field name -> serializer class name) with their nested representation.
+    Fields of nested serializers are named with dots, e.g. `?fields=url,items.qty&expand=items.product`.
+
+    Dropped fields are removed before serialization, so their properties are never evaluated, and
+    `SoftDeleteWithModelViewSet` skips the prefetches they would need using `get_selected_sources()`
+    and `get_expanded_paths()`. Writes always use every field.
+
+    In the compact representation (see `purchase.fields.is_compact`) the `url` of each row is
+    replaced with its `id` and related fields use primary keys; `get_url_templates()` gives the URL
+    patterns the renderer sends once per response instead.
+    """
+    selection_params = ('fields', 'omit', 'expand')
+    # Stands in for the primary key when reversing URL templates, then replaced with `{id}`
+    url_template_placeholder = '__id__'
+
+    def get_selection(self):
+        """
+        Returns the `(fields, omit, expand)` trees of this serializer: from the query parameters for the
+        top-level serializer, from its parent's selection otherwise. None when nothing is selected.
+        """
+        if hasattr(self, '_selection'):
+            return self._selection
+        parent = self.parent.parent if isinstance(self.parent, serializers.ListSerializer) else self.parent
+        request = self.context.get('request')
+        if parent is not None or request is None or request.method not in SAFE_METHODS:
+            return None
+        trees = [parse_field_selection(request.query_params.get(param, '')) for param in self.selection_params]
+        return trees if any(trees) else None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if is_compact(self.context) and isinstance(fields.get(self.url_field_name),
+                                                   serializers.HyperlinkedIdentityField):
+            del fields[self.url_field_name]
+            if 'id' not in fields:
+                fields = {'id': serializers.ReadOnlyField(source='pk'), **fields}
+        selection = self.get_selection()
+        self.expanded_fields = {}
+        if selection is None:
+            return fields
+        only, omit, expand = selection
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in expand:
+            if name in expandable and name in fields:
+                serializer_class = getattr(sys.modules[type(self).__module__], expandable[name])
+                source = fields[name].source or name
+                # DRF rejects a `source` equal to the field name
+                fields[name] = serializer_class(read_only=True, **({'source': source} if source != name else {}))
+                self.expanded_fields[name] = source
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only}
+        fields = {name: field for name, field in fields.items() if name not in omit or omit[name]}
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, DynamicFieldsMixin):
+                nested._selection = [tree.get(name, {}) for tree in selection]
+                if not any(nested._selection):
+                    nested._selection = None
+        return fields
+
+    def get_url_templates(self, request=None, prefix=''):
+        """
+        Returns the URL pattern of this serializer's rows (`self`) and of each hyperlinked field, by field
+        name with dots for nested serializers, with `{id}` where the primary key goes.
+        """
+        templates = {}
+        for name, field in self._declared_fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, DynamicFieldsMixin):
+                templates.update(nested.get_url_templates(request, f'{prefix}{name}.'))
+                continue
+            if not isinstance(field, serializers.HyperlinkedRelatedField):
+                continue
+            key = f"{prefix}{'self' if isinstance(field, serializers.HyperlinkedIdentityField) else name}"
+            try:
+                url = reverse(field.view_name, kwargs={field.lookup_url_kwarg: self.url_template_placeholder},
+                              request=request)
+            except NoReverseMatch:
+                continue
+            # `reverse` keeps the request's ?format=, which is not part of the row URLs
+            if api_settings.URL_FORMAT_OVERRIDE:
+                url = remove_query_param(url, api_settings.URL_FORMAT_OVERRIDE)
+            templates[key] = url.replace(self.url_template_placeholder, '{id}')
+        return templates
+
+    def get_selected_sources(self):
+        """
+        Returns the model attributes the rendered fields read, by the first part of their source.
+        """
+        return {field.source.split('.')[0] for field in self.fields.values() if field.source != '*'}
+
+    def get_expanded_paths(self):
+        """
+        Returns the lookups of the expanded relations, including those of nested serializers, e.g.
+        `['vendor', 'items__product']`.
+        """
+        paths = []
+        for name, field in self.fields.items():
+            if name in self.expanded_fields:
+                paths.append(self.expanded_fields[name].replace('.', '__'))
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, DynamicFieldsMixin):
+                prefix = field.source.replace('.', '__')
+                paths += [f'{prefix}__{path}' for path in nested.get_expanded_paths()]
+        return paths
+
+
 class UserSerializer(serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='user-detail')
 
@@ -18,7 +150,7 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
         fields = ['id', 'url', 'username', 'email', 'first_name', 'last_name']
 
 
-class DepartmentSerializer(serializers.HyperlinkedModelSerializer):
+class DepartmentSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name="department-detail")
 
     class Meta:
@@ -26,59 +158,100 @@ class DepartmentSerializer(serializers.HyperlinkedModelSerializer):
         fields = ['url', 'name', 'is_hidden']
 
 
-class PurchaseRequestItemSerializer(serializers.HyperlinkedModelSerializer):
+class BulkLineListSerializer(serializers.ListSerializer):
+    """
+    Validates and writes many document lines in one pass: hyperlinked objects are loaded with one
+    `in_bulk` per field for all the rows, lines are written with `bulk_create`/`bulk_update` in a
+    single transaction and validation errors are reported by row index.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.preload_related_objects(data)
+        try:
+            return super().to_internal_value(data)
+        except serializers.ValidationError as e:
+            if isinstance(e.detail, list):
+                raise serializers.ValidationError({index: errors for index, errors in enumerate(e.detail) if errors})
+            raise
+
+    def preload_related_objects(self, data):
+        related_objects = self._context.setdefault('related_objects', {})
+        for field in self.child.fields.values():
+            if isinstance(field, PreloadedHyperlinkedRelatedField) and not field.read_only:
+                related_objects[field.field_name] = field.preload(
+                    row.get(field.field_name) for row in data if isinstance(row, dict))
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return model.bulk_create_lines([model(**attrs) for attrs in validated_data])
+
+    def update(self, instances, validated_data):
+        fields = set()
+        for instance, attrs in zip(instances, validated_data):
+            for attr, value in attrs.items():
+                setattr(instance, attr, value)
+                fields.add(attr)
+        if not fields:
+            return instances
+        return self.child.Meta.model.bulk_update_lines(instances, sorted(fields))
+
+
+class PurchaseRequestItemSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='purchase-request-item-detail')
-    purchase_request = serializers.HyperlinkedRelatedField(
+    purchase_request = PreloadedHyperlinkedRelatedField(
         queryset=PurchaseRequest.objects.filter(is_hidden=False),
         view_name='purchase-request-detail')
-    product = serializers.HyperlinkedRelatedField(
+    product = PreloadedHyperlinkedRelatedField(
         queryset=Product.objects.filter(is_hidden=False),
         view_name='product-detail')
     total_price = serializers.ReadOnlyField()
 
     class Meta:
         model = PurchaseRequestItem
+        expandable_fields = {'product': 'ProductSerializer'}
+        list_serializer_class = BulkLineListSerializer
         fields = ['id', 'url', 'purchase_request', 'product', 'description', 'qty',
                   'estimated_unit_price', 'total_price']
 
 
 
-class PurchaseRequestSerializer(serializers.HyperlinkedModelSerializer):
+class PurchaseRequestSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='purchase-request-detail')
-    suggested_vendor = serializers.HyperlinkedRelatedField(queryset=Vendor.objects.filter(is_hidden=False),
-                                                           view_name='vendor-detail')
-    department = serializers.HyperlinkedRelatedField(queryset=Department.objects.filter(is_hidden=False),
-                                                     view_name="department-detail")
+    suggested_vendor = CachedHyperlinkedRelatedField(queryset=Vendor.objects.filter(is_hidden=False),
+                                                     view_name='vendor-detail')
+    department = CachedHyperlinkedRelatedField(queryset=Department.objects.filter(is_hidden=False),
+                                               view_name="department-detail")
     items = PurchaseRequestItemSerializer(many=True, read_only=True)
     total_price = serializers.ReadOnlyField()
 
     class Meta:
         model = PurchaseRequest
+        expandable_fields = {'department': 'DepartmentSerializer', 'suggested_vendor': 'VendorSerializer'}
         fields = ['url', 'department', 'status', 'date_created', 'date_updated',
                   'purpose', 'suggested_vendor', 'items', 'total_price', 'is_hidden']
 
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
         purchase_request = PurchaseRequest.objects.create(**validated_data)
-        for item_data in items_data:
-            PurchaseRequestItem.objects.create(purchase_request=purchase_request, **item_data)
+        PurchaseRequestItem.bulk_create_lines([PurchaseRequestItem(purchase_request=purchase_request, **item_data)
+                                               for item_data in items_data])
         return purchase_request
 
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items', [])
-        instance.date = validated_data.get('date', instance.date)
         instance.requester = validated_data.get('requester', instance.requester)
         instance.department = validated_data.get('department', instance.department)
         instance.status = validated_data.get('status', instance.status)
         instance.purpose = validated_data.get('purpose', instance.purpose)
         instance.suggested_vendor = validated_data.get('suggested_vendor', instance.suggested_vendor)
         instance.save()
-        for item_data in items_data:
-            PurchaseRequestItem.objects.create(purchase_request=instance, **item_data)
+        PurchaseRequestItem.bulk_create_lines([PurchaseRequestItem(purchase_request=instance, **item_data)
+                                               for item_data in items_data])
         return instance
 
 
-class UnitOfMeasureSerializer(serializers.HyperlinkedModelSerializer):
+class UnitOfMeasureSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='unit-of-measure-detail')
 
     class Meta:
@@ -86,9 +259,9 @@ class UnitOfMeasureSerializer(serializers.HyperlinkedModelSerializer):
         fields = ['url', 'name', 'description', 'created_on', 'is_hidden']
 
 
-class VendorSerializer(serializers.HyperlinkedModelSerializer):
+class VendorSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='vendor-detail')
-    category = serializers.HyperlinkedRelatedField(
+    category = CachedHyperlinkedRelatedField(
         view_name='vendor-category-detail',
         queryset=VendorCategory.objects.filter(is_hidden=False)
     )
@@ -98,7 +271,7 @@ class VendorSerializer(serializers.HyperlinkedModelSerializer):
         fields = ['url', 'company_name', 'category', 'email', 'address', 'phone_number', 'is_hidden']
 
 
-class VendorCategorySerializer(serializers.HyperlinkedModelSerializer):
+class VendorCategorySerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='vendor-category-detail')
     vendors = VendorSerializer(many=True, read_only=True)
 
@@ -108,23 +281,26 @@ class VendorCategorySerializer(serializers.HyperlinkedModelSerializer):
         read_only_fields = ['created_on', 'updated_on']
 
 
-class ProductSerializer(serializers.HyperlinkedModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='product-detail')
-    unit_of_measure = UnitOfMeasureSerializer(many=True)
-    category = serializers.HyperlinkedRelatedField(
+    unit_of_measure = CachedHyperlinkedRelatedField(
+        queryset=UnitOfMeasure.objects.filter(is_hidden=False),
+        view_name='unit-of-measure-detail')
+    category = CachedHyperlinkedRelatedField(
         queryset=ProductCategory.objects.filter(is_hidden=False),
         view_name='product-category-detail')
-    company = serializers.HyperlinkedRelatedField(
+    company = CachedHyperlinkedRelatedField(
         queryset=Vendor.objects.filter(is_hidden=False),
         view_name='vendor-detail')
 
     class Meta:
         model = Product
+        expandable_fields = {'unit_of_measure': 'UnitOfMeasureSerializer', 'company': 'VendorSerializer'}
         fields = ['url', 'name', 'created_on', 'updated_on', 'unit_of_measure', 'type', 'category',
                   'company', 'cost_price', 'selling_price', 'is_hidden']
 
 
-class ProductCategorySerializer(serializers.HyperlinkedModelSerializer):
+class ProductCategorySerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     products = ProductSerializer(many=True, read_only=True)
     url = serializers.HyperlinkedIdentityField(view_name='product-category-detail')
 
@@ -134,11 +310,11 @@ class ProductCategorySerializer(serializers.HyperlinkedModelSerializer):
         read_only_fields = ['created_on', 'updated_on']
 
 
-class RequestForQuotationItemSerializer(serializers.HyperlinkedModelSerializer):
+class RequestForQuotationItemSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='request-for-quotation-item-detail')
-    product = serializers.HyperlinkedRelatedField(queryset=Product.objects.filter(is_hidden=False),
-                                                  view_name='product-detail')
-    request_for_quotation = serializers.HyperlinkedRelatedField(
+    product = PreloadedHyperlinkedRelatedField(queryset=Product.objects.filter(is_hidden=False),
+                                               view_name='product-detail')
+    request_for_quotation = PreloadedHyperlinkedRelatedField(
         queryset=RequestForQuotation.objects.filter(is_hidden=False),
         view_name='request-for-quotation-detail')
     # This field is a custom property on the model, not a serializer field.
@@ -146,30 +322,33 @@ class RequestForQuotationItemSerializer(serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = RequestForQuotationItem
+        expandable_fields = {'product': 'ProductSerializer'}
+        list_serializer_class = BulkLineListSerializer
         fields = ['id', 'url', 'request_for_quotation', 'product', 'description',
                   'qty', 'estimated_unit_price', 'get_total_price']
 
 
-class RequestForQuotationSerializer(serializers.HyperlinkedModelSerializer):
+class RequestForQuotationSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='request-for-quotation-detail')
     items = RequestForQuotationItemSerializer(many=True, read_only=True)
-    vendor = serializers.HyperlinkedRelatedField(queryset=Vendor.objects.filter(is_hidden=False),
-                                                 view_name='vendor-detail')
+    vendor = CachedHyperlinkedRelatedField(queryset=Vendor.objects.filter(is_hidden=False),
+                                           view_name='vendor-detail')
     rfq_total_price = serializers.ReadOnlyField()
 
     class Meta:
         model = RequestForQuotation
+        expandable_fields = {'vendor': 'VendorSerializer'}
         fields = ['url', 'expiry_date', 'vendor',
                   'status', 'rfq_total_price', 'items', 'is_hidden']
         read_only_fields = ['date_created', 'date_updated', 'rfq_total_price']
 
 
-class RFQVendorQuoteItemSerializer(serializers.HyperlinkedModelSerializer):
+class RFQVendorQuoteItemSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='rfq-vendor-quote-item-detail')
-    rfq_vendor_quote = serializers.HyperlinkedRelatedField(
+    rfq_vendor_quote = PreloadedHyperlinkedRelatedField(
         queryset=RFQVendorQuote.objects.filter(is_hidden=False),
         view_name='rfq-vendor-quote-detail')
-    product = serializers.HyperlinkedRelatedField(
+    product = PreloadedHyperlinkedRelatedField(
         queryset=Product.objects.filter(is_hidden=False),
         view_name='product-detail')
     # This field is a custom property on the model, not a serializer field.
@@ -177,33 +356,36 @@ class RFQVendorQuoteItemSerializer(serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = RFQVendorQuoteItem
+        expandable_fields = {'product': 'ProductSerializer'}
+        list_serializer_class = BulkLineListSerializer
         fields = ['id', 'url', 'rfq_vendor_quote', 'product', 'description', 'qty',
                   'estimated_unit_price', 'get_total_price']
 
 
-class RFQVendorQuoteSerializer(serializers.HyperlinkedModelSerializer):
+class RFQVendorQuoteSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='rfq-vendor-quote-detail')
     items = RFQVendorQuoteItemSerializer(many=True, read_only=True)
-    rfq = serializers.HyperlinkedRelatedField(
+    rfq = PreloadedHyperlinkedRelatedField(
         queryset=RequestForQuotation.objects.filter(is_hidden=False),
         view_name='request-for-quotation-detail')
-    vendor = serializers.HyperlinkedRelatedField(
+    vendor = CachedHyperlinkedRelatedField(
         queryset=Vendor.objects.filter(is_hidden=False),
         view_name='vendor-detail')
     quote_total_price = serializers.ReadOnlyField()
 
     class Meta:
         model = RFQVendorQuote
+        expandable_fields = {'vendor': 'VendorSerializer'}
         fields = ['url', 'rfq', 'vendor', 'quote_total_price', 'items', 'is_hidden']
         read_only_fields = ['id', 'quote_total_price']
 
 
-class PurchaseOrderItemSerializer(serializers.HyperlinkedModelSerializer):
+class PurchaseOrderItemSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='purchase-order-item-detail')
-    product = serializers.HyperlinkedRelatedField(
+    product = PreloadedHyperlinkedRelatedField(
         queryset=Product.objects.filter(is_hidden=False),
         view_name='product-detail')
-    purchase_order = serializers.HyperlinkedRelatedField(
+    purchase_order = PreloadedHyperlinkedRelatedField(
         queryset=PurchaseOrder.objects.filter(is_hidden=False),
         view_name='purchase-order-detail')
     # This field is a custom property on the model, not a serializer field.
@@ -211,14 +393,16 @@ class PurchaseOrderItemSerializer(serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = PurchaseOrderItem
+        expandable_fields = {'product': 'ProductSerializer'}
+        list_serializer_class = BulkLineListSerializer
         fields = ['id', 'url', 'purchase_order', 'product', 'description',
                   'qty', 'estimated_unit_price', 'get_total_price']
 
 
-class PurchaseOrderSerializer(serializers.HyperlinkedModelSerializer):
+class PurchaseOrderSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='purchase-order-detail')
     items = PurchaseOrderItemSerializer(many=True, read_only=True)
-    vendor = serializers.HyperlinkedRelatedField(
+    vendor = CachedHyperlinkedRelatedField(
         queryset=Vendor.objects.filter(is_hidden=False),
         view_name='vendor-detail')
     # This field is a custom property on the model, not a serializer field.
@@ -226,16 +410,17 @@ class PurchaseOrderSerializer(serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = PurchaseOrder
+        expandable_fields = {'vendor': 'VendorSerializer'}
         fields = ['id', 'url', 'status', 'date_created', 'date_updated', 'vendor',
                   'items', 'po_total_price', 'is_hidden']
 
 
-class POVendorQuoteItemSerializer(serializers.HyperlinkedModelSerializer):
+class POVendorQuoteItemSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='po-vendor-quote-item-detail')
-    po_vendor_quote = serializers.HyperlinkedRelatedField(
+    po_vendor_quote = PreloadedHyperlinkedRelatedField(
         queryset=POVendorQuote.objects.filter(is_hidden=False),
         view_name='po-vendor-quote-detail')
-    product = serializers.HyperlinkedRelatedField(
+    product = PreloadedHyperlinkedRelatedField(
         queryset=Product.objects.filter(is_hidden=False),
         view_name='product-detail')
     # This field is a custom property on the model, not a serializer field.
@@ -243,16 +428,18 @@ class POVendorQuoteItemSerializer(serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = POVendorQuoteItem
+        expandable_fields = {'product': 'ProductSerializer'}
+        list_serializer_class = BulkLineListSerializer
         fields = ['id', 'url', 'po_vendor_quote', 'product', 'description', 'qty',
                   'estimated_unit_price', 'get_total_price']
 
 
-class POVendorQuoteSerializer(serializers.HyperlinkedModelSerializer):
+class POVendorQuoteSerializer(DynamicFieldsMixin, serializers.HyperlinkedModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='po-vendor-quote-detail')
-    vendor = serializers.HyperlinkedRelatedField(
+    vendor = CachedHyperlinkedRelatedField(
         queryset=Vendor.objects.filter(is_hidden=False),
         view_name='vendor-detail')
-    purchase_order = serializers.HyperlinkedRelatedField(
+    purchase_order = PreloadedHyperlinkedRelatedField(
         queryset=PurchaseOrder.objects.filter(is_hidden=False),
         view_name='purchase-order-detail')
     items = POVendorQuoteItemSerializer(many=True, read_only=True)
@@ -261,4 +448,52 @@ class POVendorQuoteSerializer(serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = POVendorQuote
+        expandable_fields = {'vendor': 'VendorSerializer'}
         fields = ['url', 'purchase_order', 'vendor', 'quote_total_price', 'items', 'is_hidden']
+
+
+class PurchaseRequestConversionSerializer(serializers.Serializer):
+    expiry_date = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class BatchPurchaseRequestConversionSerializer(PurchaseRequestConversionSerializer):
+    """
+    The approved purchase requests to merge into per-vendor RFQs, resolved with one query.
+    """
+    purchase_requests = PreloadedHyperlinkedRelatedField(
+        many=True, allow_empty=False, queryset=PurchaseRequest.objects.filter(is_hidden=False),
+        view_name='purchase-request-detail')
+
+    def to_internal_value(self, data):
+        relation = self.fields['purchase_requests'].child_relation
+        if isinstance(data, dict) and isinstance(data.get('purchase_requests'), list):
+            self._context.setdefault('related_objects', {})[relation.field_name] = \
+                relation.preload(data['purchase_requests'])
+        return super().to_internal_value(data)
+
+
+class RFQConversionSerializer(serializers.Serializer):
+    quote = PreloadedHyperlinkedRelatedField(
+        queryset=RFQVendorQuote.objects.filter(is_hidden=False),
+        view_name='rfq-vendor-quote-detail', required=False, allow_null=True)
+
+
+class ImportJobSerializer(serializers.HyperlinkedModelSerializer):
+    url = serializers.HyperlinkedIdentityField(view_name='import-job-detail')
+    requester = serializers.ReadOnlyField(source='requester.username')
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'url', 'kind', 'file', 'file_format', 'status', 'requester', 'rows_processed',
+                  'rows_created', 'rows_updated', 'rows_failed', 'errors', 'last_error', 'date_created',
+                  'date_updated']
+        read_only_fields = ['status', 'rows_processed', 'rows_created', 'rows_updated', 'rows_failed', 'errors',
+                            'last_error', 'date_created', 'date_updated']
+
+    def validate(self, attrs):
+        file_format = attrs.get('file_format')
+        if file_format is None:
+            # Guessed from the file name when not given
+            file_format = 'jsonl' if attrs['file'].name.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+            attrs['file_format'] = file_format
+        return attrs
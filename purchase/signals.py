@@ -0,0 +1,67 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from .cache import VERSIONED_MODELS, invalidate_model
+from .models import DOCUMENT_LINE_MODELS, document_lines_changed
+from .spend import SPEND_SOURCES, get_document_groups, get_document_state, get_source, query_document_states, \
+    schedule_refresh
+
+
+def invalidate_reference_cache(sender, **kwargs):
+    invalidate_model(sender)
+
+
+# Saving, hiding (toggle_hidden, destroy) or deleting a reference row or document invalidates the
+# tenant's cached rows, list responses and summaries for that model
+for label in VERSIONED_MODELS:
+    model = apps.get_model(label)
+    post_save.connect(invalidate_reference_cache, sender=model, dispatch_uid=f'invalidate_{label}_post_save')
+    post_delete.connect(invalidate_reference_cache, sender=model, dispatch_uid=f'invalidate_{label}_post_delete')
+
+
+def remember_spend_groups(sender, instance, **kwargs):
+    # The groups the document counted in before this save, which a status, vendor or department
+    # change leaves
+    source = get_source(sender)
+    instance._spend_groups = set() if instance._state.adding else \
+        get_document_groups(source, query_document_states(source, [instance.pk]))
+
+
+def refresh_document_spend(sender, instance, **kwargs):
+    source = get_source(sender)
+    groups = getattr(instance, '_spend_groups', set())
+    schedule_refresh(source, groups | get_document_groups(source, [get_document_state(source, instance)]))
+
+
+def refresh_line_spend(sender, document_ids, **kwargs):
+    source = get_source(sender)
+    if source is not None:
+        schedule_refresh(source, get_document_groups(source, query_document_states(source, document_ids)))
+
+
+# Spend rollups follow document status, vendor, department and line changes once they commit
+for source, config in SPEND_SOURCES.items():
+    model = apps.get_model(config['document_model'])
+    pre_save.connect(remember_spend_groups, sender=model, dispatch_uid=f'spend_{source}_pre_save')
+    post_save.connect(refresh_document_spend, sender=model, dispatch_uid=f'spend_{source}_post_save')
+    post_delete.connect(refresh_document_spend, sender=model, dispatch_uid=f'spend_{source}_post_delete')
+document_lines_changed.connect(refresh_line_spend, dispatch_uid='spend_document_lines_changed')
+
+
+def remember_deleted_line(sender, instance, **kwargs):
+    instance._deleted_line = instance.saved_line()
+
+
+def subtract_deleted_line(sender, instance, **kwargs):
+    document, total = getattr(instance, '_deleted_line', (None, None))
+    instance._saved_line = None
+    if document is not None and total:
+        sender.apply_document_deltas({document: -total})
+
+
+# Deleted lines, one at a time, through a queryset or cascading from a product, are taken off
+# their document's total within the delete's transaction
+for model in DOCUMENT_LINE_MODELS:
+    pre_delete.connect(remember_deleted_line, sender=model, dispatch_uid=f'{model._meta.label}_remember_line')
+    post_delete.connect(subtract_deleted_line, sender=model, dispatch_uid=f'{model._meta.label}_subtract_line')
+
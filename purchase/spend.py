@@ -0,0 +1,127 @@
+import zlib
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import SpendRollup
+
+# How each source's lines roll up. `group` is the rollup column and document path whose rows are
+# recomputed together with the month when a document changes; documents only count in the statuses
+# listed, which can be overridden with the PURCHASE_SPEND_STATUSES setting.
+SPEND_SOURCES = {
+    'purchase_order': {
+        'document_model': 'purchase.PurchaseOrder',
+        'line_model': 'purchase.PurchaseOrderItem',
+        'document_field': 'purchase_order',
+        'vendor': 'vendor_id',
+        'department': None,
+        'group': 'vendor_id',
+        'statuses': ('awaiting', 'completed'),
+    },
+    'purchase_request': {
+        'document_model': 'purchase.PurchaseRequest',
+        'line_model': 'purchase.PurchaseRequestItem',
+        'document_field': 'purchase_request',
+        'vendor': 'suggested_vendor_id',
+        'department': 'department_id',
+        'group': 'department_id',
+        'statuses': ('submitted', 'approved'),
+    },
+}
+
+
+def get_spend_statuses(source):
+    return getattr(settings, 'PURCHASE_SPEND_STATUSES', {}).get(source, SPEND_SOURCES[source]['statuses'])
+
+
+def get_source(document_model):
+    return next((source for source, config in SPEND_SOURCES.items()
+                 if config['document_model'] == document_model._meta.label), None)
+
+
+def get_month(date):
+    # The same month TruncMonth gives in the current time zone
+    return timezone.localtime(date).date().replace(day=1)
+
+
+def rollup_rows(source, **filters):
+    """
+    Aggregates the counted lines of a source into unsaved `SpendRollup` rows, one per month, status,
+    vendor, category and department. `filters` apply to the lines, with `month` available.
+    """
+    config = SPEND_SOURCES[source]
+    document = config['document_field']
+    dimensions = {'rollup_status': F(f'{document}__status'), 'rollup_vendor': F(f"{document}__{config['vendor']}"),
+                  'rollup_category': F('product__category_id')}
+    if config['department']:
+        dimensions['rollup_department'] = F(f"{document}__{config['department']}")
+    line_model = apps.get_model(config['line_model'])
+    lines = line_model.objects.filter(**{f'{document}__is_hidden': False,
+                                         f'{document}__status__in': get_spend_statuses(source)}) \
+        .annotate(month=TruncMonth(f'{document}__date_created', output_field=DateField())).filter(**filters)
+    rows = lines.order_by().values('month', **dimensions).annotate(
+        amount=Sum(line_model.line_total_expression()), total_qty=Sum('qty'), line_count=Count('pk'),
+        document_count=Count(document, distinct=True))
+    return [SpendRollup(source=source, month=row['month'], status=row['rollup_status'],
+                        vendor_id=row['rollup_vendor'], category_id=row['rollup_category'],
+                        department_id=row.get('rollup_department'), amount=row['amount'], qty=row['total_qty'],
+                        lines=row['line_count'], documents=row['document_count'])
+            for row in rows]
+
+
+def refresh_spend(source, groups):
+    """
+    Recomputes the rollup rows of each `(month, group value)` of a source from its lines. Groups are
+    locked for the transaction so concurrent refreshes of the same group cannot interleave.
+    """
+    config = SPEND_SOURCES[source]
+    document = config['document_field']
+    for month, value in sorted(groups, key=str):
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                lock_key = zlib.crc32(f'spend:{source}:{month}:{value}'.encode('utf-8'))
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [lock_key])
+            SpendRollup.objects.filter(source=source, month=month, **{config['group']: value}).delete()
+            SpendRollup.objects.bulk_create(rollup_rows(
+                source, month=month, **{f"{document}__{config['group']}": value}))
+
+
+def rebuild_spend(source):
+    """
+    Replaces all rollup rows of a source, returning how many were written.
+    """
+    with transaction.atomic():
+        SpendRollup.objects.filter(source=source).delete()
+        return len(SpendRollup.objects.bulk_create(rollup_rows(source)))
+
+
+def get_document_groups(source, documents):
+    """
+    Returns the `(month, group value)` of the given documents, or of rows with the same fields, that
+    currently count as spend.
+    """
+    config = SPEND_SOURCES[source]
+    statuses = get_spend_statuses(source)
+    return {(get_month(document['date_created']), document[config['group']]) for document in documents
+            if document['status'] in statuses and not document['is_hidden']}
+
+
+def get_document_state(source, instance):
+    config = SPEND_SOURCES[source]
+    return {field: getattr(instance, field) for field in ('date_created', 'status', 'is_hidden', config['group'])}
+
+
+def query_document_states(source, document_ids):
+    config = SPEND_SOURCES[source]
+    document_model = apps.get_model(config['document_model'])
+    return document_model.objects.filter(pk__in=document_ids).order_by() \
+        .values('date_created', 'status', 'is_hidden', config['group'])
+
+
+def schedule_refresh(source, groups):
+    if groups:
+        transaction.on_commit(lambda: refresh_spend(source, groups))
@@ -1,11 +1,38 @@
 from django.test import TestCase
 
 # Create your tests here.
+import csv
+import json
+import os
+import tempfile
+import zipfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+
 from django.test import TestCase
 from.models import RequestForQuotation, RequestForQuotationItem, Product, Vendor
-from.views import add_rfq_total_price
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tenants.test.cases import FastTenantTestCase
+from django_tenants.test.client import TenantClient
+from .models import Department, DocumentSequence, PurchaseRequest, PurchaseRequestItem, VendorCategory, \
+    ProductCategory, RFQVendorQuote, RFQVendorQuoteItem, PurchaseOrder, PurchaseOrderItem, POVendorQuote, \
+    POVendorQuoteItem, SpendRollup, ImportJob, UnitOfMeasure
+from notifications.models import EmailJob
+from .cache import get_active_object
+from .documents import render_document
+from .imports import run_import
+from .search import check_search_fields
+from .sequences import document_sequences
 
 class TestAddRFQTotalPrice(TestCase):
     def setUp(self):
@@ -83,4 +110,997 @@ class RFQTotalPriceTestCase(TestCase):
         rfq = RequestForQuotation.objects.get(formatted_id='RFQ00001', vendor=self.vendor)
         item = RequestForQuotationItem.objects.get(request_for_quotation=rfq, product__name='Test Product_one')
         item.delete()
-        self.assertEqual(rfq.rfq_total_price, 375)  # 3*75 + 1*150
\ No newline at end of file
+        self.assertEqual(rfq.rfq_total_price, 375)  # 3*75 + 1*150
+
+
+class PurchaseTestMixin:
+    """
+    Shared fixtures for the tenant-schema purchase tests.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass')
+        self.department = Department.objects.create(name='Operations')
+        self.vendor_category = VendorCategory.objects.create(name='Suppliers')
+        self.vendor = Vendor.objects.create(company_name='Acme Supplies', category=self.vendor_category,
+                                            email='sales@acme.example.com')
+
+    def create_product(self, name='Printer paper', **kwargs):
+        kwargs.setdefault('company', self.vendor)
+        kwargs.setdefault('cost_price', 10)
+        kwargs.setdefault('selling_price', 12)
+        return Product.objects.create(name=name, **kwargs)
+
+    def create_purchase_request(self, **kwargs):
+        kwargs.setdefault('requester', self.user)
+        kwargs.setdefault('department', self.department)
+        kwargs.setdefault('suggested_vendor', self.vendor)
+        return PurchaseRequest.objects.create(**kwargs)
+
+
+class DocumentSequenceTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        document_sequences.clear()
+
+    def test_purchase_request_ids_are_sequential(self):
+        first = self.create_purchase_request()
+        second = self.create_purchase_request()
+        self.assertEqual(first.id, 'PR000001')
+        self.assertEqual(second.id, 'PR000002')
+
+    def test_rfq_ids_keep_their_prefix(self):
+        first = RequestForQuotation.objects.create(vendor=self.vendor)
+        second = RequestForQuotation.objects.create(vendor=self.vendor)
+        self.assertEqual(first.id, 'RFQ000001')
+        self.assertEqual(second.id, 'RFQ000002')
+
+    def test_sequence_is_seeded_from_existing_documents(self):
+        self.create_purchase_request(id='PR000041')
+        self.assertEqual(self.create_purchase_request().id, 'PR000042')
+        self.assertEqual(DocumentSequence.objects.get(name='purchase_request').last_value, 42)
+
+    @override_settings(PURCHASE_SEQUENCE_BLOCK_SIZE=10,
+                       PURCHASE_DOCUMENT_SEQUENCES={'purchase_order': {'prefix': 'LPO', 'padding': 4}})
+    def test_block_allocation_serves_numbers_from_memory(self):
+        ids = []
+        for _ in range(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                ids.append(document_sequences.next_id('purchase_order'))
+        self.assertEqual(ids, ['LPO0001', 'LPO0002', 'LPO0003'])
+        self.assertEqual(DocumentSequence.objects.get(name='purchase_order').last_value, 10)
+
+
+class DocumentTotalsTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product()
+        self.purchase_request = self.create_purchase_request()
+
+    def add_item(self, purchase_request=None, qty=2, price=50):
+        return PurchaseRequestItem.objects.create(purchase_request=purchase_request or self.purchase_request,
+                                                  product=self.product, qty=qty, estimated_unit_price=price)
+
+    def assertTotal(self, document, expected):
+        document.refresh_from_db()
+        self.assertEqual(document.total_price, expected)
+
+    def test_total_follows_item_changes(self):
+        item = self.add_item()
+        self.add_item(qty=3, price=75)
+        self.assertTotal(self.purchase_request, 325)
+
+        item = PurchaseRequestItem.objects.get(pk=item.pk)
+        item.qty = 4
+        item.save()
+        self.assertTotal(self.purchase_request, 425)
+
+        item.delete()
+        self.assertTotal(self.purchase_request, 225)
+
+    def test_moving_an_item_updates_both_documents(self):
+        other = self.create_purchase_request()
+        item = self.add_item()
+        item.purchase_request = other
+        item.save()
+        self.assertTotal(self.purchase_request, 0)
+        self.assertTotal(other, 100)
+
+    def test_saving_a_stale_document_keeps_the_total(self):
+        stale = PurchaseRequest.objects.get(pk=self.purchase_request.pk)
+        self.add_item()
+        stale.purpose = 'Restock'
+        stale.save()
+        # Not read back by the save, only when it is accessed
+        self.assertIn('total_price', stale.get_deferred_fields())
+        self.assertEqual(stale.total_price, 100)
+        self.assertTotal(self.purchase_request, 100)
+
+    def test_queryset_updates_and_deletes_follow_totals(self):
+        item = self.add_item()
+        self.add_item(qty=1, price=10)
+        PurchaseRequestItem.objects.filter(pk=item.pk).update(qty=5)
+        self.assertTotal(self.purchase_request, 260)
+        self.assertEqual(PurchaseRequestItem.objects.get(pk=item.pk).total_price, 250)
+
+        PurchaseRequestItem.objects.filter(pk=item.pk).delete()
+        self.assertTotal(self.purchase_request, 10)
+
+    def test_cascade_deletes_follow_totals(self):
+        other = self.create_product()
+        self.add_item()
+        PurchaseRequestItem.objects.create(purchase_request=self.purchase_request, product=other, qty=1,
+                                           estimated_unit_price=10)
+        other.delete()
+        self.assertTotal(self.purchase_request, 100)
+
+    def test_rebuild_command_repairs_and_verifies_totals(self):
+        self.add_item()
+        PurchaseRequest.objects.filter(pk=self.purchase_request.pk).update(total_price=1)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_document_totals', verify=True, stdout=StringIO())
+        call_command('rebuild_document_totals', stdout=StringIO())
+        self.assertTotal(self.purchase_request, 100)
+        call_command('rebuild_document_totals', verify=True, stdout=StringIO())
+
+
+class QueryCountTestCase(PurchaseTestMixin, FastTenantTestCase):
+    """
+    List and retrieve responses must issue the same number of queries whatever the page size and
+    however many lines or nested objects each document has.
+    """
+    list_endpoints = ['purchase-request', 'request-for-quotation', 'purchase-order', 'rfq-vendor-quote',
+                      'po-vendor-quote', 'product', 'vendor-category', 'product-category']
+
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.documents = []
+        for index in range(1, 5):
+            product = self.create_product(name=f'Product {index}', category=ProductCategory.objects.create(
+                name=f'Category {index}'))
+            vendor_category = VendorCategory.objects.create(name=f'Vendor category {index}')
+            purchase_request = self.create_purchase_request()
+            rfq = RequestForQuotation.objects.create(vendor=self.vendor)
+            rfq_quote = RFQVendorQuote.objects.create(rfq=rfq, vendor=self.vendor)
+            purchase_order = PurchaseOrder.objects.create(vendor=self.vendor)
+            po_quote = POVendorQuote.objects.create(purchase_order=purchase_order, vendor=self.vendor)
+            for _ in range(index):
+                self.create_product(category=product.category)
+                Vendor.objects.create(company_name='Vendor', category=vendor_category, email='vendor@example.com')
+                line = {'product': product, 'qty': 2, 'estimated_unit_price': 10}
+                PurchaseRequestItem.objects.create(purchase_request=purchase_request, **line)
+                RequestForQuotationItem.objects.create(request_for_quotation=rfq, **line)
+                RFQVendorQuoteItem.objects.create(rfq_vendor_quote=rfq_quote, **line)
+                PurchaseOrderItem.objects.create(purchase_order=purchase_order, **line)
+                POVendorQuoteItem.objects.create(po_vendor_quote=po_quote, **line)
+            self.documents.append({'purchase-request': purchase_request, 'request-for-quotation': rfq,
+                                   'purchase-order': purchase_order, 'rfq-vendor-quote': rfq_quote,
+                                   'po-vendor-quote': po_quote, 'product': product,
+                                   'vendor-category': vendor_category, 'product-category': product.category})
+
+    def count_queries(self, url):
+        # Measure the uncached cost of reference data lists
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context)
+
+    def assertConstantQueries(self, *urls):
+        self.count_queries(urls[0])
+        counts = [self.count_queries(url) for url in urls]
+        self.assertEqual(len(set(counts)), 1, f"query counts differ: {dict(zip(urls, counts))}")
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for basename in self.list_endpoints:
+            with self.subTest(basename):
+                url = reverse(f'{basename}-list')
+                self.assertConstantQueries(f'{url}?limit=1', f'{url}?limit=10', f'{url}active/?limit=10')
+
+    def test_retrieve_queries_do_not_depend_on_nested_objects(self):
+        for basename in self.list_endpoints:
+            with self.subTest(basename):
+                self.assertConstantQueries(
+                    *[reverse(f'{basename}-detail', args=[documents[basename].pk]) for documents in self.documents])
+
+
+class KeysetPaginationTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.url = reverse('purchase-request-list')
+        for index in range(7):
+            self.create_purchase_request(is_hidden=index % 3 == 0)
+        # Rows sharing a timestamp must still be paged by id without repeats or gaps
+        PurchaseRequest.objects.filter(pk__in=list(PurchaseRequest.objects.values_list('pk', flat=True)[:4])) \
+            .update(date_updated=timezone.now())
+
+    def get_ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [item['url'].rstrip('/').rsplit('/', 1)[-1] for item in response.data['results']], response.data
+
+    def walk(self, url):
+        pages = []
+        while url:
+            ids, data = self.get_ids(url)
+            self.assertNotIn('count', data)
+            pages.append(ids)
+            url = data['next']
+        return pages, data
+
+    def test_cursor_pages_match_offset_order(self):
+        expected, data = self.get_ids(f'{self.url}?limit=100')
+        pages, last_page = self.walk(f'{self.url}?pagination=cursor&limit=3')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+        previous_ids, data = self.get_ids(last_page['previous'])
+        self.assertEqual(previous_ids, pages[1])
+
+    def test_cursor_follows_ordering_and_actions(self):
+        expected = list(PurchaseRequest.objects.filter(is_hidden=False).order_by('-total_price', '-id')
+                        .values_list('pk', flat=True))
+        pages, data = self.walk(f'{reverse("purchase-request-active")}?pagination=cursor&limit=2')
+        self.assertEqual(sum(pages, []), list(PurchaseRequest.objects.filter(is_hidden=False)
+                                             .order_by('-date_updated', '-id').values_list('pk', flat=True)))
+        pages, data = self.walk(f'{self.url}search/?pagination=cursor&limit=2&ordering=-total_price')
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_offset_pagination_is_unchanged(self):
+        response = self.client.get(f'{self.url}?limit=3&offset=3')
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(f'{self.url}?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class SendEmailTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+
+    def test_send_email_only_queues_the_message(self):
+        rfq = RequestForQuotation.objects.create(vendor=self.vendor)
+        purchase_order = PurchaseOrder.objects.create(vendor=self.vendor)
+        for url in [reverse('request-for-quotation-send-email', args=[rfq.pk]),
+                    reverse('purchase-order-send-email', args=[purchase_order.pk])]:
+            with self.subTest(url):
+                response = self.client.post(url)
+                self.assertEqual(response.status_code, 202, response.content)
+                self.assertEqual(len(mail.outbox), 0)
+                job = EmailJob.objects.get(pk=response.data['job'])
+                self.assertEqual(job.schema_name, self.tenant.schema_name)
+                self.assertEqual(job.get_status(), 'queued')
+                self.assertEqual(self.client.get(response.data['job_url']).data['status'], 'queued')
+
+    def test_rfq_is_sent_only_to_its_vendors(self):
+        quoting = Vendor.objects.create(company_name='Quoting Ltd', category=self.vendor_category,
+                                        email='quotes@example.com')
+        hidden = Vendor.objects.create(company_name='Hidden Ltd', category=self.vendor_category,
+                                       email='hidden@example.com', is_hidden=True)
+        Vendor.objects.create(company_name='Unrelated Ltd', category=self.vendor_category, email='other@example.com')
+        rfq = RequestForQuotation.objects.create(vendor=self.vendor)
+        for vendor in [quoting, quoting, hidden]:
+            RFQVendorQuote.objects.create(rfq=rfq, vendor=vendor)
+
+        messages = rfq.send_email().messages.order_by('id')
+        self.assertEqual(sorted(message.to[0] for message in messages), sorted([self.vendor.email, quoting.email]))
+        self.assertEqual({message.body.split('<p>Dear ')[1].split(',</p>')[0] for message in messages},
+                         {self.vendor.company_name, quoting.company_name})
+
+    def test_po_is_sent_only_to_its_vendor(self):
+        Vendor.objects.create(company_name='Unrelated Ltd', category=self.vendor_category, email='other@example.com')
+        purchase_order = PurchaseOrder.objects.create(vendor=self.vendor)
+        messages = purchase_order.send_email().messages.all()
+        self.assertEqual([message.bcc for message in messages], [[self.vendor.email]])
+
+
+class DocumentRenderingTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.rfq = RequestForQuotation.objects.create(vendor=self.vendor)
+        for name in ['Printer paper', 'Toner', 'Stapler']:
+            RequestForQuotationItem.objects.create(request_for_quotation=self.rfq, product=self.create_product(name=name),
+                                                   qty=2, estimated_unit_price=10)
+        self.rfq.refresh_from_db()
+
+    def test_render_is_cached_per_document_version(self):
+        with CaptureQueriesContext(connection) as context:
+            html = render_document(self.rfq)
+        # Vendor and items with their products, whatever the number of items
+        self.assertEqual(len([query for query in context if query['sql'].startswith('SELECT')]), 2)
+        self.assertIn('Toner', html)
+        self.assertIn('60.00', html)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(render_document(self.rfq), html)
+        self.assertEqual(len(context), 0)
+
+        RequestForQuotationItem.objects.create(request_for_quotation=self.rfq, qty=1, estimated_unit_price=5,
+                                               product=self.create_product(name='Envelopes'))
+        self.rfq.refresh_from_db()
+        self.assertIn('Envelopes', render_document(self.rfq))
+
+    def test_export_serves_the_cached_render(self):
+        client = TenantClient(self.tenant)
+        client.force_login(self.user)
+        url = reverse('request-for-quotation-export', args=[self.rfq.pk])
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertEqual(response.content.decode(), render_document(self.rfq))
+
+
+class BulkLineTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.url = reverse('purchase-order-item-bulk')
+        self.purchase_order = PurchaseOrder.objects.create(vendor=self.vendor)
+        self.products = [self.create_product(name=f'Product {index}') for index in range(20)]
+
+    def link(self, name, obj):
+        return reverse(f'{name}-detail', args=[obj.pk])
+
+    def rows(self, count, qty=2):
+        return [{'purchase_order': self.link('purchase-order', self.purchase_order),
+                 'product': self.link('product', product), 'qty': qty, 'estimated_unit_price': '10.00'}
+                for product in self.products[:count]]
+
+    def post(self, rows, method='post'):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(self.url, rows, content_type='application/json')
+        return response, len(context)
+
+    def test_bulk_create_writes_all_rows_with_constant_queries(self):
+        response, few_queries = self.post(self.rows(2))
+        self.assertEqual(response.status_code, 201, response.content)
+        response, many_queries = self.post(self.rows(20))
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(len(response.data), 20)
+        self.assertEqual(response.data[0]['get_total_price'], Decimal('20.00'))
+        self.purchase_order.refresh_from_db()
+        self.assertEqual(self.purchase_order.po_total_price, Decimal('440.00'))
+
+    def test_bulk_errors_are_reported_by_row_index(self):
+        rows = self.rows(4)
+        rows[1]['qty'] = -1
+        rows[3]['product'] = '/purchase/products/999999/'
+        response, queries = self.post(rows)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {1, 3})
+        self.assertIn('qty', response.data[1])
+        self.assertIn('product', response.data[3])
+        self.assertFalse(PurchaseOrderItem.objects.exists())
+
+    def test_bulk_update_applies_total_changes(self):
+        response, queries = self.post(self.rows(3))
+        ids = [row['id'] for row in response.data]
+        response, queries = self.post([{'id': ids[0], 'qty': 5}, {'id': ids[2], 'estimated_unit_price': '1.00'}],
+                                      method='patch')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.purchase_order.refresh_from_db()
+        self.assertEqual(self.purchase_order.po_total_price, Decimal('72.00'))
+
+        response, queries = self.post([{'id': ids[0], 'qty': 1}, {'id': 0, 'qty': 1}, {'id': ids[0]}],
+                                      method='patch')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {1, 2})
+
+    def test_purchase_request_items_store_their_total(self):
+        purchase_request = self.create_purchase_request()
+        url = reverse('purchase-request-item-bulk')
+        response = self.client.post(url, [{'purchase_request': self.link('purchase-request', purchase_request),
+                                           'product': self.link('product', self.products[0]), 'qty': 3,
+                                           'estimated_unit_price': '2.50'}], content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(PurchaseRequestItem.objects.get().total_price, Decimal('7.50'))
+        purchase_request.refresh_from_db()
+        self.assertEqual(purchase_request.total_price, Decimal('7.50'))
+
+        response = self.client.patch(self.link('purchase-request', purchase_request), {'purpose': 'Restock'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+class ReferenceDataCacheTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+
+    def count_queries(self, func, *args):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args)
+        return result, len([query for query in context if not query['sql'].startswith('SET')])
+
+    def test_lookups_are_cached_until_the_row_changes(self):
+        vendor, queries = self.count_queries(get_active_object, Vendor, self.vendor.pk)
+        self.assertEqual((vendor, queries), (self.vendor, 1))
+        vendor, queries = self.count_queries(get_active_object, Vendor, self.vendor.pk)
+        self.assertEqual((vendor, queries), (self.vendor, 0))
+
+        response = self.client.post(reverse('vendor-toggle-hidden', args=[self.vendor.pk]))
+        self.assertEqual(response.status_code, 204)
+        with self.assertRaises(Vendor.DoesNotExist):
+            get_active_object(Vendor, self.vendor.pk)
+
+    def test_hidden_vendor_is_rejected_by_serializers(self):
+        url = reverse('request-for-quotation-list')
+        data = {'vendor': reverse('vendor-detail', args=[self.vendor.pk]), 'status': 'awaiting'}
+        self.assertEqual(self.client.post(url, data).status_code, 201)
+        self.client.post(reverse('vendor-toggle-hidden', args=[self.vendor.pk]))
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('vendor', response.data)
+
+    def test_list_responses_are_cached_per_version(self):
+        url = reverse('vendor-category-list')
+        response, uncached = self.count_queries(self.client.get, url)
+        cached_response, cached = self.count_queries(self.client.get, url)
+        self.assertLess(cached, uncached)
+        self.assertEqual(cached_response.data, response.data)
+
+        # Nested vendors are part of the response, so vendor changes invalidate it too
+        self.vendor.company_name = 'Acme Holdings'
+        self.vendor.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['vendors'][0]['company_name'], 'Acme Holdings')
+
+
+class ConditionalGetTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.product = self.create_product()
+        self.purchase_order = PurchaseOrder.objects.create(vendor=self.vendor)
+        self.item = PurchaseOrderItem.objects.create(purchase_order=self.purchase_order, product=self.product,
+                                                     qty=2, estimated_unit_price=10)
+
+    def get(self, url, **headers):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, **headers)
+        return response, len([query for query in context if not query['sql'].startswith('SET')])
+
+    def test_unchanged_list_and_detail_return_304(self):
+        for url in (reverse('purchase-order-list'), reverse('purchase-order-detail', args=[self.purchase_order.pk])):
+            response, full_queries = self.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Last-Modified', response)
+            response, queries = self.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+            # Only the validators are queried, the items are never loaded
+            self.assertLess(queries, full_queries)
+
+    def test_item_writes_change_the_document_etag(self):
+        url = reverse('purchase-order-detail', args=[self.purchase_order.pk])
+        etag = self.client.get(url)['ETag']
+        self.item.qty = 3
+        self.item.save()
+        response, queries = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_the_query(self):
+        url = reverse('purchase-order-list')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'status': 'completed'})['ETag'], etag)
+        self.assertEqual(self.client.get(url, {'status': 'completed'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SearchTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.paper = self.create_product(name='Printer paper')
+        self.newsprint = self.create_product(name='Newspaper rolls', type='consumable')
+        other_vendor = Vendor.objects.create(company_name='Globex', category=self.vendor_category,
+                                             email='orders@globex.example.com')
+        self.toner = self.create_product(name='Toner', company=other_vendor)
+
+    def search(self, term):
+        response = self.client.get(reverse('product-search'), {'search': term})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [result['name'] for result in response.data['results']]
+
+    def test_search_vector_is_maintained(self):
+        self.paper.name = 'Copier paper'
+        self.paper.save()
+        self.assertEqual(self.search('copi'), ['Copier paper'])
+        self.assertEqual(self.search('printer'), [])
+
+    def test_word_prefix_substring_and_related_matches(self):
+        self.assertEqual(self.search('print'), ['Printer paper'])
+        # Whole word matches rank above substrings
+        self.assertEqual(self.search('paper'), ['Printer paper', 'Newspaper rolls'])
+        self.assertEqual(self.search('globex'), ['Toner'])
+        self.assertCountEqual(self.search('acme paper'), ['Printer paper', 'Newspaper rolls'])
+
+    def test_search_fields_exist(self):
+        self.assertEqual(check_search_fields(None), [])
+
+
+class AutocompleteTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        for name in ('Printer paper', 'printer ink', 'Pencils', 'Paper clips'):
+            self.create_product(name=name)
+        self.create_product(name='Printer stand', is_hidden=True)
+
+    def autocomplete(self, url_name, **params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [result['label'] for result in response.data['results']]
+
+    def test_prefix_matches_are_case_insensitive_and_ordered(self):
+        self.assertEqual(self.autocomplete('product-autocomplete', q='PRINT'), ['printer ink', 'Printer paper'])
+        self.assertEqual(self.autocomplete('product-autocomplete', q='p', limit=2), ['Paper clips', 'Pencils'])
+        self.assertEqual(self.autocomplete('product-autocomplete', q='100%'), [])
+        self.assertEqual(self.autocomplete('vendor-autocomplete', q='ac'), ['Acme Supplies'])
+
+    def test_results_are_id_label_pairs(self):
+        response = self.client.get(reverse('vendor-autocomplete'), {'q': 'acme'})
+        self.assertEqual(response.data, {'results': [{'id': self.vendor.pk, 'label': 'Acme Supplies'}],
+                                         'timed_out': False})
+
+
+
+class StatusSummaryTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.product = self.create_product()
+        self.purchase_order = PurchaseOrder.objects.create(vendor=self.vendor, status='awaiting')
+        PurchaseOrderItem.objects.create(purchase_order=self.purchase_order, product=self.product,
+                                         qty=2, estimated_unit_price=10)
+        PurchaseOrder.objects.create(vendor=self.vendor, status='awaiting', is_hidden=True)
+        self.create_purchase_request()
+
+    def get_summary(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('purchase-summary'))
+        self.assertEqual(response.status_code, 200)
+        return response.data, len([query for query in context if 'GROUP BY' in query['sql']])
+
+    def test_summary_groups_active_documents_by_status(self):
+        summary, grouped_queries = self.get_summary()
+        self.assertEqual(grouped_queries, 3)
+        self.assertEqual(summary['purchase_order']['awaiting'], {'count': 1, 'total': Decimal('20.00')})
+        self.assertEqual(summary['purchase_order']['completed'], {'count': 0, 'total': Decimal('0.00')})
+        self.assertEqual(summary['purchase_request']['draft']['count'], 1)
+        self.assertEqual(summary['request_for_quotation']['awaiting']['count'], 0)
+
+    def test_summary_is_cached_until_documents_change(self):
+        self.get_summary()
+        summary, grouped_queries = self.get_summary()
+        self.assertEqual(grouped_queries, 0)
+
+        self.purchase_order.status = 'completed'
+        self.purchase_order.save()
+        summary, grouped_queries = self.get_summary()
+        self.assertEqual(summary['purchase_order']['completed'], {'count': 1, 'total': Decimal('20.00')})
+
+        PurchaseOrderItem.objects.create(purchase_order=self.purchase_order, product=self.product,
+                                         qty=1, estimated_unit_price=5)
+        summary, grouped_queries = self.get_summary()
+        self.assertEqual(summary['purchase_order']['completed']['total'], Decimal('25.00'))
+
+
+class QuoteComparisonTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.paper, self.toner = self.create_product(name='Paper'), self.create_product(name='Toner')
+        self.rfq = RequestForQuotation.objects.create(vendor=self.vendor)
+        RequestForQuotationItem.objects.create(request_for_quotation=self.rfq, product=self.paper, qty=10,
+                                               estimated_unit_price=5)
+        RequestForQuotationItem.objects.create(request_for_quotation=self.rfq, product=self.toner, qty=2,
+                                               estimated_unit_price=40)
+        self.globex = Vendor.objects.create(company_name='Globex', category=self.vendor_category,
+                                            email='orders@globex.example.com')
+        self.acme_quote = self.quote(self.vendor, {self.paper: 4, self.toner: 45})
+        self.quote(self.globex, {self.paper: 6, self.toner: 30})
+
+    def quote(self, vendor, unit_prices):
+        quote = RFQVendorQuote.objects.create(rfq=self.rfq, vendor=vendor)
+        for product, price in unit_prices.items():
+            RFQVendorQuoteItem.objects.create(rfq_vendor_quote=quote, product=product, qty=1,
+                                              estimated_unit_price=price)
+        return quote
+
+    def compare(self):
+        response = self.client.get(reverse('request-for-quotation-compare', args=[self.rfq.pk]))
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data
+
+    def test_lines_and_basket_are_compared(self):
+        comparison = self.compare()
+        self.assertEqual([vendor['company_name'] for vendor in comparison['vendors']], ['Acme Supplies', 'Globex'])
+        paper, toner = comparison['lines']
+        self.assertEqual(paper['unit_prices'], [Decimal('4.00'), Decimal('6.00')])
+        self.assertEqual((paper['best_vendor'], paper['spread'], paper['savings']),
+                         (self.vendor.pk, Decimal('2.00'), Decimal('10.00')))
+        self.assertEqual((toner['best_vendor'], toner['savings']), (self.globex.pk, Decimal('20.00')))
+
+        basket = comparison['basket']
+        self.assertEqual(basket['estimated_total'], Decimal('130.00'))
+        self.assertEqual(basket['vendor_totals'], [Decimal('130.00'), Decimal('120.00')])
+        self.assertEqual((basket['best_vendor'], basket['savings']), (self.globex.pk, Decimal('10.00')))
+        self.assertEqual((basket['split_total'], basket['split_savings']), (Decimal('100.00'), Decimal('30.00')))
+
+    def test_comparison_is_cached_until_a_quote_changes(self):
+        self.compare()
+        with CaptureQueriesContext(connection) as context:
+            self.compare()
+        self.assertFalse(any('rfqvendorquoteitem' in query['sql'] for query in context))
+
+        item = RFQVendorQuoteItem.objects.get(rfq_vendor_quote=self.acme_quote, product=self.toner)
+        item.estimated_unit_price = 20
+        item.save()
+        self.assertEqual(self.compare()['basket']['best_vendor'], self.vendor.pk)
+
+
+class SpendRollupTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.category = ProductCategory.objects.create(name='Stationery')
+        self.product = self.create_product(category=self.category)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purchase_order = PurchaseOrder.objects.create(vendor=self.vendor)
+            PurchaseOrderItem.objects.create(purchase_order=self.purchase_order, product=self.product,
+                                             qty=3, estimated_unit_price=10)
+
+    def report(self, **params):
+        response = self.client.get(reverse('spend-report'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.data['results']
+
+    def set_status(self, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purchase_order.status = status
+            self.purchase_order.save()
+
+    def test_rollups_follow_status_and_line_changes(self):
+        # Draft orders are not spend
+        self.assertFalse(SpendRollup.objects.exists())
+        self.set_status('awaiting')
+        self.assertEqual(self.report(group_by='vendor,category'), [{
+            'vendor': self.vendor.pk, 'vendor_name': 'Acme Supplies', 'category': self.category.pk,
+            'category_name': 'Stationery', 'amount': Decimal('30.00'), 'qty': 3, 'lines': 1, 'documents': 1}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PurchaseOrderItem.objects.create(purchase_order=self.purchase_order, product=self.product,
+                                             qty=1, estimated_unit_price=5)
+        self.set_status('completed')
+        self.assertEqual([(row['status'], row['amount']) for row in self.report(group_by='status')],
+                         [('completed', Decimal('35.00'))])
+
+        self.set_status('cancelled')
+        self.assertEqual(self.report(), [])
+
+    def test_rebuild_command_matches_incremental_rollups(self):
+        self.set_status('completed')
+        incremental = self.report(group_by='month,vendor,category,status')
+        SpendRollup.objects.all().delete()
+        call_command('rebuild_spend_rollups', stdout=StringIO())
+        self.assertEqual(self.report(group_by='month,vendor,category,status'), incremental)
+
+    def test_invalid_report_parameters(self):
+        response = self.client.get(reverse('spend-report'), {'group_by': 'product', 'month_from': '2026'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('group_by', response.data)
+
+
+class DocumentDownloadTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.product = self.create_product()
+        self.purchase_order = PurchaseOrder.objects.create(vendor=self.vendor, status='awaiting')
+        for qty in (1, 2):
+            PurchaseOrderItem.objects.create(purchase_order=self.purchase_order, product=self.product,
+                                             qty=qty, estimated_unit_price=10)
+        self.empty_order = PurchaseOrder.objects.create(vendor=self.vendor, status='draft')
+
+    def download(self, **params):
+        response = self.client.get(reverse('purchase-order-download'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_flattens_documents_and_lines(self):
+        rows = list(csv.reader(StringIO(self.download().decode('utf-8'))))
+        self.assertEqual(rows[0][:2], ['ID', 'Status'])
+        self.assertEqual(len(rows), 4)
+        lines = [row for row in rows[1:] if row[0] == self.purchase_order.pk]
+        self.assertEqual(sorted(row[-1] for row in lines), ['10.00', '20.00'])
+        # A document without lines still has its row
+        self.assertEqual([row[-1] for row in rows[1:] if row[0] == self.empty_order.pk], [''])
+
+    def test_download_honors_filters(self):
+        rows = list(csv.reader(StringIO(self.download(status='draft').decode('utf-8'))))
+        self.assertEqual([row[0] for row in rows[1:]], [self.empty_order.pk])
+
+    def test_xlsx_is_a_workbook(self):
+        with zipfile.ZipFile(BytesIO(self.download(file_type='xlsx'))) as workbook:
+            sheet = workbook.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(sheet.count('<row>'), 4)
+        self.assertIn(self.purchase_order.pk, sheet)
+
+
+@override_settings(PURCHASE_IMPORT_CHUNK_SIZE=2)
+class ImportTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.unit = UnitOfMeasure.objects.create(name='Box')
+        self.product_category = ProductCategory.objects.create(name='Stationery')
+
+    def upload(self, kind, name, content):
+        response = self.client.post(reverse('import-job-list'), {
+            'kind': kind, 'file': SimpleUploadedFile(name, content.encode('utf-8'))})
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.json()['status'], 'pending')
+        call_command('process_import_jobs', once=True, stdout=StringIO())
+        return self.client.get(response['Location']).json()
+
+    def test_csv_upserts_vendors(self):
+        job = self.upload('vendor', 'vendors.csv', 'company_name,email,category\n'
+                                                   'Acme Supplies,orders@acme.example.com,Suppliers\n'
+                                                   'Globex,sales@globex.example.com,\n'
+                                                   'Initech,not-an-email,Unknown\n')
+        self.assertEqual((job['status'], job['rows_processed']), ('completed', 3))
+        self.assertEqual((job['rows_created'], job['rows_updated'], job['rows_failed']), (1, 1, 1))
+        self.assertEqual(job['errors'][0]['row'], 3)
+        self.assertEqual(set(job['errors'][0]['errors']), {'email', 'category'})
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.email, 'orders@acme.example.com')
+        self.assertTrue(Vendor.objects.filter(company_name='Globex', category__isnull=True).exists())
+
+    def test_jsonl_products_resolve_names_once_per_chunk(self):
+        rows = [{'name': f'Pen {index}', 'company': 'Acme Supplies', 'category': 'Stationery',
+                 'unit_of_measure': 'Box', 'cost_price': '1.50', 'selling_price': 2} for index in range(4)]
+        content = '\n'.join(json.dumps(row) for row in rows) + '\n{"name": \n'
+        job = self.upload('product', 'products.jsonl', content)
+        self.assertEqual((job['rows_created'], job['rows_failed']), (4, 1))
+        self.assertEqual(Product.objects.filter(category=self.product_category, unit_of_measure=self.unit).count(), 4)
+        # Left out columns with a default take the model default
+        self.assertEqual(Product.objects.get(name='Pen 0').type, Product._meta.get_field('type').get_default())
+
+    def test_import_queries_do_not_grow_with_the_rows_of_a_chunk(self):
+        def count_queries(names):
+            rows = [{'name': name, 'company': 'Acme Supplies', 'category': 'Stationery',
+                     'unit_of_measure': 'Box', 'cost_price': '1.50', 'selling_price': 2} for name in names]
+            # A single chunk holding every row
+            with override_settings(PURCHASE_IMPORT_CHUNK_SIZE=len(rows)), CaptureQueriesContext(connection) as queries:
+                job = self.upload('product', 'products.jsonl', '\n'.join(json.dumps(row) for row in rows))
+            self.assertEqual((job['rows_created'], job['rows_failed']), (len(rows), 0))
+            return len(queries)
+
+        self.assertEqual(count_queries(['Pen 0', 'Pen 1']), count_queries([f'Marker {index}' for index in range(8)]))
+
+    def test_resume_queues_a_failed_job_again(self):
+        job = ImportJob.objects.create(kind='unit_of_measure', file_format='csv', status='failed', rows_processed=1,
+                                       file=SimpleUploadedFile('units.csv', b'name\nPack\nPallet\n'))
+        response = self.client.post(reverse('import-job-resume', args=[job.pk]))
+        self.assertEqual((response.status_code, response.json()['status']), (202, 'pending'))
+        call_command('process_import_jobs', once=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed, job.rows_created), ('completed', 2, 1))
+        self.assertEqual(self.client.post(reverse('import-job-resume', args=[job.pk])).status_code, 400)
+
+    def test_resume_skips_committed_rows(self):
+        job = ImportJob.objects.create(kind='unit_of_measure', file_format='csv', rows_processed=1,
+                                       file=SimpleUploadedFile('units.csv', b'name\nPack\nPallet\n'))
+        job = run_import(job)
+        self.assertEqual((job.status, job.rows_processed, job.rows_created), ('completed', 2, 1))
+        self.assertFalse(UnitOfMeasure.objects.filter(name='Pack').exists())
+        self.assertTrue(UnitOfMeasure.objects.filter(name='Pallet').exists())
+
+    def test_command_imports_categories(self):
+        path = os.path.join(tempfile.mkdtemp(), 'categories.csv')
+        with open(path, 'w') as file:
+            file.write('name,description\nFurniture,Desks and chairs\nStationery,Paper\n')
+        out = StringIO()
+        call_command('import_reference_data', 'product_category', path, stdout=out)
+        self.assertIn('1 created, 1 updated, 0 failed', out.getvalue())
+        self.product_category.refresh_from_db()
+        self.assertEqual(self.product_category.description, 'Paper')
+
+
+class FieldSelectionTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.product = self.create_product()
+        self.purchase_order = PurchaseOrder.objects.create(vendor=self.vendor)
+        for qty in (1, 2):
+            PurchaseOrderItem.objects.create(purchase_order=self.purchase_order, product=self.product, qty=qty,
+                                             estimated_unit_price=10)
+
+    def get(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), len(queries)
+
+    def test_fields_and_omit(self):
+        url = reverse('purchase-order-detail', args=[self.purchase_order.pk])
+        full, full_queries = self.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(url, {'fields': 'id,status'}).json()
+        self.assertEqual(set(data), {'id', 'status'})
+        # The items prefetch, and what it prefetches in turn, is skipped
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'purchase_purchaseorderitem' in query['sql']])
+        self.assertLess(len(queries), full_queries)
+        data, queries = self.get(url, {'omit': 'items,po_total_price'})
+        self.assertEqual(set(data), set(full) - {'items', 'po_total_price'})
+
+    def test_nested_fields(self):
+        data, queries = self.get(reverse('purchase-order-detail', args=[self.purchase_order.pk]),
+                                 {'fields': 'id,items.qty'})
+        self.assertEqual(set(data), {'id', 'items'})
+        self.assertEqual(sorted(data['items'], key=lambda item: item['qty']), [{'qty': 1}, {'qty': 2}])
+
+    def test_expand(self):
+        url = reverse('purchase-order-list')
+        data, queries = self.get(url, {'expand': 'vendor,items.product', 'fields': 'vendor,items.product'})
+        document = data['results'][0]
+        self.assertEqual(document['vendor']['company_name'], 'Acme Supplies')
+        self.assertEqual(document['items'][0]['product']['name'], 'Printer paper')
+        PurchaseOrder.objects.create(vendor=self.vendor)
+        self.assertEqual(self.get(url, {'expand': 'vendor,items.product', 'fields': 'vendor,items.product'})[1],
+                         queries)
+
+    def test_writes_ignore_selection(self):
+        response = self.client.post(f"{reverse('vendor-category-list')}?fields=url",
+                                    {'name': 'Logistics'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertIn('vendors', response.json())
+
+
+class CompactRepresentationTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.product = self.create_product()
+        self.purchase_order = PurchaseOrder.objects.create(vendor=self.vendor)
+        for qty in range(1, 6):
+            PurchaseOrderItem.objects.create(purchase_order=self.purchase_order, product=self.product, qty=qty,
+                                             estimated_unit_price=10)
+
+    def test_compact_list(self):
+        url = reverse('purchase-order-list')
+        full = self.client.get(url)
+        compact = self.client.get(url, {'format': 'compact'})
+        self.assertEqual(compact.status_code, 200, compact.content)
+        data = compact.json()
+        document = data['results'][0]
+        self.assertNotIn('url', document)
+        self.assertEqual((document['id'], document['vendor']), (self.purchase_order.pk, self.vendor.pk))
+        self.assertEqual(document['items'][0]['product'], self.product.pk)
+        self.assertTrue(data['links']['self'].endswith("/purchase-order/{id}/"))
+        self.assertTrue(data['links']['items.product'].endswith('/{id}/'))
+        self.assertLess(len(compact.content), len(full.content) * 0.75)
+
+    def test_accept_parameter_selects_compact(self):
+        url = reverse('purchase-order-detail', args=[self.purchase_order.pk])
+        response = self.client.get(url, HTTP_ACCEPT='application/json; representation=compact')
+        self.assertEqual(response.json()['data']['vendor'], self.vendor.pk)
+        self.assertIn('url', self.client.get(url, HTTP_ACCEPT='application/json').json())
+
+    def test_compact_writes_take_primary_keys(self):
+        url = f"{reverse('purchase-order-item-bulk')}?format=compact"
+        response = self.client.post(url, [{'purchase_order': self.purchase_order.pk, 'product': self.product.pk,
+                                           'qty': 1, 'estimated_unit_price': '5.00'}],
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.post(url, [{'purchase_order': self.purchase_order.pk, 'product': 0,
+                                           'qty': 1, 'estimated_unit_price': '5.00'}],
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('product', response.json()['0'])
+
+    def test_reference_cache_is_per_representation(self):
+        url = reverse('vendor-list')
+        self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT='application/json; representation=compact')
+        self.assertNotIn('url', response.json()['results'][0])
+
+
+class DocumentConversionTestCase(PurchaseTestMixin, FastTenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = TenantClient(self.tenant)
+        self.client.force_login(self.user)
+        self.other_vendor = Vendor.objects.create(company_name='Globex', email='sales@globex.example.com')
+        self.paper = self.create_product()
+        self.toner = self.create_product(name='Toner')
+        self.requests = [self.create_purchase_request(status='approved') for _ in range(3)]
+        self.requests.append(self.create_purchase_request(status='approved', suggested_vendor=self.other_vendor))
+        for purchase_request in self.requests:
+            PurchaseRequestItem.objects.create(purchase_request=purchase_request, product=self.paper, qty=2,
+                                               estimated_unit_price=10)
+        PurchaseRequestItem.objects.create(purchase_request=self.requests[0], product=self.toner, qty=1,
+                                           estimated_unit_price=50)
+
+    def post(self, url, data=None, expected=201):
+        response = self.client.post(url, data or {}, content_type='application/json')
+        self.assertEqual(response.status_code, expected, response.content)
+        return response.json()
+
+    def test_batch_merges_requests_per_vendor(self):
+        url = reverse('purchase-request-convert-many')
+        rfqs = self.post(url, {'purchase_requests': [reverse('purchase-request-detail', args=[pr.pk])
+                                                     for pr in self.requests]})
+        self.assertEqual(len(rfqs), 2)
+        rfq = RequestForQuotation.objects.get(vendor=self.vendor)
+        self.assertEqual(sorted(rfq.items.values_list('product__name', 'qty')), [('Printer paper', 6), ('Toner', 1)])
+        self.assertEqual(rfq.rfq_total_price, Decimal('110.00'))
+        self.assertEqual(set(rfq.purchase_requests.all()), set(self.requests[:3]))
+        # Converting again is refused
+        errors = self.post(url, {'purchase_requests': [reverse('purchase-request-detail', args=[self.requests[0].pk])]},
+                           expected=400)
+        self.assertIn(self.requests[0].pk, errors)
+
+    def test_batch_queries_do_not_grow_with_the_requests(self):
+        def count_queries(count):
+            requests = [self.create_purchase_request(status='approved', suggested_vendor=self.other_vendor)
+                        for _ in range(count)]
+            for purchase_request in requests:
+                PurchaseRequestItem.objects.create(purchase_request=purchase_request, product=self.toner, qty=1,
+                                                   estimated_unit_price=50)
+            with CaptureQueriesContext(connection) as queries:
+                self.post(reverse('purchase-request-convert-many'), {
+                    'purchase_requests': [reverse('purchase-request-detail', args=[pr.pk]) for pr in requests]})
+            return len(queries)
+
+        # The first conversion allocates a block of document numbers and fills the caches
+        count_queries(1)
+        self.assertEqual(count_queries(2), count_queries(4))
+
+    def test_only_approved_requests_convert(self):
+        draft = self.create_purchase_request()
+        self.post(reverse('purchase-request-convert', args=[draft.pk]), expected=400)
+        self.assertFalse(RequestForQuotation.objects.exists())
+
+    def test_rfq_and_quote_convert_to_purchase_orders(self):
+        self.post(reverse('purchase-request-convert', args=[self.requests[0].pk]))
+        rfq = RequestForQuotation.objects.get(purchase_requests=self.requests[0])
+        quote = RFQVendorQuote.objects.create(rfq=rfq, vendor=self.other_vendor)
+        RFQVendorQuoteItem.objects.create(rfq_vendor_quote=quote, product=self.paper, qty=2, estimated_unit_price=8)
+        data = self.post(reverse('rfq-vendor-quote-convert', args=[quote.pk]))
+        purchase_order = PurchaseOrder.objects.get(pk=data['id'])
+        self.assertEqual((purchase_order.vendor, purchase_order.status), (self.other_vendor, 'draft'))
+        self.assertEqual(purchase_order.po_total_price, Decimal('16.00'))
+        rfq.refresh_from_db()
+        self.assertEqual((rfq.status, rfq.vendor), ('selected', self.other_vendor))
+        # A RFQ converts into a single active order
+        self.post(reverse('request-for-quotation-convert', args=[rfq.pk]), expected=400)
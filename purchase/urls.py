@@ -20,8 +20,11 @@ router.register(r'purchase-order', views.PurchaseOrderViewSet, basename='purchas
 router.register(r'purchase-order-items', views.PurchaseOrderItemViewSet, basename='purchase-order-item')
 router.register(r'po-vendor-quote', views.POVendorQuoteViewSet, basename='po-vendor-quote')
 router.register(r'po-vendor-quote-items', views.POVendorQuoteItemViewSet, basename='po-vendor-quote-item')
+router.register(r'imports', views.ImportJobViewSet, basename='import-job')
 
 
 urlpatterns = [
+    path('summary/', views.PurchaseSummaryView.as_view(), name='purchase-summary'),
+    path('spend/', views.SpendReportView.as_view(), name='spend-report'),
     path('', include(router.urls)),
 ]
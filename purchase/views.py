@@ -1,18 +1,88 @@
+import hashlib
+from datetime import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count, F, Max, Prefetch, Sum
+from django.db.models.functions import Collate, Upper
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets, status, generics, filters
+from rest_framework import viewsets, status, generics, filters, mixins
 from rest_framework import permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
+from core.pagination import KeysetPagination
+from .cache import get_cache_timeout, get_response_cache_key
+from .comparison import compare_quotes
+from .conversions import convert_requests, convert_rfq
+from .documents import render_document
+from .exports import EXPORT_FORMATS, stream_export
+from .renderers import CompactContentNegotiation, CompactJSONRenderer
+from .search import FullTextSearchFilter
+from .spend import SPEND_SOURCES
 from .models import PurchaseRequest, PurchaseRequestItem, Department, Vendor, Product, RequestForQuotation, \
     RequestForQuotationItem, VendorCategory, ProductCategory, UnitOfMeasure, RFQVendorQuote, RFQVendorQuoteItem, \
-    PurchaseOrder, PurchaseOrderItem, POVendorQuote, POVendorQuoteItem
+    PurchaseOrder, PurchaseOrderItem, POVendorQuote, POVendorQuoteItem, SpendRollup, ImportJob
 from .serializers import PurchaseRequestSerializer, DepartmentSerializer, VendorSerializer, \
     ProductSerializer, RequestForQuotationSerializer, RequestForQuotationItemSerializer, \
     VendorCategorySerializer, ProductCategorySerializer, UnitOfMeasureSerializer, \
     PurchaseRequestItemSerializer, RFQVendorQuoteSerializer, RFQVendorQuoteItemSerializer, \
     PurchaseOrderSerializer, PurchaseOrderItemSerializer, POVendorQuoteSerializer, \
-    POVendorQuoteItemSerializer
+    POVendorQuoteItemSerializer, ImportJobSerializer, DynamicFieldsMixin, PurchaseRequestConversionSerializer, \
+    BatchPurchaseRequestConversionSerializer, RFQConversionSerializer
+
+
+# The compact representation first, which only requests asking for it select
+RENDERER_CLASSES = [CompactJSONRenderer, *api_settings.DEFAULT_RENDERER_CLASSES]
+
+
+def get_lookup_root(lookup):
+    return (lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup).split('__')[0]
+
+
+def prefetch_items(item_model):
+    """
+    Prefetches a document's `items` with their line totals computed by the database.
+    """
+    return Prefetch('items', queryset=item_model.objects.annotate(line_total=item_model.line_total_expression()))
+
+
+def conversion_error(exc):
+    """
+    Reports the `ValidationError` of a `purchase.conversions` function as an API validation error.
+    """
+    return ValidationError(exc.message_dict if hasattr(exc, 'error_dict') else {'non_field_errors': exc.messages})
+
+
+def convert_rfq_response(view, rfq_id, quote_id):
+    try:
+        purchase_order = convert_rfq(rfq_id, quote_id)
+    except DjangoValidationError as e:
+        raise conversion_error(e)
+    purchase_order = converted_documents(PurchaseOrder, PurchaseOrderItem, [purchase_order.pk]).get()
+    return Response(PurchaseOrderSerializer(purchase_order, context=view.get_serializer_context()).data,
+                    status=status.HTTP_201_CREATED)
+
+
+def converted_documents(model, item_model, pks):
+    """
+    Loads the documents a conversion created with their lines, for the response.
+    """
+    return model.objects.filter(pk__in=pks).order_by('pk').prefetch_related(prefetch_items(item_model))
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
 
 
 class SoftDeleteWithModelViewSet(viewsets.ModelViewSet):
@@ -20,12 +90,132 @@ class SoftDeleteWithModelViewSet(viewsets.ModelViewSet):
     A viewset that provides default `list()`, `create()`, `retrieve()`, `update()`, `partial_update()`,
     and a custom `destroy()` action to hide instances instead of deleting them, a custom action to list
     hidden instances, a custom action to revert the hidden field back to False.
+
+    Subclasses declare the related objects their serializer needs in `queryset_plans`, keyed by action
+    with a `'default'` entry for the remaining actions, e.g.
+    `{'default': {'select_related': [...], 'prefetch_related': [...]}}`. Lookups of fields a read leaves
+    out with `?fields=`/`?omit=` are skipped and relations opened with `?expand=` are added (see
+    `DynamicFieldsMixin`).
+
+    List actions page with offsets by default; clients can opt into keyset pages with
+    `?pagination=cursor` (see `KeysetPagination`).
+
+    Reads in `conditional_actions` answer conditional GETs: the ETag and Last-Modified validators come
+    from the latest `last_modified_field` (`date_updated` or `updated_on` when not set) and the row
+    count of the rows the action serves, so a matching `If-None-Match` or `If-Modified-Since` gets a
+    304 before anything is serialized. Writes to document lines move their document's `date_updated`.
+    Viewsets whose responses embed other rows that change on their own must leave them out.
     """
+    pagination_class = KeysetPagination
+    renderer_classes = RENDERER_CLASSES
+    content_negotiation_class = CompactContentNegotiation
+    queryset_plans = {}
+    # Actions that never serialize related objects
+    unplanned_actions = ('destroy', 'toggle_hidden', 'send_email', 'export', 'compare', 'download', 'convert',
+                         'convert_many')
+    conditional_actions = ('list', 'retrieve', 'hidden', 'active', 'search')
+    last_modified_field = None
+
+    def get_queryset_plan(self):
+        if self.action in self.unplanned_actions:
+            return {}
+        return self.queryset_plans.get(self.action, self.queryset_plans.get('default', {}))
 
     def get_queryset(self):
         # # Filter out hidden instances by default
         # return self.queryset.filter(is_hidden=False)
-        return super().get_queryset()
+        queryset = super().get_queryset()
+        plan = self.get_queryset_plan()
+        select_related, prefetch_related = plan.get('select_related', []), plan.get('prefetch_related', [])
+        selection = None if self.action in self.unplanned_actions else self.get_serializer_selection()
+        if selection is not None:
+            # Only load what the fields selected with `?fields=`/`?omit=`/`?expand=` render
+            sources, expanded = selection
+            select_related = [lookup for lookup in select_related if lookup.split('__')[0] in sources]
+            prefetch_related = [lookup for lookup in prefetch_related if get_lookup_root(lookup) in sources]
+            select_related += [path for path in expanded if '__' not in path]
+            prefetch_related += [path for path in expanded if '__' in path]
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def get_serializer_selection(self):
+        """
+        Returns the `(sources, expanded paths)` of the fields the serializer renders for this request,
+        or None when it does not support field selection or renders everything.
+        """
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        if not isinstance(serializer, DynamicFieldsMixin) or serializer.get_selection() is None:
+            return None
+        return serializer.get_selected_sources(), serializer.get_expanded_paths()
+
+    def get_action_queryset(self):
+        """
+        Returns the rows a list-style action serves.
+        """
+        if self.action == 'hidden':
+            return self.get_queryset().filter(is_hidden=True)
+        if self.action == 'active':
+            return self.get_queryset().filter(is_hidden=False)
+        if self.action == 'search':
+            return self.filter_queryset(self.get_queryset()).filter(is_hidden=False)
+        return self.filter_queryset(self.get_queryset())
+
+    def get_last_modified_field(self):
+        if self.last_modified_field:
+            return self.last_modified_field
+        field_names = {field.name for field in self.queryset.model._meta.concrete_fields}
+        return next((name for name in ('date_updated', 'updated_on') if name in field_names), None)
+
+    def get_validators(self, request):
+        """
+        Returns the `(etag, last_modified)` of the current read, or None when it is not conditional.
+        """
+        field = self.get_last_modified_field()
+        if request.method not in ('GET', 'HEAD') or self.action not in self.conditional_actions or field is None:
+            return None
+        if request.query_params.get('expand'):
+            # Expanded rows change without moving this model's validators
+            return None
+        queryset = self.get_action_queryset()
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        try:
+            state = queryset.order_by().aggregate(last_modified=Max(field), count=Count('pk'))
+        except (TypeError, ValueError, DjangoValidationError):
+            # Malformed lookups are reported by the action itself
+            return None
+        last_modified = state['last_modified']
+        version = ':'.join([last_modified.isoformat() if last_modified else '', str(state['count']),
+                            request.build_absolute_uri(), request.accepted_renderer.format])
+        etag = quote_etag(hashlib.md5(version.encode('utf-8')).hexdigest())
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = self.get_validators(request)
+        if self.validators is not None:
+            etag, last_modified = self.validators
+            if get_conditional_response(request, etag=etag, last_modified=last_modified) is not None:
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return HttpResponseNotModified()
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, 'validators', None)
+        if validators is not None and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            etag, last_modified = validators
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
 
     def perform_destroy(self, instance):
         # Perform a soft delete
@@ -43,7 +233,7 @@ class SoftDeleteWithModelViewSet(viewsets.ModelViewSet):
     @action(detail=False)
     def hidden(self, request, *args, **kwargs):
         # List all hidden instances
-        hidden_instances = self.queryset.filter(is_hidden=True)
+        hidden_instances = self.get_action_queryset()
         page = self.paginate_queryset(hidden_instances)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -54,7 +244,7 @@ class SoftDeleteWithModelViewSet(viewsets.ModelViewSet):
     @action(detail=False)
     def active(self, request, *args, **kwargs):
         # List all active instances
-        active_instances = self.queryset.filter(is_hidden=False)
+        active_instances = self.get_action_queryset()
         page = self.paginate_queryset(active_instances)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -67,14 +257,17 @@ class SearchDeleteViewSet(SoftDeleteWithModelViewSet):
     """
     A viewset that inherits from `SoftDeleteWithModelViewSet` and adds a custom `search` action to
     enable searching functionality.
-    The search functionality can be accessed via the DRF API interface.
+    The search functionality can be accessed via the DRF API interface. Models listed in
+    `purchase.search.SEARCH_DOCUMENTS` are searched with their full-text and trigram indexes and
+    ranked, others over `search_fields`.
     """
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     search_fields = []
+    ordering_fields = []
 
     @action(detail=False)
     def search(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset()).filter(is_hidden=False)
+        queryset = self.get_action_queryset()
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -83,130 +276,517 @@ class SearchDeleteViewSet(SoftDeleteWithModelViewSet):
         return Response(serializer.data)
 
 
-class PurchaseRequestViewSet(SearchDeleteViewSet):
+class ReferenceDataCacheMixin:
+    """
+    Serves the list responses of a reference data viewset from the cache, per tenant and URL. The key
+    embeds the cache versions of `cache_models` (the viewset's model by default), which saving, hiding
+    or deleting any of their rows bumps.
+    """
+    cache_models = ()
+
+    def get_cache_models(self):
+        return self.cache_models or (self.queryset.model,)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = get_response_cache_key(request, self.basename, self.action, self.get_cache_models())
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, get_cache_timeout())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    @action(detail=False)
+    def hidden(self, request, *args, **kwargs):
+        return self.cached_response(super().hidden, request, *args, **kwargs)
+
+    @action(detail=False)
+    def active(self, request, *args, **kwargs):
+        return self.cached_response(super().active, request, *args, **kwargs)
+
+
+class AutocompleteMixin:
+    """
+    Adds an `autocomplete` action that returns the `id` and `label` of the active rows whose
+    `autocomplete_field` starts with `?q=`, without serializers or pagination. Matching and ordering
+    are served by a partial btree index on `UPPER(field) COLLATE "C"` and the query runs under the
+    `PURCHASE_AUTOCOMPLETE_TIMEOUT` statement timeout (ms); a query that exceeds it returns no
+    results with `timed_out` set.
+    """
+    autocomplete_field = 'name'
+    autocomplete_param = 'q'
+
+    def get_autocomplete_limit(self, request):
+        max_limit = getattr(settings, 'PURCHASE_AUTOCOMPLETE_MAX_LIMIT', 20)
+        try:
+            return min(max(int(request.query_params['limit']), 1), max_limit)
+        except (KeyError, ValueError):
+            return min(getattr(settings, 'PURCHASE_AUTOCOMPLETE_LIMIT', 10), max_limit)
+
+    @action(detail=False)
+    def autocomplete(self, request, *args, **kwargs):
+        prefix = request.query_params.get(self.autocomplete_param, '').strip()
+        if not prefix:
+            return Response({'results': [], 'timed_out': False})
+        queryset = self.queryset.filter(is_hidden=False) \
+            .annotate(autocomplete_key=Collate(Upper(self.autocomplete_field), 'C')) \
+            .filter(autocomplete_key__startswith=prefix.upper()) \
+            .order_by('autocomplete_key', 'pk').values_list('pk', self.autocomplete_field)
+        limit = self.get_autocomplete_limit(request)
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT set_config('statement_timeout', %s, true)",
+                                   [str(getattr(settings, 'PURCHASE_AUTOCOMPLETE_TIMEOUT', 50))])
+                rows = list(queryset[:limit])
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL statement_timeout TO DEFAULT')
+        except OperationalError:
+            return Response({'results': [], 'timed_out': True})
+        return Response({'results': [{'id': pk, 'label': label} for pk, label in rows], 'timed_out': False})
+
+
+class DocumentExportMixin:
+    """
+    Adds an `export` action that downloads the document as HTML, served from the cached render of
+    the document's current version.
+    """
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        document = self.get_object()
+        response = HttpResponse(render_document(document), content_type='text/html; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{document.pk}.html"'
+        return response
+
+
+class DocumentDownloadMixin:
+    """
+    Adds a `download` action that streams the documents matching the current search and filter
+    parameters, flattened to one row per line, as `?file_type=csv` (default) or `xlsx`. Rows are read
+    through a server-side cursor and written as they arrive, so memory stays flat however many lines
+    are exported.
+    """
+
+    @action(detail=False, methods=['get'])
+    def download(self, request, *args, **kwargs):
+        file_type = request.query_params.get('file_type', 'csv')
+        if file_type not in EXPORT_FORMATS:
+            raise ValidationError({'file_type': [f'Must be one of {", ".join(EXPORT_FORMATS)}.']})
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(stream_export(queryset, file_type), content_type=EXPORT_FORMATS[file_type])
+        response['Content-Disposition'] = f'attachment; filename="{self.basename}.{file_type}"'
+        return response
+
+
+class BulkLineMixin:
+    """
+    Adds a `bulk` action to line item viewsets: POST a list of items to create them, or PATCH a list
+    of partial items, each with its `id`, to update them. All rows are validated before anything is
+    written and errors are returned keyed by row index.
+    """
+    bulk_max_rows = 1000
+
+    @action(detail=False, methods=['post', 'patch'])
+    def bulk(self, request, *args, **kwargs):
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if len(rows) > self.bulk_max_rows:
+            raise ValidationError({'non_field_errors': [f'At most {self.bulk_max_rows} items can be sent at once.']})
+
+        if request.method == 'POST':
+            serializer = self.get_serializer(data=rows, many=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        instances = self.get_bulk_instances(rows)
+        serializer = self.get_serializer(instances, data=rows, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+    def get_bulk_instances(self, rows):
+        """
+        Loads the lines a bulk update refers to with one query, in the order of the rows.
+        """
+        pk_field = self.get_queryset().model._meta.pk
+        pks, errors = [], {}
+        for index, row in enumerate(rows):
+            try:
+                pks.append(pk_field.to_python(row.get('id') if isinstance(row, dict) else None))
+            except DjangoValidationError:
+                pks.append(None)
+        instances = self.get_queryset().in_bulk([pk for pk in pks if pk is not None])
+        for index, pk in enumerate(pks):
+            if pk not in instances:
+                errors[index] = {'id': ['A valid item id is required.']}
+            elif pks.index(pk) != index:
+                errors[index] = {'id': ['This item appears more than once.']}
+        if errors:
+            raise ValidationError(errors)
+        return [instances[pk] for pk in pks]
+
+
+class PurchaseRequestViewSet(DocumentDownloadMixin, SearchDeleteViewSet):
     queryset = PurchaseRequest.objects.all()
     serializer_class = PurchaseRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
-    search_fields = ['id', 'requester__username', 'suggested_vendor__name']
+    queryset_plans = {'default': {'prefetch_related': [prefetch_items(PurchaseRequestItem)]}}
+    search_fields = ['id', 'requester__username', 'suggested_vendor__company_name']
+    ordering_fields = ['date_created', 'date_updated', 'total_price']
+    filterset_fields = {'status': ['exact'], 'total_price': ['gte', 'lte']}
 
     def perform_create(self, serializer):
         serializer.save(requester=self.request.user)
 
+    convert_max_documents = 1000
+
+    @action(detail=True, methods=['post'])
+    def convert(self, request, pk=None):
+        """
+        Converts an approved purchase request into a RFQ for its suggested vendor.
+        """
+        purchase_request = self.get_object()
+        serializer = PurchaseRequestConversionSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        return self.converted_response([purchase_request.pk], serializer.validated_data.get('expiry_date'))
+
+    @action(detail=False, methods=['post'], url_path='convert')
+    def convert_many(self, request):
+        """
+        Merges approved purchase requests, given as `purchase_requests`, into one RFQ per suggested vendor.
+        """
+        purchase_requests = request.data.get('purchase_requests') if isinstance(request.data, dict) else None
+        if isinstance(purchase_requests, list) and len(purchase_requests) > self.convert_max_documents:
+            raise ValidationError({'purchase_requests': [
+                f'At most {self.convert_max_documents} purchase requests can be converted at once.']})
+        serializer = BatchPurchaseRequestConversionSerializer(data=request.data,
+                                                              context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        return self.converted_response([purchase_request.pk for purchase_request
+                                        in serializer.validated_data['purchase_requests']],
+                                       serializer.validated_data.get('expiry_date'))
+
+    def converted_response(self, pks, expiry_date):
+        try:
+            rfqs = convert_requests(pks, expiry_date)
+        except DjangoValidationError as e:
+            raise conversion_error(e)
+        rfqs = converted_documents(RequestForQuotation, RequestForQuotationItem, [rfq.pk for rfq in rfqs])
+        return Response(RequestForQuotationSerializer(rfqs, many=True, context=self.get_serializer_context()).data,
+                        status=status.HTTP_201_CREATED)
+
 
-class PurchaseRequestItemViewSet(viewsets.ModelViewSet):
+class PurchaseRequestItemViewSet(BulkLineMixin, viewsets.ModelViewSet):
     queryset = PurchaseRequestItem.objects.all()
     serializer_class = PurchaseRequestItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    content_negotiation_class = CompactContentNegotiation
 
 
-class DepartmentViewSet(SoftDeleteWithModelViewSet):
+class DepartmentViewSet(ReferenceDataCacheMixin, SoftDeleteWithModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class UnitOfMeasureViewSet(SearchDeleteViewSet):
+class UnitOfMeasureViewSet(ReferenceDataCacheMixin, SearchDeleteViewSet):
     queryset = UnitOfMeasure.objects.all()
     serializer_class = UnitOfMeasureSerializer
     permission_classes = [permissions.IsAuthenticated]
     search_fields = ['name',]
 
 
-class VendorCategoryViewSet(SearchDeleteViewSet):
+class VendorCategoryViewSet(ReferenceDataCacheMixin, SearchDeleteViewSet):
     queryset = VendorCategory.objects.all()
     serializer_class = VendorCategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_models = (VendorCategory, Vendor)
+    # Responses embed the category's vendors, whose changes do not move `updated_on`
+    conditional_actions = ()
+    queryset_plans = {'default': {'prefetch_related': ['vendors']}}
     search_fields = ['name',]
 
 
-class ProductCategoryViewSet(SearchDeleteViewSet):
+class ProductCategoryViewSet(ReferenceDataCacheMixin, SearchDeleteViewSet):
     queryset = ProductCategory.objects.all()
     serializer_class = ProductCategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    cache_models = (ProductCategory, Product)
+    # Responses embed the category's products, whose changes do not move `updated_on`
+    conditional_actions = ()
+    queryset_plans = {'default': {'prefetch_related': ['products']}}
     search_fields = ['name',]
 
 
-class VendorViewSet(SearchDeleteViewSet):
+class VendorViewSet(AutocompleteMixin, ReferenceDataCacheMixin, SearchDeleteViewSet):
     queryset = Vendor.objects.all()
     serializer_class = VendorSerializer
     permission_classes = [permissions.IsAuthenticated]
     search_fields = ['company_name',]
+    autocomplete_field = 'company_name'
 
 
-class ProductViewSet(SearchDeleteViewSet):
+class ProductViewSet(AutocompleteMixin, SearchDeleteViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
-    search_fields = ['name', 'category__name', 'unit_of_measure__name', 'type', 'company__name',]
+    search_fields = ['name', 'category__name', 'unit_of_measure__name', 'type', 'company__company_name',]
 
 
-class RequestForQuotationViewSet(SearchDeleteViewSet):
+class RequestForQuotationViewSet(DocumentExportMixin, DocumentDownloadMixin, SearchDeleteViewSet):
     queryset = RequestForQuotation.objects.all()
     serializer_class = RequestForQuotationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    queryset_plans = {'default': {'prefetch_related': [prefetch_items(RequestForQuotationItem)]}}
     search_fields = ['vendor__company_name', 'status',]
+    ordering_fields = ['date_created', 'date_updated', 'rfq_total_price']
+    filterset_fields = {'status': ['exact'], 'rfq_total_price': ['gte', 'lte']}
 
     # for sending RFQs to vendor emails
     @action(detail=True, methods=['get', 'post'])
     def send_email(self, request, pk=None):
         rfq = self.get_object()
         try:
-            rfq.send_email()
-            return Response({'status': 'email sent'}, status=status.HTTP_200_OK)
+            job = rfq.send_email()
+            return Response({'status': 'email queued', 'job': job.id,
+                             'job_url': reverse('email-job-detail', args=[job.id], request=request)},
+                            status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    # for comparing the vendor quotes of an RFQ
+    @action(detail=True, methods=['get'])
+    def compare(self, request, pk=None):
+        return Response(compare_quotes(self.get_object()))
+
+    @action(detail=True, methods=['post'])
+    def convert(self, request, pk=None):
+        """
+        Converts the RFQ into a draft purchase order, from the vendor quote given as `quote` if any.
+        """
+        rfq = self.get_object()
+        serializer = RFQConversionSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        quote = serializer.validated_data.get('quote')
+        return convert_rfq_response(self, rfq.pk, quote.pk if quote else None)
+
 
-class RequestForQuotationItemViewSet(viewsets.ModelViewSet):
+class RequestForQuotationItemViewSet(BulkLineMixin, viewsets.ModelViewSet):
     queryset = RequestForQuotationItem.objects.all()
     serializer_class = RequestForQuotationItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    content_negotiation_class = CompactContentNegotiation
 
 
 class RFQVendorQuoteViewSet(SearchDeleteViewSet):
     queryset = RFQVendorQuote.objects.all()
     serializer_class = RFQVendorQuoteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    queryset_plans = {'default': {'prefetch_related': [prefetch_items(RFQVendorQuoteItem)]}}
     search_fields = ['vendor__company_name',]
+    ordering_fields = ['date_opened', 'date_updated', 'quote_total_price']
+    filterset_fields = {'quote_total_price': ['gte', 'lte']}
 
+    @action(detail=True, methods=['post'])
+    def convert(self, request, pk=None):
+        """
+        Converts the quote's RFQ into a draft purchase order for this quote's vendor and lines.
+        """
+        quote = self.get_object()
+        return convert_rfq_response(self, quote.rfq_id, quote.pk)
 
-class RFQVendorQuoteItemViewSet(viewsets.ModelViewSet):
+
+class RFQVendorQuoteItemViewSet(BulkLineMixin, viewsets.ModelViewSet):
     queryset = RFQVendorQuoteItem.objects.all()
     serializer_class = RFQVendorQuoteItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    content_negotiation_class = CompactContentNegotiation
 
 
-class PurchaseOrderViewSet(SearchDeleteViewSet):
+class PurchaseOrderViewSet(DocumentExportMixin, DocumentDownloadMixin, SearchDeleteViewSet):
     queryset = PurchaseOrder.objects.all()
     serializer_class = PurchaseOrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    queryset_plans = {'default': {'prefetch_related': [prefetch_items(PurchaseOrderItem)]}}
     search_fields = ['status', 'vendor__company_name']
+    ordering_fields = ['date_created', 'date_updated', 'po_total_price']
+    filterset_fields = {'status': ['exact'], 'po_total_price': ['gte', 'lte']}
 
     # for sending POs to vendor emails
     @action(detail=True, methods=['get', 'post'])
     def send_email(self, request, pk=None):
         po = self.get_object()
         try:
-            po.send_email()
-            return Response({'status': 'email sent'}, status=status.HTTP_200_OK)
+            job = po.send_email()
+            return Response({'status': 'email queued', 'job': job.id,
+                             'job_url': reverse('email-job-detail', args=[job.id], request=request)},
+                            status=status.HTTP_202_ACCEPTED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class PurchaseOrderItemViewSet(viewsets.ModelViewSet):
+class PurchaseOrderItemViewSet(BulkLineMixin, viewsets.ModelViewSet):
     queryset = PurchaseOrderItem.objects.all()
     serializer_class = PurchaseOrderItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    content_negotiation_class = CompactContentNegotiation
 
 
 class POVendorQuoteViewSet(SearchDeleteViewSet):
     queryset = POVendorQuote.objects.all()
     serializer_class = POVendorQuoteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    queryset_plans = {'default': {'prefetch_related': [prefetch_items(POVendorQuoteItem)]}}
     search_fields = ['vendor__company_name',]
+    ordering_fields = ['date_created', 'date_updated', 'quote_total_price']
+    filterset_fields = {'quote_total_price': ['gte', 'lte']}
 
 
-class POVendorQuoteItemViewSet(viewsets.ModelViewSet):
+class POVendorQuoteItemViewSet(BulkLineMixin, viewsets.ModelViewSet):
     queryset = POVendorQuoteItem.objects.all()
     serializer_class = POVendorQuoteItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    content_negotiation_class = CompactContentNegotiation
+
+
+
+class ImportJobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    Bulk imports of units of measure, categories, vendors and products. POST a CSV or JSON Lines
+    `file` with its `kind` to queue it; the `process_import_jobs` worker runs it and the job, polled
+    at its URL, reports its counts and per-row errors. A failed job can be queued again with the
+    `resume` action, which carries on from its last committed chunk.
+    """
+    queryset = ImportJob.objects.select_related('requester')
+    serializer_class = ImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['kind', 'status']
+    ordering_fields = ['date_created', 'date_updated']
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        # Queued for the worker, the Location header points at the job to poll
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    def perform_create(self, serializer):
+        serializer.save(requester=self.request.user)
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        job = self.get_object()
+        if job.status in ('completed', 'running'):
+            raise ValidationError({'status': [f'This import is already {job.status}.']})
+        job.status = 'pending'
+        job.last_error = ''
+        job.save(update_fields=['status', 'last_error', 'date_updated'])
+        data = self.get_serializer(job).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['url']})
+
+# (key, document model, total field) of the documents in the status summary
+STATUS_SUMMARIES = (
+    ('purchase_request', PurchaseRequest, 'total_price'),
+    ('request_for_quotation', RequestForQuotation, 'rfq_total_price'),
+    ('purchase_order', PurchaseOrder, 'po_total_price'),
+)
+
+
+class PurchaseSummaryView(APIView):
+    """
+    Counts and value totals of the active PRs, RFQs and POs per status, each computed with one grouped
+    query over the document's status index. The summary is cached per tenant until a document or one
+    of its lines changes.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        key = get_response_cache_key(request, 'purchase-summary', 'get',
+                                     [model for name, model, total_field in STATUS_SUMMARIES])
+        summary = cache.get(key)
+        if summary is None:
+            summary = {name: self.summarize(model, total_field) for name, model, total_field in STATUS_SUMMARIES}
+            cache.set(key, summary, get_cache_timeout())
+        return Response(summary)
+
+    @staticmethod
+    def summarize(model, total_field):
+        summary = {status_name: {'count': 0, 'total': Decimal('0.00')}
+                   for status_name, label in model._meta.get_field('status').choices}
+        rows = model.objects.filter(is_hidden=False).order_by().values('status') \
+            .annotate(count=Count('pk'), total=Sum(total_field))
+        for row in rows:
+            summary[row['status']] = {'count': row['count'], 'total': row['total']}
+        return summary
+
+
+# Report dimensions of the spend rollups and the names reported with them
+SPEND_DIMENSIONS = {
+    'month': {},
+    'status': {},
+    'vendor': {'vendor_name': F('vendor__company_name')},
+    'category': {'category_name': F('category__name')},
+    'department': {'department_name': F('department__name')},
+}
+
+
+class SpendReportView(APIView):
+    """
+    Spend drill-down over the `SpendRollup` rows: `?source=purchase_order|purchase_request` (default
+    `purchase_order`), `?group_by=` a comma separated list of month, status, vendor, category and
+    department (default `month`), and the optional filters `month_from`/`month_to` (`YYYY-MM`),
+    `status`, `vendor`, `category` and `department`. Each report is one grouped read of the rollups,
+    whatever the number of document lines behind them.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        source = params.get('source', 'purchase_order')
+        if source not in SPEND_SOURCES:
+            raise ValidationError({'source': [f'Must be one of {", ".join(SPEND_SOURCES)}.']})
+        group_by = [name.strip() for name in params.get('group_by', 'month').split(',') if name.strip()]
+        unknown = [name for name in group_by if name not in SPEND_DIMENSIONS]
+        if unknown:
+            raise ValidationError({'group_by': [f'Unknown dimension {", ".join(unknown)}.']})
+
+        rollups = SpendRollup.objects.filter(source=source, **self.get_filters(params))
+        names = {column: expression for name in group_by for column, expression in SPEND_DIMENSIONS[name].items()}
+        results = rollups.order_by().values(*group_by, **names).annotate(
+            amount=Sum('amount'), qty=Sum('qty'), lines=Sum('lines'), documents=Sum('documents')) \
+            .order_by(*group_by)
+        return Response({'source': source, 'group_by': group_by, 'results': list(results)})
+
+    @staticmethod
+    def get_filters(params):
+        filters, errors = {}, {}
+        for param, lookup in (('month_from', 'month__gte'), ('month_to', 'month__lte')):
+            if param in params:
+                try:
+                    filters[lookup] = datetime.strptime(params[param], '%Y-%m').date()
+                except ValueError:
+                    errors[param] = ['Expected a month as YYYY-MM.']
+        if 'status' in params:
+            filters['status'] = params['status']
+        for param in ('vendor', 'category', 'department'):
+            if param in params:
+                try:
+                    filters[f'{param}_id'] = int(params[param])
+                except ValueError:
+                    errors[param] = ['Expected an id.']
+        if errors:
+            raise ValidationError(errors)
+        return filters
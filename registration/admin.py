@@ -1,3 +1,30 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import PooledSchema, TenantMigrationCheckpoint, TenantMigrationRun, TenantProvisioning
+
+
+@admin.register(TenantProvisioning)
+class TenantProvisioningAdmin(admin.ModelAdmin):
+    list_display = ('tenant', 'status', 'method', 'attempts', 'duration', 'created_on', 'finished_on')
+    list_filter = ('status', 'method')
+    search_fields = ('tenant__schema_name', 'admin_email')
+    exclude = ('admin_password',)
+
+
+@admin.register(PooledSchema)
+class PooledSchemaAdmin(admin.ModelAdmin):
+    list_display = ('schema_name', 'migration_state', 'created_on')
+
+
+class TenantMigrationCheckpointInline(admin.TabularInline):
+    model = TenantMigrationCheckpoint
+    extra = 0
+    readonly_fields = ('schema_name', 'status', 'migrations_applied', 'duration', 'started_on', 'finished_on',
+                       'last_error')
+
+
+@admin.register(TenantMigrationRun)
+class TenantMigrationRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'target', 'status', 'workers', 'started_on', 'finished_on')
+    list_filter = ('status',)
+    inlines = [TenantMigrationCheckpointInline]
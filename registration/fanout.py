@@ -0,0 +1,150 @@
+import logging
+import queue
+import threading
+import time
+from numbers import Number
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django_tenants.utils import schema_context
+
+from .tenant_migrations import get_tenant_schemas
+
+logger = logging.getLogger(__name__)
+
+# Fan-out defaults, each can be overridden with a TENANT_FANOUT_<NAME> setting
+FANOUT_DEFAULTS = {
+    # Worker threads, each holding its own database connection
+    'WORKERS': 8,
+    # Seconds before the results gathered so far are returned
+    'TIMEOUT': 30,
+    # Milliseconds a single schema's queries may run
+    'STATEMENT_TIMEOUT': 10 * 1000,
+    # Seconds merged results are cached for when a cache key is given
+    'CACHE_TIMEOUT': 5 * 60,
+}
+
+
+def get_fanout_setting(name):
+    return getattr(settings, f'TENANT_FANOUT_{name}', FANOUT_DEFAULTS[name])
+
+
+def collect(results):
+    """
+    Returns the results keyed by schema name, as they are.
+    """
+    return results
+
+
+def total(results):
+    """
+    Adds up the results: numbers are summed and dicts are summed per key.
+    """
+    merged = None
+    for value in results.values():
+        if isinstance(value, Number):
+            merged = (merged or 0) + value
+        elif isinstance(value, dict):
+            merged = merged or {}
+            for key, item in value.items():
+                merged[key] = merged.get(key, 0) + item
+    return merged
+
+
+def sql_query(sql, params=None):
+    """
+    Returns a per-schema callable running `sql` and returning its rows as dicts.
+    """
+    def query(schema_name):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    return query
+
+
+def run_in_schema(func, schema_name, statement_timeout):
+    # Read only, so a report can never write to a tenant
+    with schema_context(schema_name), transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION READ ONLY')
+            cursor.execute("SELECT set_config('statement_timeout', %s, true)", [str(statement_timeout)])
+        return func(schema_name)
+
+
+def fan_out(func, params=None, schemas=None, reducer=collect, workers=None, timeout=None, statement_timeout=None,
+            cache_key=None, cache_timeout=None):
+    """
+    Runs `func(schema_name)`, or the SQL string `func` with `params`, in every tenant schema (or in
+    `schemas`) from a pool of worker threads with a connection each, in a read-only transaction
+    bounded by `statement_timeout` milliseconds. After `timeout` seconds the results gathered so far
+    are returned. Returns a dict with:
+
+    - `value`: the per-schema results merged by `reducer`, which gets them keyed by schema name;
+    - `errors`: the error of each schema that failed;
+    - `timed_out`: the schemas without a result when the timeout was reached;
+    - `complete`: whether every schema returned a result;
+    - `elapsed`: the seconds taken, and `cached` when served from the cache.
+
+    With `cache_key`, complete merged results are cached for `cache_timeout` seconds.
+    """
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return {**cached, 'cached': True}
+
+    if isinstance(func, str):
+        func = sql_query(func, params)
+    schemas = list(get_tenant_schemas(include_template=False) if schemas is None else schemas)
+    workers = max(min(workers or get_fanout_setting('WORKERS'), len(schemas)), 1)
+    timeout = get_fanout_setting('TIMEOUT') if timeout is None else timeout
+    statement_timeout = statement_timeout or get_fanout_setting('STATEMENT_TIMEOUT')
+
+    start = time.monotonic()
+    deadline = start + timeout
+    todo = queue.SimpleQueue()
+    for schema_name in schemas:
+        todo.put(schema_name)
+    results, errors, lock = {}, {}, threading.Lock()
+
+    def work():
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    schema_name = todo.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    value = run_in_schema(func, schema_name, statement_timeout)
+                except Exception as e:
+                    logger.warning("Fan-out query failed in schema %s: %s", schema_name, e)
+                    with lock:
+                        errors[schema_name] = str(e) or e.__class__.__name__
+                else:
+                    with lock:
+                        results[schema_name] = value
+        finally:
+            connections.close_all()
+
+    # Daemon threads, so a query still running at the deadline does not hold up the caller
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(max(deadline - time.monotonic(), 0))
+
+    with lock:
+        results, errors = dict(results), dict(errors)
+    timed_out = [schema_name for schema_name in schemas if schema_name not in results and schema_name not in errors]
+    merged = {
+        'value': reducer(results),
+        'errors': errors,
+        'timed_out': timed_out,
+        'complete': not errors and not timed_out,
+        'elapsed': round(time.monotonic() - start, 3),
+        'cached': False,
+    }
+    if cache_key is not None and merged['complete']:
+        cache.set(cache_key, merged, cache_timeout or get_fanout_setting('CACHE_TIMEOUT'))
+    return merged
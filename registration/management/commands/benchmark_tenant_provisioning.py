@@ -0,0 +1,65 @@
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django_tenants.utils import schema_exists
+
+from registration.provisioning import clone_schema, create_schema, drop_schema, migrate_schema
+
+
+class Command(BaseCommand):
+    help = "Compares creating a tenant schema by running the migrations with cloning an already migrated " \
+           "schema, as the tenant apps are added one at a time. Works on throwaway schemas that are " \
+           "dropped afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='benchmark_provisioning',
+                            help="Prefix of the throwaway schema names.")
+        parser.add_argument('--repeat', type=int, default=3, help="Clones per step, the best time is reported.")
+
+    def handle(self, *args, **options):
+        migrated, cloned = f"{options['prefix']}_migrated", f"{options['prefix']}_cloned"
+        for schema_name in (migrated, cloned):
+            if schema_exists(schema_name):
+                raise CommandError(f'Schema "{schema_name}" already exists, pass another --prefix.')
+
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        app_labels = [config.label for config in apps.get_app_configs()
+                      if config.name in settings.TENANT_APPS and config.label in loader.migrated_apps]
+
+        self.stdout.write(f"{'app':<20}{'apps':>6}{'migrations':>12}{'tables':>8}{'migrate':>12}{'clone':>12}")
+        migrate_time = 0
+        try:
+            create_schema(migrated)
+            # Each app is migrated on top of the previous ones, so the migrate time is cumulative
+            for count, app_label in enumerate(app_labels, 1):
+                start = time.perf_counter()
+                migrate_schema(migrated, app_label)
+                migrate_time += time.perf_counter() - start
+
+                clone_time = None
+                for _ in range(max(options['repeat'], 1)):
+                    start = time.perf_counter()
+                    clone_schema(migrated, cloned)
+                    elapsed = time.perf_counter() - start
+                    clone_time = elapsed if clone_time is None else min(clone_time, elapsed)
+                    drop_schema(cloned)
+
+                migrations, tables = self.count_objects(migrated)
+                self.stdout.write(f"{app_label:<20}{count:>6}{migrations:>12}{tables:>8}"
+                                  f"{migrate_time:>11.2f}s{clone_time:>11.2f}s")
+        finally:
+            drop_schema(cloned)
+            drop_schema(migrated)
+
+    @staticmethod
+    def count_objects(schema_name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{schema_name}".django_migrations')
+            migrations = cursor.fetchone()[0]
+            cursor.execute("SELECT count(*) FROM information_schema.tables WHERE table_schema = %s", [schema_name])
+            tables = cursor.fetchone()[0]
+        return migrations, tables
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from registration.provisioning import fill_schema_pool, get_migration_state, get_pool_stats, \
+    get_provisioning_setting, prepare_template_schema, read_migration_state
+from registration.tenant_migrations import get_pending_migrations
+
+
+class Command(BaseCommand):
+    help = "Keeps the warm pool filled with migrated schemas cloned from the template schema, which " \
+           "registrations rename for the new tenant. Schemas migrated by another release are replaced. " \
+           "Stops when a deploy changes the migrations, so it is restarted with the new code. " \
+           "Run a single instance."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=get_provisioning_setting('POOL_SIZE'),
+                            help="Schemas to keep ready.")
+        parser.add_argument('--once', action='store_true', help="Fill the pool once and exit.")
+        parser.add_argument('--poll-interval', type=float, default=1,
+                            help="Seconds between checks of the pool depth.")
+
+    def handle(self, *args, **options):
+        if options['size'] <= 0:
+            raise CommandError("The pool is disabled, set TENANT_PROVISIONING_POOL_SIZE or pass --size.")
+        template = None
+        try:
+            while True:
+                # Schemas are labelled with this process's migration state, which a deploy makes stale
+                if read_migration_state() != get_migration_state():
+                    self.stdout.write("The migrations on disk changed, stopping so the new release fills the pool")
+                    break
+                if template is None or get_pending_migrations(template):
+                    template = prepare_template_schema()
+                    if template is None:
+                        raise CommandError("The pool is cloned from TENANT_PROVISIONING_TEMPLATE_SCHEMA, "
+                                           "which is not set.")
+
+                added, dropped = fill_schema_pool(options['size'], template)
+                if added or dropped or options['once']:
+                    stats = get_pool_stats()
+                    latency = f"{stats['lease_p50'] * 1000:.0f}/{stats['lease_p95'] * 1000:.0f} ms" \
+                        if stats['leases'] else '-'
+                    self.stdout.write(f"Added {added} schemas, dropped {dropped} stale. Depth {stats['depth']}, "
+                                      f"lease p50/p95 {latency} over the last {stats['leases']} leases")
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping schema pool worker")
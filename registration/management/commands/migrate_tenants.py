@@ -0,0 +1,111 @@
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from registration.tenant_migrations import FINISHED_STATUSES, finish_run, get_run, get_tenant_schemas, \
+    migrate_tenant, record_result
+
+
+class Command(BaseCommand):
+    help = "Migrates the shared apps, then the tenant schemas in parallel worker processes. Progress is " \
+           "checkpointed per schema, so running the command again after a crash resumes the unfinished " \
+           "run; schemas already at the target are skipped. Reports the time per schema and schemas " \
+           "taking much longer than the others."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Schemas migrated concurrently, one process each. The CPU count by default.")
+        parser.add_argument('--schema', action='append', dest='schemas', help="Only migrate these schemas.")
+        parser.add_argument('--skip-shared', action='store_true', help="Do not migrate the public schema first.")
+        parser.add_argument('--restart', action='store_true',
+                            help="Start a new run instead of resuming the unfinished one.")
+        parser.add_argument('--straggler-factor', type=float, default=5,
+                            help="Schemas running this many times the median migration time are reported.")
+        parser.add_argument('--straggler-seconds', type=float, default=60,
+                            help="Schemas are only reported as stragglers after this many seconds.")
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        workers = max(options['workers'], 1)
+        start = time.monotonic()
+        if not options['skip_shared']:
+            call_command('migrate_schemas', shared=True, interactive=False, verbosity=verbosity)
+
+        schema_names = get_tenant_schemas()
+        if options['schemas']:
+            schema_names = [schema_name for schema_name in schema_names if schema_name in options['schemas']]
+        run = get_run(schema_names, workers, restart=options['restart'])
+        todo = list(run.checkpoints.filter(schema_name__in=schema_names).exclude(status__in=FINISHED_STATUSES)
+                    .values_list('schema_name', flat=True))
+        self.stdout.write(f"Run {run.pk}: {len(todo)} of {len(schema_names)} schemas to migrate "
+                          f"with {workers} workers")
+
+        results = self.migrate(run, todo, workers, options)
+        run = finish_run(run)
+
+        durations = sorted(((seconds, schema_name) for schema_name, status, applied, seconds, error in results
+                            if status == 'migrated'), reverse=True)
+        counts = {status: sum(1 for result in results if result[1] == status)
+                  for status in ('migrated', 'skipped', 'failed')}
+        self.stdout.write(f"Run {run.pk} {run.status} in {time.monotonic() - start:.1f}s: {counts['migrated']} "
+                          f"migrated, {counts['skipped']} already at target, {counts['failed']} failed")
+        if durations:
+            self.stdout.write(f"Median {statistics.median(seconds for seconds, _ in durations):.2f}s, slowest: "
+                              + ', '.join(f"{schema_name} {seconds:.2f}s" for seconds, schema_name in durations[:5]))
+        if counts['failed']:
+            raise CommandError(f"{counts['failed']} schemas failed to migrate, run the command again to retry them.")
+
+    def migrate(self, run, schema_names, workers, options):
+        """
+        Keeps up to `workers` schemas migrating and records each result as it arrives. Checkpoints are
+        written from this process, the workers only migrate.
+        """
+        results = []
+        if not schema_names:
+            return results
+        pending = iter(schema_names)
+        in_flight, durations, reported = {}, [], set()
+        # Spawned rather than forked, so workers never share this process's database connection
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=django.setup) as pool:
+            while True:
+                while len(in_flight) < workers and (schema_name := next(pending, None)) is not None:
+                    run.checkpoints.filter(schema_name=schema_name).update(status='running',
+                                                                           started_on=timezone.now())
+                    in_flight[pool.submit(migrate_tenant, schema_name)] = (schema_name, time.monotonic())
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, timeout=5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.pop(future)
+                    result = future.result()
+                    record_result(run, *result)
+                    results.append(result)
+                    self.write_result(*result, verbosity=options['verbosity'])
+                    if result[1] == 'migrated':
+                        durations.append(result[3])
+
+                now = time.monotonic()
+                threshold = max(options['straggler_seconds'],
+                                options['straggler_factor'] * statistics.median(durations) if durations else 0)
+                for schema_name, started in in_flight.values():
+                    if schema_name not in reported and now - started > threshold:
+                        reported.add(schema_name)
+                        self.stderr.write(f"[{schema_name}] Straggler, migrating for {now - started:.0f}s")
+        return results
+
+    def write_result(self, schema_name, status, migrations_applied, seconds, error, verbosity=1):
+        if status == 'failed':
+            self.stderr.write(f"[{schema_name}] Failed after {seconds:.2f}s: {error}")
+        elif status == 'migrated' and verbosity >= 1:
+            self.stdout.write(f"[{schema_name}] Applied {migrations_applied} migrations in {seconds:.2f}s")
+        elif verbosity >= 2:
+            self.stdout.write(f"[{schema_name}] Already at target ({seconds:.2f}s)")
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from registration.provisioning import claim_pending, prepare_template_schema, provision
+
+
+class Command(BaseCommand):
+    help = "Sets up the schema, administrator and domain of registered tenants. Schemas are cloned from " \
+           "the TENANT_PROVISIONING_TEMPLATE_SCHEMA schema, which is migrated before each batch, or migrated " \
+           "one by one when it is not set. Run several workers to provision tenants concurrently."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Provision the pending tenants once and exit.")
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help="Tenants claimed at a time, the template is brought up to date once per batch.")
+        parser.add_argument('--poll-interval', type=float, default=2,
+                            help="Seconds to wait when no tenant is pending.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                batch = claim_pending(max(options['batch_size'], 1))
+                if not batch:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                try:
+                    template = prepare_template_schema()
+                except Exception as e:
+                    self.stderr.write(f"Could not prepare the template schema, migrating instead: {e}")
+                    template = None
+                for provisioning in batch:
+                    provision(provisioning, template)
+                    if provisioning.status == 'ready':
+                        self.stdout.write(f"[{provisioning.tenant.schema_name}] Ready, {provisioning.method}d in "
+                                          f"{provisioning.duration.total_seconds():.1f}s")
+                    else:
+                        self.stdout.write(f"[{provisioning.tenant.schema_name}] Attempt {provisioning.attempts} "
+                                          f"failed ({provisioning.status}): {provisioning.last_error}")
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping tenant provisioning worker")
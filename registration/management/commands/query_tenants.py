@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from registration.fanout import fan_out, get_fanout_setting
+
+
+class Command(BaseCommand):
+    help = "Runs a read-only SQL query in every tenant schema in parallel and prints the rows per schema " \
+           "as JSON Lines, followed by the schemas that failed or timed out."
+
+    def add_arguments(self, parser):
+        parser.add_argument('sql', help="Query to run, unqualified table names resolve in each tenant schema.")
+        parser.add_argument('--schema', action='append', dest='schemas', help="Only query these schemas.")
+        parser.add_argument('--workers', type=int, default=get_fanout_setting('WORKERS'),
+                            help="Schemas queried concurrently, one connection each.")
+        parser.add_argument('--timeout', type=float, default=get_fanout_setting('TIMEOUT'),
+                            help="Seconds before the results gathered so far are printed.")
+
+    def handle(self, *args, **options):
+        result = fan_out(options['sql'], schemas=options['schemas'], workers=options['workers'],
+                         timeout=options['timeout'])
+        for schema_name, rows in sorted(result['value'].items()):
+            for row in rows:
+                self.stdout.write(json.dumps({'schema_name': schema_name, **row}, default=str))
+        for schema_name, error in sorted(result['errors'].items()):
+            self.stderr.write(f"[{schema_name}] Failed: {error}")
+        for schema_name in result['timed_out']:
+            self.stderr.write(f"[{schema_name}] Timed out")
+        self.stderr.write(f"{len(result['value'])} schemas answered in {result['elapsed']:.2f}s")
@@ -0,0 +1,115 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django_tenants.middleware.main import TenantMainMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Stored for hostnames without a tenant
+MISSING = object()
+
+
+def get_resolution_setting(name, default):
+    return getattr(settings, f'TENANT_RESOLUTION_CACHE_{name}', default)
+
+
+class TenantCache:
+    """
+    A bounded, per-process LRU map of hostname -> tenant whose entries expire after `ttl` seconds, or
+    `negative_ttl` for hostnames without a tenant. Counts hits and misses for `stats()`.
+    """
+
+    def __init__(self, max_size=None, ttl=None, negative_ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.negative_hits = self.misses = 0
+
+    def get_limits(self):
+        return (self.max_size if self.max_size is not None else get_resolution_setting('SIZE', 1024),
+                self.ttl if self.ttl is not None else get_resolution_setting('TTL', 60),
+                self.negative_ttl if self.negative_ttl is not None else get_resolution_setting('NEGATIVE_TTL', 10))
+
+    def get(self, hostname):
+        """
+        Returns the cached tenant, `MISSING` for a cached miss, or None when the hostname is not cached.
+        """
+        with self.lock:
+            entry = self.entries.get(hostname)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self.entries[hostname]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(hostname)
+            if entry[1] is MISSING:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[1]
+
+    def set(self, hostname, tenant):
+        max_size, ttl, negative_ttl = self.get_limits()
+        if max_size <= 0:
+            return
+        with self.lock:
+            self.entries[hostname] = (time.monotonic() + (negative_ttl if tenant is MISSING else ttl), tenant)
+            self.entries.move_to_end(hostname)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {'hits': self.hits, 'negative_hits': self.negative_hits, 'misses': self.misses,
+                    'size': len(self.entries),
+                    'hit_rate': (self.hits + self.negative_hits) / lookups if lookups else 0.0}
+
+
+tenant_cache = TenantCache()
+
+
+class CachedTenantMainMiddleware(TenantMainMiddleware):
+    """
+    `TenantMainMiddleware` that resolves hostnames through `tenant_cache` instead of querying the
+    domain and tenant tables on every request. Unknown hostnames are cached too, for a shorter time.
+
+    Saving or deleting a `Tenant` or `Domain` clears the cache of the process that made the change
+    (see `registration.signals`); other processes pick the change up when their entries expire after
+    `TENANT_RESOLUTION_CACHE_TTL` seconds. Every `TENANT_RESOLUTION_CACHE_LOG_INTERVAL` lookups, the
+    process logs its hit rate.
+    """
+    cache = tenant_cache
+
+    def get_tenant(self, domain_model, hostname):
+        tenant = self.cache.get(hostname)
+        if tenant is None:
+            try:
+                tenant = super().get_tenant(domain_model, hostname)
+            except domain_model.DoesNotExist:
+                tenant = MISSING
+            self.cache.set(hostname, tenant)
+        self.log_stats()
+        if tenant is MISSING:
+            raise domain_model.DoesNotExist(f'No domain for hostname "{hostname}"')
+        # The request sets attributes such as `domain_url` on its tenant
+        return copy.copy(tenant)
+
+    def log_stats(self):
+        interval = get_resolution_setting('LOG_INTERVAL', 0)
+        if not interval:
+            return
+        stats = self.cache.stats()
+        if (stats['hits'] + stats['negative_hits'] + stats['misses']) % interval == 0:
+            logger.info("Tenant resolution cache: %s hits, %s negative hits, %s misses, %s entries, hit rate %.1f%%",
+                        stats['hits'], stats['negative_hits'], stats['misses'], stats['size'], stats['hit_rate'] * 100)
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:05
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0002_remove_tenant_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantProvisioning',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('method', models.CharField(blank=True, choices=[('clone', 'Cloned from the template schema'), ('migrate', 'Migrated')], max_length=20)),
+                ('admin_username', models.CharField(max_length=150)),
+                ('admin_email', models.EmailField(max_length=254)),
+                ('admin_password', models.CharField(blank=True, max_length=128)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('claimed_on', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('duration', models.DurationField(blank=True, null=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('finished_on', models.DateTimeField(blank=True, null=True)),
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='provisioning', to='registration.tenant')),
+            ],
+            options={
+                'ordering': ['created_on'],
+                'indexes': [models.Index(fields=['status', 'created_on'], name='provisioning_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0003_tenantprovisioning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PooledSchema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema_name', models.CharField(max_length=63, unique=True)),
+                ('migration_state', models.CharField(db_index=True, max_length=40)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['created_on'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='tenantprovisioning',
+            name='method',
+            field=models.CharField(blank=True, choices=[('clone', 'Cloned from the template schema'), ('migrate', 'Migrated'), ('pool', 'Leased from the schema pool')], max_length=20),
+        ),
+    ]
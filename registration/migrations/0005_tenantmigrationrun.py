@@ -0,0 +1,46 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registration', '0004_pooledschema'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantMigrationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(db_index=True, max_length=40)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('workers', models.PositiveSmallIntegerField(default=1)),
+                ('started_on', models.DateTimeField(auto_now_add=True)),
+                ('finished_on', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-started_on'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TenantMigrationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema_name', models.CharField(max_length=63)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('migrated', 'Migrated'), ('skipped', 'Already at target'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('migrations_applied', models.PositiveIntegerField(default=0)),
+                ('duration', models.DurationField(blank=True, null=True)),
+                ('started_on', models.DateTimeField(blank=True, null=True)),
+                ('finished_on', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='registration.tenantmigrationrun')),
+            ],
+            options={
+                'ordering': ['pk'],
+                'constraints': [models.UniqueConstraint(fields=('run', 'schema_name'), name='unique_run_schema')],
+            },
+        ),
+    ]
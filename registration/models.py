@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django_tenants.models import TenantMixin, DomainMixin
 from django.utils.translation import gettext_lazy as _
@@ -25,3 +27,124 @@ class Tenant(TenantMixin):
 
 class Domain(DomainMixin):
     pass
+
+
+PROVISIONING_STATUS = (
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('ready', 'Ready'),
+    ('failed', 'Failed'),
+)
+
+PROVISIONING_METHOD = (
+    ('clone', 'Cloned from the template schema'),
+    ('migrate', 'Migrated'),
+    ('pool', 'Leased from the schema pool'),
+)
+
+
+class TenantProvisioning(models.Model):
+    """
+    The background setup of a tenant registered through the API: its schema, administrator and
+    domain. Registration only stores the tenant and this row, the `process_tenant_provisioning`
+    worker does the rest and clients poll the status with the id.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.OneToOneField(Tenant, on_delete=models.CASCADE, related_name='provisioning')
+    status = models.CharField(max_length=20, choices=PROVISIONING_STATUS, default='pending')
+    method = models.CharField(max_length=20, choices=PROVISIONING_METHOD, blank=True)
+    # The administrator created in the new schema; the password is hashed and cleared once ready
+    admin_username = models.CharField(max_length=150)
+    admin_email = models.EmailField()
+    admin_password = models.CharField(max_length=128, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_on = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    duration = models.DurationField(null=True, blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ['created_on']
+        indexes = [models.Index(fields=['status', 'created_on'], name='provisioning_due_idx')]
+
+    def __str__(self):
+        return f"{self.tenant.schema_name} ({self.status})"
+
+
+class PooledSchema(models.Model):
+    """
+    An empty, migrated schema kept ready by `fill_schema_pool` and renamed to the schema of a tenant
+    when one registers. `migration_state` identifies the release that migrated it.
+    """
+    schema_name = models.CharField(max_length=63, unique=True)
+    migration_state = models.CharField(max_length=40, db_index=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ['created_on']
+
+    def __str__(self):
+        return self.schema_name
+
+
+MIGRATION_RUN_STATUS = (
+    ('running', 'Running'),
+    ('completed', 'Completed'),
+    ('failed', 'Failed'),
+)
+
+TENANT_MIGRATION_STATUS = (
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('migrated', 'Migrated'),
+    ('skipped', 'Already at target'),
+    ('failed', 'Failed'),
+)
+
+
+class TenantMigrationRun(models.Model):
+    """
+    A `migrate_tenants` run bringing the tenant schemas to the migrations of one release, identified
+    by `target`. An unfinished run towards the same target is resumed from its checkpoints.
+    """
+    target = models.CharField(max_length=40, db_index=True)
+    status = models.CharField(max_length=20, choices=MIGRATION_RUN_STATUS, default='running')
+    workers = models.PositiveSmallIntegerField(default=1)
+    started_on = models.DateTimeField(auto_now_add=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ['-started_on']
+
+    def __str__(self):
+        return f"{self.target[:12]} ({self.status})"
+
+
+class TenantMigrationCheckpoint(models.Model):
+    """
+    The progress of one schema in a `TenantMigrationRun`.
+    """
+    run = models.ForeignKey(TenantMigrationRun, on_delete=models.CASCADE, related_name='checkpoints')
+    schema_name = models.CharField(max_length=63)
+    status = models.CharField(max_length=20, choices=TENANT_MIGRATION_STATUS, default='pending')
+    migrations_applied = models.PositiveIntegerField(default=0)
+    duration = models.DurationField(null=True, blank=True)
+    started_on = models.DateTimeField(null=True, blank=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    objects = models.Manager()
+
+    class Meta:
+        ordering = ['pk']
+        constraints = [models.UniqueConstraint(fields=['run', 'schema_name'], name='unique_run_schema')]
+
+    def __str__(self):
+        return f"{self.schema_name} ({self.status})"
@@ -0,0 +1,264 @@
+import hashlib
+import logging
+import time
+import uuid
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.text import slugify
+from django_tenants.clone import CloneSchema
+from django_tenants.utils import schema_exists, tenant_context
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Domain, PooledSchema, TenantProvisioning
+from .utils import Util
+
+logger = logging.getLogger(__name__)
+
+# Worker defaults, each can be overridden with a TENANT_PROVISIONING_<NAME> setting
+PROVISIONING_DEFAULTS = {
+    # Migrated schema new tenants are cloned from, an empty name migrates every tenant instead
+    'TEMPLATE_SCHEMA': 'tenant_template',
+    'MAX_ATTEMPTS': 3,
+    # Seconds after which a tenant claimed by a worker that died is handed out again
+    'CLAIM_TIMEOUT': 30 * 60,
+    # Migrated schemas kept ready by `fill_schema_pool` for registrations to lease, 0 disables the pool
+    'POOL_SIZE': 0,
+}
+
+
+def get_provisioning_setting(name):
+    return getattr(settings, f'TENANT_PROVISIONING_{name}', PROVISIONING_DEFAULTS[name])
+
+
+def migrate_schema(schema_name, *args, verbosity=0):
+    call_command('migrate_schemas', *args, schema_name=schema_name, interactive=False, verbosity=verbosity)
+
+
+def create_schema(schema_name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}"')
+
+
+def drop_schema(schema_name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP SCHEMA IF EXISTS "{schema_name}" CASCADE')
+
+
+def clone_schema(base_schema_name, schema_name):
+    """
+    Copies the tables, sequences, functions and rows of a schema into a new one with plain DDL, which
+    takes a fraction of the time replaying the migrations does.
+    """
+    CloneSchema().clone_schema(base_schema_name, schema_name)
+
+
+def prepare_template_schema(verbosity=0):
+    """
+    Creates the template schema when it is missing and applies the pending tenant migrations to it,
+    so clones are up to date after a deploy. Workers hold an advisory lock while doing so. Returns
+    the schema name, or None when cloning is disabled.
+    """
+    template = get_provisioning_setting('TEMPLATE_SCHEMA')
+    if not template:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(hashtext(%s))', [f'tenant-template:{template}'])
+    try:
+        create_schema(template)
+        migrate_schema(template, verbosity=verbosity)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(hashtext(%s))', [f'tenant-template:{template}'])
+    return template
+
+
+def get_tenant_domain(tenant):
+    return f"{slugify(tenant.schema_name, allow_unicode=True)}.{settings.API_BASE_DOMAIN}"
+
+
+def send_verification_email(tenant, domain, user):
+    token = RefreshToken.for_user(user)
+    token['email'] = user.email
+    token['tenant'] = tenant.schema_name
+    verification_url = f'https://{domain.domain}/email-verify?token={str(token.access_token)}'
+
+    email_body = f'Hi {tenant.company_name},\n\nUse the link below to verify your email:\n{verification_url}'
+    Util.send_email({
+        'email_body': email_body,
+        'to_email': user.email,
+        'email_subject': 'Verify Your Email'
+    })
+
+
+def claim_pending(limit=1):
+    """
+    Marks up to `limit` pending tenants as running and returns their provisioning rows. Rows locked
+    by another worker are skipped, so several workers can provision tenants concurrently.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=get_provisioning_setting('CLAIM_TIMEOUT'))
+    with transaction.atomic():
+        ids = list(TenantProvisioning.objects.select_for_update(skip_locked=True)
+                   .filter(Q(status='pending') | Q(status='running', claimed_on__lt=stale))
+                   .order_by('created_on').values_list('id', flat=True)[:limit])
+        TenantProvisioning.objects.filter(id__in=ids).update(status='running', claimed_on=now,
+                                                             attempts=F('attempts') + 1)
+    return list(TenantProvisioning.objects.filter(id__in=ids).select_related('tenant').order_by('created_on'))
+
+
+def complete_provisioning(provisioning, method, start):
+    """
+    Creates the administrator and domain of a tenant whose schema exists, queues the verification
+    email and marks the tenant ready.
+    """
+    tenant = provisioning.tenant
+    with transaction.atomic():
+        with tenant_context(tenant):
+            user = User(username=provisioning.admin_username, email=provisioning.admin_email,
+                        password=provisioning.admin_password, is_staff=True, is_superuser=True)
+            user.save()
+        domain = Domain.objects.create(domain=get_tenant_domain(tenant), tenant=tenant, is_primary=True)
+        send_verification_email(tenant, domain, user)
+
+        provisioning.status = 'ready'
+        provisioning.method = method
+        provisioning.admin_password = ''
+        provisioning.last_error = ''
+        provisioning.duration = timedelta(seconds=time.monotonic() - start)
+        provisioning.finished_on = timezone.now()
+        provisioning.save(update_fields=['status', 'method', 'admin_password', 'last_error', 'duration',
+                                         'finished_on'])
+
+
+def provision(provisioning, template=None):
+    """
+    Creates a claimed tenant's schema, cloned from `template` or else migrated, then completes it.
+    A failed attempt drops the schema it created and is retried until the tenant runs out of
+    attempts.
+    """
+    tenant = provisioning.tenant
+    start = time.monotonic()
+    try:
+        # Left over by an attempt whose worker died
+        drop_schema(tenant.schema_name)
+        if template:
+            clone_schema(template, tenant.schema_name)
+        else:
+            create_schema(tenant.schema_name)
+            migrate_schema(tenant.schema_name)
+        complete_provisioning(provisioning, 'clone' if template else 'migrate', start)
+    except Exception as e:
+        logger.exception("Provisioning tenant %s failed", tenant.schema_name)
+        try:
+            if schema_exists(tenant.schema_name):
+                drop_schema(tenant.schema_name)
+        except Exception:
+            logger.exception("Could not drop the schema of tenant %s", tenant.schema_name)
+        provisioning.status = 'failed' if provisioning.attempts >= get_provisioning_setting('MAX_ATTEMPTS') \
+            else 'pending'
+        provisioning.last_error = str(e) or e.__class__.__name__
+        provisioning.save(update_fields=['status', 'last_error'])
+    return provisioning
+
+
+@lru_cache(maxsize=None)
+def get_migration_loader():
+    """
+    The migrations of the running code, read from disk once per process.
+    """
+    return MigrationLoader(None, ignore_no_migrations=True)
+
+
+def hash_migration_graph(loader):
+    return hashlib.sha1(repr(sorted(loader.graph.leaf_nodes())).encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_migration_state():
+    """
+    Identifies the migrations of the running code, so pooled schemas migrated by an older release
+    are never leased.
+    """
+    return hash_migration_graph(get_migration_loader())
+
+
+def read_migration_state():
+    """
+    Identifies the migrations on disk now, which differ from `get_migration_state` once a deploy
+    replaced the code under a long-running process.
+    """
+    return hash_migration_graph(MigrationLoader(None, ignore_no_migrations=True))
+
+
+def lease_pooled_schema(provisioning):
+    """
+    Binds a schema of the warm pool to a newly registered tenant by renaming it, then completes the
+    tenant. Meant to run in the registration's transaction; returns False, leaving the tenant to the
+    provisioning worker, when the pool has no up-to-date schema.
+    """
+    tenant = provisioning.tenant
+    start = time.monotonic()
+    try:
+        with transaction.atomic():
+            pooled = PooledSchema.objects.select_for_update(skip_locked=True) \
+                .filter(migration_state=get_migration_state()).order_by('created_on').first()
+            if pooled is None or schema_exists(tenant.schema_name):
+                return False
+            with connection.cursor() as cursor:
+                cursor.execute(f'ALTER SCHEMA "{pooled.schema_name}" RENAME TO "{tenant.schema_name}"')
+            pooled.delete()
+            complete_provisioning(provisioning, 'pool', start)
+    except DatabaseError:
+        logger.exception("Leasing a pooled schema for tenant %s failed", tenant.schema_name)
+        provisioning.refresh_from_db()
+        return False
+    logger.info("Leased a pooled schema for tenant %s in %.0f ms", tenant.schema_name,
+                provisioning.duration.total_seconds() * 1000)
+    return True
+
+
+def fill_schema_pool(size, template):
+    """
+    Drops the pooled schemas migrated by another release, then clones `template` until the pool
+    holds `size` schemas. Returns the number of schemas added and dropped.
+    """
+    state = get_migration_state()
+    dropped = 0
+    for pooled in PooledSchema.objects.exclude(migration_state=state):
+        with transaction.atomic():
+            # Skips a schema being leased right now
+            if PooledSchema.objects.select_for_update(skip_locked=True).filter(pk=pooled.pk).delete()[0]:
+                drop_schema(pooled.schema_name)
+                dropped += 1
+
+    added = 0
+    for _ in range(max(size - PooledSchema.objects.count(), 0)):
+        schema_name = f'pool_{uuid.uuid4().hex[:20]}'
+        clone_schema(template, schema_name)
+        PooledSchema.objects.create(schema_name=schema_name, migration_state=state)
+        added += 1
+    return added, dropped
+
+
+def get_pool_stats(leases=1000):
+    """
+    Returns the pool depth and the median and 95th percentile time, in seconds, of the last `leases`
+    registrations served from the pool.
+    """
+    durations = sorted(duration.total_seconds() for duration in TenantProvisioning.objects
+                       .filter(method='pool').order_by('-finished_on').values_list('duration', flat=True)[:leases])
+
+    def percentile(fraction):
+        return durations[min(int(len(durations) * fraction), len(durations) - 1)] if durations else None
+
+    return {'depth': PooledSchema.objects.filter(migration_state=get_migration_state()).count(),
+            'stale': PooledSchema.objects.exclude(migration_state=get_migration_state()).count(),
+            'leases': len(durations), 'lease_p50': percentile(0.5), 'lease_p95': percentile(0.95)}
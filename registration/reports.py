@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from purchase.models import PurchaseOrder
+from .fanout import fan_out, total
+from .models import Tenant
+
+# Days a user must have logged in within to count as active, and purchase orders as recent
+USAGE_PERIOD_DAYS = 30
+# Statuses of the purchase orders that were issued to a vendor
+ISSUED_ORDER_STATUSES = ('awaiting', 'completed')
+
+
+def count_usage(schema_name):
+    """
+    Counts the users and issued purchase orders of the current tenant schema.
+    """
+    since = timezone.now() - timedelta(days=USAGE_PERIOD_DAYS)
+    users = User.objects.filter(is_active=True)
+    orders = PurchaseOrder.objects.filter(is_hidden=False, status__in=ISSUED_ORDER_STATUSES)
+    return {
+        'users': users.count(),
+        'active_users': users.filter(last_login__gte=since).count(),
+        'purchase_orders': orders.count(),
+        'recent_purchase_orders': orders.filter(date_created__gte=since).count(),
+    }
+
+
+def get_usage(refresh=False):
+    """
+    Returns the `fan_out` of `count_usage` over every tenant, cached while complete.
+    """
+    return fan_out(count_usage, cache_key=None if refresh else 'platform-usage')
+
+
+def get_usage_report(refresh=False):
+    """
+    Usage per tenant and for the whole platform. Tenants whose counts are missing are listed in
+    `errors` and `timed_out`.
+    """
+    usage = get_usage(refresh)
+    tenants = [{'schema_name': tenant.schema_name, 'company_name': tenant.company_name,
+                **usage['value'][tenant.schema_name]}
+               for tenant in Tenant.objects.filter(schema_name__in=usage['value']).order_by('company_name')]
+    return {**usage, 'value': {'tenants': tenants, 'totals': total(usage['value']) or {}}}
+
+
+def get_billing_report(refresh=False):
+    """
+    Billable active users and subscription state per tenant, from the same counts as the usage report.
+    """
+    usage = get_usage(refresh)
+    today = timezone.localdate()
+    tenants = [{'schema_name': tenant.schema_name, 'company_name': tenant.company_name,
+                'paid_until': tenant.paid_until,
+                'is_overdue': tenant.paid_until is not None and tenant.paid_until < today,
+                'billable_users': usage['value'][tenant.schema_name]['active_users']}
+               for tenant in Tenant.objects.filter(schema_name__in=usage['value']).order_by('company_name')]
+    return {**usage, 'value': {'tenants': tenants,
+                               'billable_users': sum(tenant['billable_users'] for tenant in tenants)}}
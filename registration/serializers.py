@@ -1,7 +1,9 @@
 from rest_framework import serializers
-from .models import Tenant
+from .models import Tenant, TenantProvisioning
 from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.password_validation import validate_password
+from django.db.models import Q
 from django.utils.text import slugify
 
 from django_tenants.utils import schema_context
@@ -57,15 +59,17 @@ class TenantRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tenant
         fields = ['company_name', 'user']
+        # Checked by `validate_company_name`, which ignores tenants whose provisioning failed
+        extra_kwargs = {'company_name': {'validators': []}}
 
     def validate_company_name(self, value):
-        if Tenant.objects.filter(company_name__iexact=value).exists():
+        if Tenant.objects.filter(company_name__iexact=value).exclude(provisioning__status='failed').exists():
             raise serializers.ValidationError("A tenant with this company name already exists.")
         return value
 
     def validate_schema_name(self, value):
         schema_name = slugify(value)
-        if Tenant.objects.filter(schema_name__iexact=schema_name).exists():
+        if Tenant.objects.filter(schema_name__iexact=schema_name).exclude(provisioning__status='failed').exists():
             raise serializers.ValidationError("A tenant with this schema name already exists.")
         return schema_name
 
@@ -88,28 +92,35 @@ class TenantRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         user_data = validated_data.pop('user')
-        
-        # Create Tenant first
+
+        # The schema is set up by the provisioning worker, see registration.provisioning
         schema_name = self.validate_schema_name(validated_data['company_name'])
-        tenant = Tenant.objects.create(
-            schema_name=schema_name,
-            company_name=validated_data['company_name']
-        )
+        # A tenant whose provisioning failed has no schema left, it is replaced by the new registration
+        Tenant.objects.filter(Q(company_name__iexact=validated_data['company_name'])
+                              | Q(schema_name__iexact=schema_name), provisioning__status='failed').delete()
+        tenant = Tenant(schema_name=schema_name, company_name=validated_data['company_name'])
+        tenant.auto_create_schema = False
+        tenant.save()
 
         # Generate username based on company name if not provided
-        if 'username' not in user_data:
-            user_data['username'] = generate_default_username(validated_data['company_name'])
+        TenantProvisioning.objects.create(
+            tenant=tenant,
+            admin_username=user_data.get('username') or generate_default_username(validated_data['company_name']),
+            admin_email=user_data['email'],
+            admin_password=make_password(user_data['password1']),
+        )
+        return tenant
 
-        # Create User within Tenant context
-        with tenant_context(tenant):
-            user_serializer = UserSerializer(data=user_data)
-            user_serializer.is_valid(raise_exception=True)
-            user = user_serializer.save()
 
-            # Associate user with tenant
-            tenant.user = user
-            tenant.save()
+class TenantProvisioningSerializer(serializers.ModelSerializer):
+    tenant_url = serializers.SerializerMethodField()
 
-        return tenant
-    
-    
\ No newline at end of file
+    class Meta:
+        model = TenantProvisioning
+        fields = ['id', 'status', 'tenant_url', 'created_on', 'finished_on']
+
+    def get_tenant_url(self, obj):
+        if obj.status != 'ready':
+            return None
+        domain = obj.tenant.get_primary_domain()
+        return f"https://{domain.domain}" if domain else None
@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .middleware import tenant_cache
+from .models import Domain, Tenant
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def clear_tenant_cache(sender, **kwargs):
+    # Again on commit, in case a request cached the previous state in between
+    tenant_cache.clear()
+    transaction.on_commit(tenant_cache.clear)
@@ -0,0 +1,99 @@
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from django_tenants.utils import get_public_schema_name
+
+from .models import Tenant, TenantMigrationCheckpoint, TenantMigrationRun
+from .provisioning import get_migration_loader, get_migration_state, get_provisioning_setting
+
+# Statuses of the schemas a resumed run does not migrate again
+FINISHED_STATUSES = ('migrated', 'skipped')
+
+
+def get_tenant_schemas(include_template=True):
+    """
+    Returns the names of the existing tenant schemas and, unless `include_template` is False, of the
+    provisioning template. Tenants still waiting for provisioning have no schema yet.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT schema_name FROM information_schema.schemata")
+        existing = {row[0] for row in cursor.fetchall()}
+    schema_names = [schema_name for schema_name in Tenant.objects.exclude(schema_name=get_public_schema_name())
+                    .order_by('pk').values_list('schema_name', flat=True) if schema_name in existing]
+    template = get_provisioning_setting('TEMPLATE_SCHEMA')
+    if include_template and template and template in existing:
+        schema_names.append(template)
+    return schema_names
+
+
+def get_pending_migrations(schema_name):
+    """
+    Returns the migrations of the running code a schema has not applied, read from its
+    django_migrations table. Squashed migrations count as applied when all they replace are.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [f'"{schema_name}".django_migrations'])
+        if cursor.fetchone()[0] is None:
+            applied = set()
+        else:
+            cursor.execute(f'SELECT app, name FROM "{schema_name}".django_migrations')
+            applied = set(cursor.fetchall())
+    loader = get_migration_loader()
+    for key, migration in loader.replacements.items():
+        if all(replaced in applied for replaced in migration.replaces):
+            applied.add(key)
+    return set(loader.graph.nodes) - applied
+
+
+def migrate_tenant(schema_name):
+    """
+    Migrates one schema, skipping it when it is already at the target. Runs in a worker process and
+    returns `(schema name, status, migrations applied, seconds, error)` for the parent to record.
+    """
+    start = time.monotonic()
+    try:
+        pending = get_pending_migrations(schema_name)
+        if not pending:
+            return schema_name, 'skipped', 0, time.monotonic() - start, ''
+        call_command('migrate_schemas', schema_name=schema_name, interactive=False, verbosity=0)
+        return schema_name, 'migrated', len(pending), time.monotonic() - start, ''
+    except Exception as e:
+        return schema_name, 'failed', 0, time.monotonic() - start, str(e) or e.__class__.__name__
+
+
+def get_run(schema_names, workers, restart=False):
+    """
+    Returns the unfinished run towards the target of the running code, with checkpoints added for
+    schemas created since it started, or a new run when there is none or `restart` is set.
+    """
+    target = get_migration_state()
+    with transaction.atomic():
+        run = None if restart else TenantMigrationRun.objects.select_for_update() \
+            .filter(target=target).exclude(status='completed').first()
+        if run is None:
+            run = TenantMigrationRun.objects.create(target=target, workers=workers)
+        else:
+            run.status = 'running'
+            run.workers = workers
+            run.save(update_fields=['status', 'workers'])
+        known = set(run.checkpoints.values_list('schema_name', flat=True))
+        TenantMigrationCheckpoint.objects.bulk_create(
+            [TenantMigrationCheckpoint(run=run, schema_name=schema_name)
+             for schema_name in schema_names if schema_name not in known], batch_size=1000)
+    return run
+
+
+def record_result(run, schema_name, status, migrations_applied, seconds, error):
+    TenantMigrationCheckpoint.objects.filter(run=run, schema_name=schema_name).update(
+        status=status, migrations_applied=migrations_applied, duration=timedelta(seconds=seconds),
+        finished_on=timezone.now(), last_error=error)
+
+
+def finish_run(run):
+    run.status = 'failed' if run.checkpoints.filter(status='failed').exists() else 'completed'
+    run.finished_on = timezone.now()
+    run.save(update_fields=['status', 'finished_on'])
+    return run
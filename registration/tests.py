@@ -1,3 +1,389 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django_tenants.utils import schema_exists, tenant_context
+
+from notifications.models import EmailJob
+from .fanout import fan_out, total
+from .middleware import MISSING, TenantCache
+from .models import Domain, PooledSchema, Tenant, TenantMigrationRun, TenantProvisioning
+from .provisioning import claim_pending, create_schema, drop_schema, get_migration_loader, get_migration_state, \
+    get_provisioning_setting, get_tenant_domain, lease_pooled_schema, migrate_schema, provision
+from .tenant_migrations import finish_run, get_pending_migrations, get_run, migrate_tenant, record_result
+
+
+class TenantCacheTestCase(SimpleTestCase):
+    def test_hits_and_misses_are_counted(self):
+        cache = TenantCache(max_size=10, ttl=60, negative_ttl=60)
+        self.assertIsNone(cache.get('acme.example.com'))
+        cache.set('acme.example.com', 'acme')
+        cache.set('nope.example.com', MISSING)
+        self.assertEqual(cache.get('acme.example.com'), 'acme')
+        self.assertIs(cache.get('nope.example.com'), MISSING)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['negative_hits'], stats['misses']), (1, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = TenantCache(max_size=2, ttl=60, negative_ttl=60)
+        cache.set('a', 'a')
+        cache.set('b', 'b')
+        cache.get('a')
+        cache.set('c', 'c')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), ('a', 'c'))
+
+    def test_entries_expire(self):
+        cache = TenantCache(max_size=10, ttl=60, negative_ttl=0)
+        cache.set('nope.example.com', MISSING)
+        self.assertIsNone(cache.get('nope.example.com'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_clear(self):
+        cache = TenantCache(max_size=10, ttl=60, negative_ttl=60)
+        cache.set('acme.example.com', 'acme')
+        cache.clear()
+        self.assertIsNone(cache.get('acme.example.com'))
+
+
+class FanOutReducerTestCase(SimpleTestCase):
+    def test_total_sums_numbers(self):
+        self.assertEqual(total({'acme': 2, 'globex': 3}), 5)
+
+    def test_total_sums_dicts_per_key(self):
+        self.assertEqual(total({'acme': {'users': 2, 'orders': 1}, 'globex': {'users': 3}}),
+                         {'users': 5, 'orders': 1})
+
+    def test_total_of_nothing(self):
+        self.assertIsNone(total({}))
+
+
+class ProvisioningTestMixin:
+    """
+    Creates tenants the way registration does, without a schema. The tests run in the public
+    schema; unless noted, the schemas they create are rolled back with them.
+    """
+
+    def create_provisioning(self, company_name, **kwargs):
+        tenant = Tenant(schema_name=company_name.lower(), company_name=company_name)
+        tenant.auto_create_schema = False
+        tenant.save()
+        return TenantProvisioning.objects.create(
+            tenant=tenant, admin_username=f'admin_{tenant.schema_name}',
+            admin_email=f'admin@{tenant.schema_name}.example.com', admin_password=make_password('S3cure-pass-phrase'),
+            **kwargs)
+
+
+@override_settings(ROOT_URLCONF='core.urls_public', TENANT_PROVISIONING_POOL_SIZE=0)
+class TenantRegistrationTestCase(ProvisioningTestMixin, TestCase):
+    def register(self, company_name='Initech'):
+        return self.client.post(reverse('register'), {'company_name': company_name, 'user': {
+            'email': f'admin@{company_name.lower()}.example.com',
+            'password1': 'S3cure-pass-phrase', 'password2': 'S3cure-pass-phrase'}}, content_type='application/json')
+
+    def test_registration_is_left_to_the_worker(self):
+        response = self.register()
+        self.assertEqual(response.status_code, 202, response.content)
+        provisioning = TenantProvisioning.objects.select_related('tenant').get(tenant__company_name='Initech')
+        self.assertEqual((response.json()['status'], provisioning.status), ('pending', 'pending'))
+        self.assertEqual(response['Location'], response.json()['status_url'])
+        self.assertTrue(response['Location'].endswith(reverse('register-status', args=[provisioning.pk])))
+        self.assertEqual(provisioning.admin_username, 'admin_initech')
+        self.assertTrue(check_password('S3cure-pass-phrase', provisioning.admin_password))
+        self.assertFalse(schema_exists(provisioning.tenant.schema_name))
+
+    def test_a_failed_tenant_can_register_again(self):
+        provisioning = self.create_provisioning('Initech')
+        self.assertEqual(self.register().status_code, 400)
+        TenantProvisioning.objects.filter(pk=provisioning.pk).update(status='failed')
+        self.assertEqual(self.register().status_code, 202)
+        self.assertFalse(TenantProvisioning.objects.filter(pk=provisioning.pk).exists())
+        self.assertEqual(Tenant.objects.get(company_name='Initech').provisioning.status, 'pending')
+
+    def test_status(self):
+        provisioning = self.create_provisioning('Initech')
+        url = reverse('register-status', args=[provisioning.pk])
+        data = self.client.get(url).json()
+        self.assertEqual((data['status'], data['tenant_url']), ('pending', None))
+
+        domain = Domain.objects.create(domain=get_tenant_domain(provisioning.tenant), tenant=provisioning.tenant,
+                                       is_primary=True)
+        TenantProvisioning.objects.filter(pk=provisioning.pk).update(status='ready')
+        data = self.client.get(url).json()
+        self.assertEqual((data['status'], data['tenant_url']), ('ready', f'https://{domain.domain}'))
+
+
+class ProvisioningTestCase(ProvisioningTestMixin, TestCase):
+    def test_claim_pending_hands_out_pending_and_stale_tenants(self):
+        pending = self.create_provisioning('Initech')
+        stale = self.create_provisioning('Globex', status='running', attempts=1, claimed_on=timezone.now() - timedelta(
+            seconds=get_provisioning_setting('CLAIM_TIMEOUT') + 60))
+        self.create_provisioning('Umbrella', status='running', attempts=1, claimed_on=timezone.now())
+        self.create_provisioning('Hooli', status='ready')
+
+        self.assertEqual([provisioning.pk for provisioning in claim_pending()], [pending.pk])
+        claimed = claim_pending(limit=10)
+        self.assertEqual([(provisioning.pk, provisioning.status, provisioning.attempts) for provisioning in claimed],
+                         [(stale.pk, 'running', 2)])
+        self.assertEqual(claim_pending(limit=10), [])
+
+    def test_provision_migrates_the_schema_and_completes_the_tenant(self):
+        self.create_provisioning('Initech')
+        provisioning = provision(claim_pending()[0])
+        tenant = provisioning.tenant
+        provisioning.refresh_from_db()
+        self.assertEqual((provisioning.status, provisioning.method, provisioning.admin_password),
+                         ('ready', 'migrate', ''))
+        self.assertTrue(schema_exists(tenant.schema_name))
+        with tenant_context(tenant):
+            self.assertTrue(User.objects.filter(username='admin_initech', is_superuser=True).exists())
+        self.assertEqual(list(Domain.objects.filter(tenant=tenant, is_primary=True).values_list('domain', flat=True)),
+                         [get_tenant_domain(tenant)])
+        self.assertTrue(EmailJob.objects.filter(description='Verify Your Email').exists())
+
+
+class ProvisioningFailureTestCase(ProvisioningTestMixin, SimpleTestCase):
+    """
+    Dropping a schema whose tables were written in the same transaction is refused, so these
+    tests commit, as the worker does, and remove their tenants again.
+    """
+    databases = {'default'}
+
+    def tearDown(self):
+        Tenant.objects.filter(schema_name__in=['initech', 'globex']).delete()
+        for schema_name in ('initech', 'globex'):
+            drop_schema(schema_name)
+        super().tearDown()
+
+    def test_failed_attempts_drop_the_schema_until_the_tenant_runs_out_of_attempts(self):
+        tenant = self.create_provisioning('Initech').tenant
+        # The domain is taken, so completing the tenant fails after its schema was migrated
+        Domain.objects.create(domain=get_tenant_domain(tenant), tenant=self.create_provisioning('Globex').tenant)
+
+        provisioning = provision(claim_pending()[0])
+        self.assertEqual((provisioning.tenant, provisioning.status), (tenant, 'pending'))
+        self.assertTrue(provisioning.last_error)
+        self.assertFalse(schema_exists(tenant.schema_name))
+
+        TenantProvisioning.objects.filter(tenant=tenant).update(attempts=get_provisioning_setting('MAX_ATTEMPTS') - 1)
+        provisioning = provision(claim_pending()[0])
+        self.assertEqual((provisioning.tenant, provisioning.status), (tenant, 'failed'))
+        self.assertFalse(schema_exists(tenant.schema_name))
+
+
+@override_settings(ROOT_URLCONF='core.urls_public', TENANT_PROVISIONING_POOL_SIZE=1)
+class SchemaPoolTestCase(ProvisioningTestMixin, TestCase):
+    def test_registration_leases_a_pooled_schema(self):
+        create_schema('pool_test')
+        migrate_schema('pool_test')
+        PooledSchema.objects.create(schema_name='pool_test', migration_state=get_migration_state())
+
+        response = self.client.post(reverse('register'), {'company_name': 'Initech', 'user': {
+            'email': 'admin@initech.example.com', 'password1': 'S3cure-pass-phrase',
+            'password2': 'S3cure-pass-phrase'}}, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        provisioning = TenantProvisioning.objects.select_related('tenant').get(tenant__company_name='Initech')
+        self.assertEqual((response.json()['status'], provisioning.status, provisioning.method),
+                         ('ready', 'ready', 'pool'))
+        self.assertEqual(response.json()['tenant_url'], f'https://{get_tenant_domain(provisioning.tenant)}')
+        self.assertEqual((schema_exists('pool_test'), schema_exists('initech')), (False, True))
+        self.assertFalse(PooledSchema.objects.exists())
+        with tenant_context(provisioning.tenant):
+            self.assertTrue(User.objects.filter(username='admin_initech').exists())
+
+    def test_the_pool_worker_stops_when_a_deploy_changes_the_migrations(self):
+        out = StringIO()
+        with mock.patch('registration.management.commands.fill_schema_pool.read_migration_state',
+                        return_value='next-release'):
+            call_command('fill_schema_pool', size=1, stdout=out)
+        self.assertIn('migrations on disk changed', out.getvalue())
+        self.assertFalse(PooledSchema.objects.exists())
+
+    def test_an_empty_or_stale_pool_leaves_the_tenant_to_the_worker(self):
+        provisioning = self.create_provisioning('Initech')
+        self.assertFalse(lease_pooled_schema(provisioning))
+        PooledSchema.objects.create(schema_name='pool_stale', migration_state='previous-release')
+        self.assertFalse(lease_pooled_schema(provisioning))
+        provisioning.refresh_from_db()
+        self.assertEqual(provisioning.status, 'pending')
+        self.assertTrue(PooledSchema.objects.filter(schema_name='pool_stale').exists())
+
+    def test_a_failed_lease_is_rolled_back(self):
+        provisioning = self.create_provisioning('Initech')
+        # The schema of this row is missing, so renaming it fails
+        PooledSchema.objects.create(schema_name='pool_missing', migration_state=get_migration_state())
+        self.assertFalse(lease_pooled_schema(provisioning))
+        self.assertEqual(provisioning.status, 'pending')
+        # The savepoint was rolled back: the registration's transaction is still usable and kept the row
+        self.assertTrue(PooledSchema.objects.filter(schema_name='pool_missing').exists())
+        self.assertFalse(Domain.objects.filter(tenant=provisioning.tenant).exists())
+
+
+class TenantMigrationTestCase(TestCase):
+    def test_an_unfinished_run_is_resumed(self):
+        run = get_run(['initech', 'globex'], workers=2)
+        record_result(run, 'initech', 'migrated', 3, 1.5, '')
+        record_result(run, 'globex', 'failed', 0, 0.5, 'Lock timeout')
+        self.assertEqual(finish_run(run).status, 'failed')
+
+        # A schema created since is added to the run, the checkpoints written so far are kept
+        resumed = get_run(['initech', 'globex', 'hooli'], workers=4)
+        self.assertEqual((resumed.pk, resumed.status, resumed.workers), (run.pk, 'running', 4))
+        self.assertEqual(dict(resumed.checkpoints.values_list('schema_name', 'status')),
+                         {'initech': 'migrated', 'globex': 'failed', 'hooli': 'pending'})
+        record_result(resumed, 'globex', 'migrated', 3, 1.0, '')
+        record_result(resumed, 'hooli', 'skipped', 0, 0.1, '')
+        self.assertEqual(finish_run(resumed).status, 'completed')
+
+        # A completed run is not resumed, and `restart` starts over
+        self.assertNotEqual(get_run(['initech'], workers=1).pk, run.pk)
+        restarted = get_run(['initech'], workers=1, restart=True)
+        self.assertEqual(TenantMigrationRun.objects.count(), 3)
+        self.assertEqual(list(restarted.checkpoints.values_list('status', flat=True)), ['pending'])
+
+    def test_a_schema_at_the_target_is_skipped(self):
+        create_schema('tenant_migrations_test')
+        schema_name, status, applied, seconds, error = migrate_tenant('tenant_migrations_test')
+        self.assertEqual((schema_name, status, applied, error),
+                         ('tenant_migrations_test', 'migrated', len(get_migration_loader().graph.nodes), ''))
+        self.assertEqual(migrate_tenant('tenant_migrations_test')[1:3], ('skipped', 0))
+
+    def test_squashed_migrations_count_as_applied_when_all_they_replace_are(self):
+        loader = SimpleNamespace(
+            graph=SimpleNamespace(nodes={('purchase', '0001_squashed_0002'), ('purchase', '0003')}),
+            replacements={('purchase', '0001_squashed_0002'): SimpleNamespace(
+                replaces=[('purchase', '0001'), ('purchase', '0002')])})
+        create_schema('tenant_squashed_test')
+        with mock.patch('registration.tenant_migrations.get_migration_loader', return_value=loader):
+            self.assertEqual(get_pending_migrations('tenant_squashed_test'), loader.graph.nodes)
+            with connection.cursor() as cursor:
+                cursor.execute('CREATE TABLE "tenant_squashed_test".django_migrations (app text, name text)')
+                cursor.execute('INSERT INTO "tenant_squashed_test".django_migrations VALUES (%s, %s)',
+                               ['purchase', '0001'])
+                self.assertEqual(get_pending_migrations('tenant_squashed_test'), loader.graph.nodes)
+                cursor.execute('INSERT INTO "tenant_squashed_test".django_migrations VALUES (%s, %s)',
+                               ['purchase', '0002'])
+            self.assertEqual(get_pending_migrations('tenant_squashed_test'), {('purchase', '0003')})
+
+
+class FanOutTestCase(SimpleTestCase):
+    """
+    The workers query with connections of their own, so the schemas are committed and dropped again.
+    No rows are written, which spares a flush of the tables the kept test tenant references.
+    """
+    databases = {'default'}
+    schema_names = ['fanout_a', 'fanout_b']
+
+    def setUp(self):
+        for value, schema_name in enumerate(self.schema_names, start=1):
+            create_schema(schema_name)
+            with connection.cursor() as cursor:
+                cursor.execute(f'CREATE TABLE "{schema_name}".probe (value integer)')
+                cursor.execute(f'INSERT INTO "{schema_name}".probe VALUES (%s)', [value])
+
+    def tearDown(self):
+        for schema_name in self.schema_names:
+            drop_schema(schema_name)
+        cache.delete('fanout-test')
+        super().tearDown()
+
+    def test_results_are_gathered_per_schema(self):
+        result = fan_out('SELECT value FROM probe WHERE value > %s', [0], schemas=self.schema_names)
+        self.assertEqual(result['value'], {'fanout_a': [{'value': 1}], 'fanout_b': [{'value': 2}]})
+        self.assertEqual((result['errors'], result['timed_out'], result['complete']), ({}, [], True))
+
+        def count(schema_name):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT sum(value) FROM probe')
+                return cursor.fetchone()[0]
+        self.assertEqual(fan_out(count, schemas=self.schema_names, reducer=total, workers=1)['value'], 3)
+
+    def test_errors_are_reported_per_schema(self):
+        result = fan_out('SELECT value FROM probe', schemas=['fanout_a', 'fanout_missing'])
+        self.assertEqual(result['value'], {'fanout_a': [{'value': 1}]})
+        self.assertEqual(list(result['errors']), ['fanout_missing'])
+        self.assertFalse(result['complete'])
+
+    def test_queries_are_read_only(self):
+        result = fan_out('INSERT INTO probe VALUES (3)', schemas=self.schema_names)
+        self.assertEqual(set(result['errors']), set(self.schema_names))
+        self.assertIn('read-only', result['errors']['fanout_a'])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM "fanout_a".probe')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_statement_timeout(self):
+        result = fan_out('SELECT pg_sleep(5)', schemas=['fanout_a'], statement_timeout=100)
+        self.assertIn('statement timeout', result['errors']['fanout_a'])
+
+    def test_the_results_gathered_by_the_timeout_are_returned(self):
+        def slow(schema_name):
+            if schema_name == 'fanout_b':
+                time.sleep(1)
+            return schema_name
+        result = fan_out(slow, schemas=self.schema_names, workers=2, timeout=0.3)
+        self.assertEqual(result['value'], {'fanout_a': 'fanout_a'})
+        self.assertEqual((result['timed_out'], result['complete']), (['fanout_b'], False))
+        # Lets the straggling worker finish before its schema is dropped
+        time.sleep(1)
+
+    def test_only_complete_results_are_cached(self):
+        result = fan_out('SELECT value FROM probe', schemas=['fanout_a', 'fanout_missing'], cache_key='fanout-test')
+        self.assertFalse(result['cached'])
+        self.assertIsNone(cache.get('fanout-test'))
+
+        result = fan_out('SELECT value FROM probe', schemas=self.schema_names, cache_key='fanout-test')
+        self.assertEqual((result['complete'], result['cached']), (True, False))
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT INTO "fanout_a".probe VALUES (3)')
+        cached = fan_out('SELECT value FROM probe', schemas=self.schema_names, cache_key='fanout-test')
+        self.assertEqual((cached['value'], cached['cached']), (result['value'], True))
+
+
+@override_settings(ROOT_URLCONF='core.urls_public')
+class PlatformReportTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        for company_name, paid_until in (('Initech', timezone.localdate() - timedelta(days=1)), ('Globex', None)):
+            tenant = Tenant(schema_name=company_name.lower(), company_name=company_name, paid_until=paid_until)
+            tenant.auto_create_schema = False
+            tenant.save()
+        # The usage the report views read, as gathered by a complete fan-out
+        cache.set('platform-usage', {
+            'value': {'initech': {'users': 3, 'active_users': 2, 'purchase_orders': 5, 'recent_purchase_orders': 1},
+                      'globex': {'users': 1, 'active_users': 1, 'purchase_orders': 0, 'recent_purchase_orders': 0}},
+            'errors': {}, 'timed_out': [], 'complete': True, 'elapsed': 0.1, 'cached': False})
+        self.client.force_login(User.objects.create_user(username='platform', password='testpass', is_staff=True))
+
+    def tearDown(self):
+        cache.delete('platform-usage')
+        super().tearDown()
+
+    def test_usage(self):
+        data = self.client.get(reverse('platform-usage')).json()
+        self.assertTrue(data['cached'])
+        self.assertEqual([tenant['schema_name'] for tenant in data['value']['tenants']], ['globex', 'initech'])
+        self.assertEqual(data['value']['tenants'][1]['purchase_orders'], 5)
+        self.assertEqual(data['value']['totals'],
+                         {'users': 4, 'active_users': 3, 'purchase_orders': 5, 'recent_purchase_orders': 1})
+
+    def test_billing(self):
+        data = self.client.get(reverse('platform-billing')).json()
+        self.assertEqual([(tenant['schema_name'], tenant['billable_users'], tenant['is_overdue'])
+                          for tenant in data['value']['tenants']], [('globex', 1, False), ('initech', 2, True)])
+        self.assertEqual(data['value']['billable_users'], 3)
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create_user(username='tenant-admin', password='testpass'))
+        self.assertEqual(self.client.get(reverse('platform-usage')).status_code, 403)
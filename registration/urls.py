@@ -1,6 +1,9 @@
 from django.urls import path
-from .views import TenantRegistrationViewSet
+from .views import TenantRegistrationViewSet, TenantProvisioningViewSet, PlatformUsageView, PlatformBillingView
 
 urlpatterns = [
     path('register/', TenantRegistrationViewSet.as_view({'post': 'create'}), name='register'),
+    path('register/<uuid:pk>/', TenantProvisioningViewSet.as_view({'get': 'retrieve'}), name='register-status'),
+    path('platform/usage/', PlatformUsageView.as_view(), name='platform-usage'),
+    path('platform/billing/', PlatformBillingView.as_view(), name='platform-billing'),
 ]
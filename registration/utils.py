@@ -1,8 +1,8 @@
-from django.core.mail import EmailMessage
+from notifications.outbox import enqueue_email
 
 
 class Util:
     @staticmethod
     def send_email(data):
-        email = EmailMessage(subject=data['email_subject'], body=data['email_body'], to=[data['to_email']])
-        email.send(fail_silently=False)
+        # Queued for the outbox worker, returns the EmailJob
+        return enqueue_email(subject=data['email_subject'], body=data['email_body'], to=[data['to_email']])
@@ -6,8 +6,10 @@ from rest_framework import viewsets, generics
 from rest_framework import status
 from django.utils.text import slugify
 from django.contrib.auth import login, authenticate, get_user_model
-from .models import Tenant, Domain
-from .serializers import TenantRegistrationSerializer
+from .models import Tenant, Domain, TenantProvisioning
+from .serializers import TenantRegistrationSerializer, TenantProvisioningSerializer
+from .provisioning import get_provisioning_setting, get_tenant_domain, lease_pooled_schema
+from .reports import get_billing_report, get_usage_report
 from rest_framework_simplejwt.tokens import RefreshToken
 from .utils import Util
 from django.contrib.sites.shortcuts import get_current_site
@@ -25,7 +27,7 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.exceptions import PermissionDenied
 from django.db import transaction
 from django_tenants.utils import schema_context, tenant_context
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 
 class TenantRegistrationViewSet(viewsets.ViewSet):
     serializer_class = TenantRegistrationSerializer
@@ -35,47 +37,55 @@ class TenantRegistrationViewSet(viewsets.ViewSet):
     def create(self, request):
         serializer = TenantRegistrationSerializer(data=request.data)
         if serializer.is_valid(raise_exception=True):
-            # Create tenant and user
             tenant = serializer.save()
-            
-            # Set up domain
-            # frontend_url = request.data.get('frontend_url', 'http://localhost:8000')
-            # parsed_url = urlparse(frontend_url)
-            # frontend_domain = parsed_url.netloc.split(':')[0]
-            api_base_domain = settings.API_BASE_DOMAIN
-            sanitized_name = slugify(tenant.schema_name, allow_unicode=True)
-            
-            domain = Domain.objects.create(
-                domain=f"{sanitized_name}.{api_base_domain}",
-                tenant=tenant,
-                is_primary=True
-            )
+            provisioning = tenant.provisioning
+            status_url = request.build_absolute_uri(reverse('register-status', args=[provisioning.pk]))
 
-            # Retrieve the user (now associated with the tenant)
-            user = tenant.user
+            # A schema of the warm pool is renamed for the tenant when one is ready, otherwise the
+            # schema, admin user and domain are set up in the background by `process_tenant_provisioning`
+            if get_provisioning_setting('POOL_SIZE') and lease_pooled_schema(provisioning):
+                return Response({
+                    'detail': 'Tenant created successfully. Please confirm your email address.',
+                    'status': provisioning.status,
+                    'status_url': status_url,
+                    'tenant_url': f"https://{get_tenant_domain(tenant)}",
+                }, status=status.HTTP_201_CREATED)
 
-            # Perform any additional tenant-specific setup
-            with tenant_context(tenant):
-                # Add any tenant-specific setup here
-                pass
+            return Response({
+                'detail': 'Tenant registered, it is being set up. You will receive an email to confirm your '
+                          'address once it is ready.',
+                'status': provisioning.status,
+                'status_url': status_url,
+            }, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
 
-            # Generate and send verification email
-            token = RefreshToken.for_user(user)
-            token['email'] = user.email
-            token['tenant'] = tenant.schema_name
-            verification_url = f'https://{domain.domain}/email-verify?token={str(token.access_token)}'
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            email_body = f'Hi {tenant.company_name},\n\nUse the link below to verify your email:\n{verification_url}'
-            email_data = {
-                'email_body': email_body,
-                'to_email': user.email,
-                'email_subject': 'Verify Your Email'
-            }
-            Util.send_email(email_data)
 
-            return Response({
-                'detail': 'Tenant created successfully. Please confirm your email address.',
-                'tenant_url': f"https://{domain.domain}"
-            }, status=status.HTTP_201_CREATED)
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+class TenantProvisioningViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Provisioning status of a registered tenant, polled with the id returned by registration.
+    """
+    queryset = TenantProvisioning.objects.select_related('tenant')
+    serializer_class = TenantProvisioningSerializer
+    permission_classes = [AllowAny]
+
+
+class PlatformReportView(APIView):
+    """
+    A cross-tenant report for platform staff, gathered from every tenant schema in parallel and
+    cached while complete. `?refresh=1` gathers it again.
+    """
+    permission_classes = [IsAdminUser]
+    report = None
+
+    def get(self, request, *args, **kwargs):
+        return Response(self.report(refresh=request.query_params.get('refresh') in ('1', 'true')))
+
+
+class PlatformUsageView(PlatformReportView):
+    report = staticmethod(get_usage_report)
+
+
+class PlatformBillingView(PlatformReportView):
+    report = staticmethod(get_billing_report)
+
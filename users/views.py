@@ -4,6 +4,7 @@ from rest_framework import viewsets, status, generics, filters
 from rest_framework import permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from core.pagination import KeysetPagination
 from rest_framework.views import APIView
 from django.contrib.auth.models import Group, Permission, User
 from .models import TenantUser
@@ -13,6 +14,8 @@ from django.contrib.sites.shortcuts import get_current_site
 from .utils import Util
 
 class SoftDeleteWithModelViewSet(viewsets.ModelViewSet):
+    pagination_class = KeysetPagination
+
     def get_queryset(self):
         return super().get_queryset()
 
@@ -29,7 +32,7 @@ class SoftDeleteWithModelViewSet(viewsets.ModelViewSet):
 
     @action(detail=False)
     def hidden(self, request, *args, **kwargs):
-        hidden_instances = self.queryset.filter(is_hidden=True)
+        hidden_instances = self.get_queryset().filter(is_hidden=True)
         page = self.paginate_queryset(hidden_instances)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -39,7 +42,7 @@ class SoftDeleteWithModelViewSet(viewsets.ModelViewSet):
 
     @action(detail=False)
     def active(self, request, *args, **kwargs):
-        active_instances = self.queryset.filter(is_hidden=False)
+        active_instances = self.get_queryset().filter(is_hidden=False)
         page = self.paginate_queryset(active_instances)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -64,6 +67,7 @@ class SearchDeleteViewSet(SoftDeleteWithModelViewSet):
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = KeysetPagination
 
 
 class TenantUserViewSet(SearchDeleteViewSet):